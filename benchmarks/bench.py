@@ -0,0 +1,230 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from .corpus import Corpus
+from .fake_amazon import FakeAmazonServer
+
+# Offline benchmark suite. Run from the project root:
+#   python -m benchmarks.bench all --products 50000 --json bench.json
+# src.* is imported lazily, after AMAZON_MCP_* points at the fake server and a scratch database.
+
+TOOL_MIX = (
+    "search_product", "get_product_details", "get_trending_products", "get_latest_products",
+    "get_price_history", "get_favorites", "get_search_history", "get_product_recommendations",
+    "get_market_analytics", "get_cache_stats", "batch_search", "refresh_cache",
+)
+WORDS = ("laptop", "gaming", "wireless", "earbuds", "usb", "cable", "charger", "phone", "case", "speaker",
+         "bluetooth", "keyboard", "mouse", "monitor", "ssd", "backpack", "watch", "tablet", "router", "camera")
+
+def percentile(values, pct):
+    # Nearest-rank percentile
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def summarize(latencies):
+    return {
+        "count": len(latencies),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+def bench_parse(corpus, repeat):
+    from src.parsers import available_parsers, get_parser
+    report = {}
+    for backend in available_parsers():
+        parser = get_parser(backend)
+        pages = {}
+        for key, html, _ in corpus.search_pages():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                parser.parse_search(html, "https://www.amazon.in")
+                timings.append(time.perf_counter() - started)
+            pages[f"search:{key}"] = {"bytes": len(html.encode()), **summarize(timings)}
+        for asin, html, _ in corpus.product_pages():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                parser.parse_details(html)
+                timings.append(time.perf_counter() - started)
+            pages[f"product:{asin}"] = {"bytes": len(html.encode()), **summarize(timings)}
+        report[backend] = pages
+    return report
+
+async def bench_scrape(base_url, requests, concurrency):
+    from src.ratelimit import HostRateLimiter
+    from src.scraper import AmazonScraper
+    scraper = AmazonScraper(base_url=base_url)
+    scraper.limiter = HostRateLimiter(0)
+    semaphore = asyncio.Semaphore(concurrency)
+    report = {}
+    try:
+        for kind in ("search", "get_details"):
+            latencies = []
+
+            async def one(i):
+                async with semaphore:
+                    started = time.perf_counter()
+                    if kind == "search":
+                        # Distinct queries so singleflight does not coalesce them
+                        await scraper.search(f"{random.choice(WORDS)} {i}")
+                    else:
+                        await scraper.get_details(f"{base_url}/dp/B0X{i:07d}")
+                    latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(requests)))
+            elapsed = time.perf_counter() - started
+            report[kind] = {"requests_per_second": round(requests / elapsed, 2), "concurrency": concurrency, **summarize(latencies)}
+    finally:
+        await scraper.close()
+    return report
+
+async def populate(db, products, base_url, seed=7):
+    from src.database import INSERT_PRODUCT_SQL, INSERT_SEARCH_SQL, product_row
+    from src.models import Product
+    from src.normalize import parse_price_paise
+    history_sql = "INSERT INTO price_history (product_id, price, price_paise, timestamp) VALUES (?, ?, ?, ?)"
+    rng = random.Random(seed)
+    chunk = 5000
+    for start in range(0, products, chunk):
+        rows, prices = [], []
+        for i in range(start, min(products, start + chunk)):
+            asin = f"B0P{i:07d}"
+            title = " ".join(rng.sample(WORDS, 4)).title()
+            price = f"₹{rng.randint(149, 99999):,}"
+            product = Product(id=asin, title=title, url=f"{base_url}/dp/{asin}", price=price,
+                              rating=f"{rng.randint(30, 50) / 10:.1f}", reviews_count=f"{rng.randint(0, 90000):,}", image_url="")
+            rows.append(product_row(product, f"2026-01-{rng.randint(1, 28):02d} 12:00:00"))
+            # A month of history stored as change points (about one price change a week)
+            paise = parse_price_paise(price)
+            for day in range(1, 29):
+                if day == 1 or rng.random() < 0.15:
+                    paise = max(14900, paise + rng.randint(-paise // 10, paise // 10))
+                    prices.append((asin, f"₹{paise // 100:,}", paise, f"2026-01-{day:02d} {rng.randint(0, 23):02d}:00:00"))
+        await db.write_batch([(INSERT_PRODUCT_SQL, rows), (history_sql, prices)])
+    await db.write_many("INSERT OR IGNORE INTO favorites (product_id) VALUES (?)",
+                        [(f"B0P{rng.randrange(products):07d}",) for _ in range(max(1, products // 100))])
+    await db.write_many(INSERT_SEARCH_SQL, [(" ".join(rng.sample(WORDS, 2)), 10) for _ in range(500)])
+
+def tool_arguments(tool, rng, products, corpus, base_url):
+    asin = f"B0P{rng.randrange(products):07d}"
+    if tool == "search_product":
+        return {"query": " ".join(rng.sample(WORDS, 2)), "limit": 10}
+    if tool == "get_product_details":
+        return {"url": f"{base_url}/dp/{rng.choice(corpus.asins)}"}
+    if tool == "get_price_history":
+        return {"product_id": asin, "bucket": rng.choice((None, "day", "week"))}
+    if tool == "get_product_recommendations":
+        return {"product_id": asin}
+    if tool == "batch_search":
+        return {"queries": [" ".join(rng.sample(WORDS, 2)) for _ in range(5)]}
+    if tool == "refresh_cache":
+        return {"limit": 5}
+    return {}
+
+async def bench_tools(base_url, products, iterations, concurrency, tools, compact=False):
+    from src import server
+    corpus = Corpus()
+    rng = random.Random(11)
+    await server.db.init_db()
+    report = {}
+    try:
+        started = time.perf_counter()
+        await populate(server.db, products, base_url)
+        report["_setup"] = {"products": products, "populate_seconds": round(time.perf_counter() - started, 3)}
+        for tool in tools:
+            latencies = []
+            sizes = []
+            errors = 0
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def one():
+                nonlocal errors
+                async with semaphore:
+                    arguments = tool_arguments(tool, rng, products, corpus, base_url)
+                    if compact:
+                        arguments["compact"] = True
+                    started = time.perf_counter()
+                    result = await server.handle_call_tool(tool, arguments)
+                    latencies.append(time.perf_counter() - started)
+                    sizes.append(sum(len(c.text.encode()) for c in result))
+                    if result and result[0].text.startswith("Error:"):
+                        errors += 1
+
+            await asyncio.gather(*(one() for _ in range(iterations)))
+            report[tool] = {"errors": errors, "mean_bytes": round(statistics.fmean(sizes)) if sizes else 0, **summarize(latencies)}
+    finally:
+        await server.search_cache.close()
+        await server.scraper.close()
+        await server.db.close()
+    return report
+
+def print_table(title, rows):
+    print(f"\n== {title} ==")
+    for name, stats in rows.items():
+        cells = "  ".join(f"{k}={v}" for k, v in stats.items())
+        print(f"{name:<40} {cells}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline scraping, parsing and tool-dispatch benchmarks")
+    parser.add_argument("suite", nargs="?", default="all", choices=("all", "parse", "scrape", "tools"))
+    parser.add_argument("--repeat", type=int, default=5, help="Parse repetitions per page")
+    parser.add_argument("--requests", type=int, default=200, help="Scrape requests per kind")
+    parser.add_argument("--products", type=int, default=10000, help="Rows in the pre-populated database")
+    parser.add_argument("--iterations", type=int, default=100, help="Calls per tool")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tools", default=",".join(TOOL_MIX), help="Comma-separated tools to benchmark")
+    parser.add_argument("--latency", type=float, default=0.005, help="Fake server latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake server responses that are 503")
+    parser.add_argument("--compact", action="store_true", help="Request compact JSON responses from the tools")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    corpus = Corpus()
+    fake = FakeAmazonServer(latency=args.latency, error_rate=args.error_rate, corpus=corpus, seed=1).start()
+    workdir = tempfile.mkdtemp(prefix="amazon-bench-")
+    os.environ["AMAZON_MCP_BASE_URL"] = fake.base_url
+    os.environ["AMAZON_MCP_DB"] = os.path.join(workdir, "bench.db")
+    os.environ["AMAZON_MCP_HTML_STORE_DIR"] = os.path.join(workdir, "html_store")
+    os.environ.setdefault("AMAZON_MCP_SCRAPE_RATE", "0")
+    import logging
+    logging.getLogger("amazon-mcp-server").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    results = {"fake_server": {"latency": args.latency, "error_rate": args.error_rate}}
+    try:
+        if args.suite in ("all", "parse"):
+            results["parse"] = bench_parse(corpus, args.repeat)
+            for backend, pages in results["parse"].items():
+                print_table(f"parse ({backend})", {k: {"bytes": v["bytes"], "mean_ms": v["mean_ms"], "p95_ms": v["p95_ms"]} for k, v in pages.items()})
+        if args.suite in ("all", "scrape"):
+            results["scrape"] = asyncio.run(bench_scrape(fake.base_url, args.requests, args.concurrency))
+            print_table("scrape throughput", results["scrape"])
+        if args.suite in ("all", "tools"):
+            tools = [t for t in args.tools.split(",") if t]
+            results["tools"] = asyncio.run(bench_tools(fake.base_url, args.products, args.iterations, args.concurrency, tools, args.compact))
+            print_table(f"tool latency ({args.products} products)", results["tools"])
+    finally:
+        fake.stop()
+        results["fake_server"].update(requests=fake.requests, errors=fake.errors)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import json
+import os
+import zlib
+from typing import Dict, Iterator, Tuple
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+class Corpus:
+    """Recorded Amazon search and product pages described by fixtures/manifest.json."""
+
+    def __init__(self, root: str = FIXTURES_DIR):
+        self.root = root
+        with open(os.path.join(root, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self._pages: Dict[str, str] = {}
+        self.search_keys = sorted(self.manifest["search"])
+        self.asins = sorted(self.manifest["product"])
+
+    def _read(self, relative: str) -> str:
+        page = self._pages.get(relative)
+        if page is None:
+            with open(os.path.join(self.root, relative), encoding="utf-8") as f:
+                page = self._pages[relative] = f.read()
+        return page
+
+    def search_page(self, query: str, page: int = 1) -> str:
+        # Unknown queries map onto a recorded page deterministically so any query gets results
+        key = f"{' '.join(query.lower().split())}|{page}"
+        entry = self.manifest["search"].get(key)
+        if entry is None:
+            entry = self.manifest["search"][self.search_keys[zlib.crc32(key.encode()) % len(self.search_keys)]]
+        return self._read(entry["file"])
+
+    def product_page(self, asin: str) -> str:
+        entry = self.manifest["product"].get(asin)
+        if entry is None:
+            entry = self.manifest["product"][self.asins[zlib.crc32(asin.encode()) % len(self.asins)]]
+        return self._read(entry["file"])
+
+    def search_pages(self) -> Iterator[Tuple[str, str, int]]:
+        for key in self.search_keys:
+            entry = self.manifest["search"][key]
+            yield key, self._read(entry["file"]), entry["results"]
+
+    def product_pages(self) -> Iterator[Tuple[str, str, str]]:
+        for asin in self.asins:
+            entry = self.manifest["product"][asin]
+            yield asin, self._read(entry["file"]), entry["title"]
@@ -0,0 +1,139 @@
+import argparse
+import gzip
+import hashlib
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from .corpus import Corpus
+
+ASIN_PATH = re.compile(r"/dp/([A-Z0-9]{10})")
+LAST_MODIFIED = "Wed, 07 Jan 2026 10:00:00 GMT"  # the corpus never changes
+
+class FakeAmazonServer:
+    """Local stand-in for www.amazon.in serving the recorded corpus with configurable latency and errors."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503, corpus: Corpus = None, seed: int = None,
+                 retry_after: str = "1"):
+        self.corpus = corpus or Corpus()
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after  # sent with 429/503 responses when set
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeAmazonServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-amazon", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _respond(self, path: str, headers) -> tuple:
+        with self._lock:
+            self.requests += 1
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate and self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return self.error_status, "<html><body>Service Unavailable</body></html>", {}
+
+        parsed = urllib.parse.urlsplit(path)
+        if parsed.path == "/s":
+            params = urllib.parse.parse_qs(parsed.query)
+            query = params.get("k", [""])[0]
+            page = int(params.get("page", ["1"])[0] or 1)
+            return 200, self.corpus.search_page(query, page), {}
+        match = ASIN_PATH.search(parsed.path)
+        if match:
+            # Product pages carry validators and answer conditional requests like the real site's CDN
+            body = self.corpus.product_page(match.group(1))
+            validators = {"ETag": '"%s"' % hashlib.md5(body.encode("utf-8")).hexdigest(), "Last-Modified": LAST_MODIFIED}
+            if headers.get("If-None-Match") == validators["ETag"] or (
+                "If-None-Match" not in headers and headers.get("If-Modified-Since") == LAST_MODIFIED
+            ):
+                with self._lock:
+                    self.not_modified += 1
+                return 304, "", validators
+            return 200, body, validators
+        return 404, "<html><body>Not Found</body></html>", {}
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body, extra = server._respond(self.path, self.headers)
+                payload = body.encode("utf-8")
+                compressed = payload and "gzip" in self.headers.get("Accept-Encoding", "")
+                if compressed:
+                    payload = gzip.compress(payload, compresslevel=5)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                if compressed:
+                    self.send_header("Content-Encoding", "gzip")
+                for name, value in extra.items():
+                    self.send_header(name, value)
+                if status != 304:
+                    self.send_header("Content-Length", str(len(payload)))
+                if status in (429, 503) and server.retry_after is not None:
+                    self.send_header("Retry-After", server.retry_after)
+                self.end_headers()
+                self.wfile.write(payload)
+                with server._lock:
+                    server.bytes_sent += len(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the recorded Amazon corpus locally")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+
+    server = FakeAmazonServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.error_status)
+    print(f"Serving corpus at {server.base_url} (set AMAZON_MCP_BASE_URL to use it)")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+from collections import Counter, defaultdict
+from .bench import populate, print_table, summarize, tool_arguments
+from .corpus import Corpus
+from .fake_amazon import FakeAmazonServer
+from .startup import ENTRY_POINTS, INITIALIZE, PROJECT_ROOT
+
+# Load test over stdio: the server is launched the way an MCP client launches it and driven with concurrent
+# tools/call traffic at a target rate, against the fake site and a pre-populated scratch database.
+#   python -m benchmarks.loadtest --rate 50 --requests 2000 --concurrency 64 --json load.json
+#   python -m benchmarks.loadtest --trace calls.jsonl --json load.json --baseline load-before.json --max-regression 20
+# A trace is JSON-RPC tools/call requests, one per line; an optional "t" (seconds from the start) replays the original
+# timing, otherwise requests are sent at --rate. --save-trace writes the synthetic workload in that format.
+# Latency runs from each request's scheduled send time, so time spent queued behind --concurrency is included.
+
+# Synthetic traffic: tool -> relative weight (interactive lookups dominate, bulk tools are rare)
+DEFAULT_MIX = {
+    "search_product": 30, "get_product_details": 25, "get_price_history": 10, "get_product_recommendations": 8,
+    "get_trending_products": 5, "get_latest_products": 5, "get_favorites": 4, "get_search_history": 3,
+    "get_market_analytics": 3, "get_cache_stats": 3, "get_price_alerts": 2, "batch_search": 1, "refresh_cache": 1,
+}
+MCP_SERVER_NAME = "amazon-search"
+STDOUT_LIMIT = 16 * 1024 * 1024  # largest single reply line accepted
+
+def server_command(config_path: str, entry: str = "mcp"):
+    # mcp.json's amazon-search command when its script exists here; python main.py otherwise
+    if entry != "mcp":
+        return ENTRY_POINTS[entry], PROJECT_ROOT, entry
+    try:
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)["mcpServers"][MCP_SERVER_NAME]
+    except (OSError, ValueError, KeyError):
+        config = None
+    if config:
+        cwd = config.get("cwd") or PROJECT_ROOT
+        args = config.get("args", [])
+        scripts = [arg for arg in args if arg.endswith(".py")]
+        if os.path.isdir(cwd) and all(os.path.exists(os.path.join(cwd, script)) for script in scripts):
+            # Same interpreter as the harness, so the server sees the same installed packages
+            command = sys.executable if config["command"] in ("python", "python3", "py") else config["command"]
+            return [command, *args], cwd, "mcp.json"
+    return ENTRY_POINTS["main"], PROJECT_ROOT, "main (mcp.json command not found here)"
+
+def parse_mix(text: str) -> dict:
+    mix = {}
+    for item in filter(None, text.split(",")):
+        tool, _, weight = item.partition("=")
+        mix[tool.strip()] = float(weight or 1)
+    return mix
+
+def synthetic_calls(count: int, mix: dict, products: int, corpus: Corpus, base_url: str, seed: int = 13) -> list:
+    rng = random.Random(seed)
+    tools = list(mix)
+    weights = [mix[tool] for tool in tools]
+    return [(None, tool, tool_arguments(tool, rng, products, corpus, base_url)) for tool in rng.choices(tools, weights, k=count)]
+
+def load_trace(path: str) -> list:
+    calls = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            message = json.loads(line)
+            if message.get("method") != "tools/call":
+                continue
+            params = message.get("params") or {}
+            calls.append((message.get("t"), params.get("name"), params.get("arguments") or {}))
+    return calls
+
+def save_trace(path: str, calls: list, rate: float):
+    with open(path, "w", encoding="utf-8") as f:
+        for i, (offset, tool, arguments) in enumerate(calls):
+            message = {"jsonrpc": "2.0", "id": i + 1, "method": "tools/call", "params": {"name": tool, "arguments": arguments},
+                       "t": round(offset if offset is not None else i / rate, 6)}
+            f.write(json.dumps(message, ensure_ascii=False) + "\n")
+
+class StdioClient:
+    """JSON-RPC over a server process's stdin/stdout; replies are matched to requests by id."""
+
+    def __init__(self, proc):
+        self.proc = proc
+        self._pending = {}
+        self._next_id = 0
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            line = await self.proc.stdout.readline()
+            if not line:
+                break
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            future = self._pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("Server closed its stdout"))
+        self._pending.clear()
+
+    def _send(self, message: dict):
+        self.proc.stdin.write(json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    async def request(self, method: str, params: dict = None) -> dict:
+        self._next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self._pending[self._next_id] = future
+        self._send({"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params or {}})
+        await self.proc.stdin.drain()
+        return await future
+
+    async def notify(self, method: str, params: dict = None):
+        self._send({"jsonrpc": "2.0", "method": method, "params": params or {}})
+        await self.proc.stdin.drain()
+
+    async def close(self, timeout: float = 60):
+        self.proc.stdin.close()
+        try:
+            await asyncio.wait_for(self.proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            self.proc.kill()
+            await self.proc.wait()
+        await asyncio.gather(self._reader, return_exceptions=True)
+
+def failed(reply: dict) -> bool:
+    if "error" in reply:
+        return True
+    content = reply.get("result", {}).get("content") or [{}]
+    return reply["result"].get("isError", False) or str(content[0].get("text", "")).startswith("Error:")
+
+async def run_load(command: list, cwd: str, env: dict, calls: list, rate: float, concurrency: int = 64,
+                   timeout: float = 120, speed: float = 1.0, stderr=None) -> dict:
+    proc = await asyncio.create_subprocess_exec(
+        *command, cwd=cwd, env=env, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+        stderr=stderr if stderr is not None else asyncio.subprocess.DEVNULL, limit=STDOUT_LIMIT,
+    )
+    client = StdioClient(proc)
+    loop = asyncio.get_running_loop()
+    try:
+        started = loop.time()
+        await client.request("initialize", INITIALIZE["params"])
+        await client.notify("notifications/initialized")
+        handshake = loop.time() - started
+        # The first call loads the server modules, the DB pool and the HTTP client; it is reported separately
+        await client.request("tools/call", {"name": "get_cache_stats", "arguments": {"compact": True}})
+        warmup = loop.time() - started - handshake
+
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        latencies = defaultdict(list)
+        errors = Counter()
+        in_flight = peak = 0
+
+        async def one(due: float, tool: str, arguments: dict):
+            nonlocal in_flight, peak
+            async with semaphore:
+                in_flight += 1
+                peak = max(peak, in_flight)
+                try:
+                    reply = await asyncio.wait_for(client.request("tools/call", {"name": tool, "arguments": arguments}), timeout)
+                    bad = failed(reply)
+                except (asyncio.TimeoutError, ConnectionError):
+                    bad = True
+                finally:
+                    in_flight -= 1
+            latencies[tool].append(loop.time() - due)
+            if bad:
+                errors[tool] += 1
+
+        tasks = []
+        load_started = loop.time()
+        for i, (offset, tool, arguments) in enumerate(calls):
+            due = load_started + (offset / speed if offset is not None else i / rate)
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            tasks.append(asyncio.create_task(one(due, tool, arguments)))
+        offered = loop.time() - load_started
+        await asyncio.gather(*tasks)
+        elapsed = loop.time() - load_started
+
+        # Server-side phase breakdown (queue, db, fetch, parse, serialize) for the same run
+        reply = await client.request("tools/call", {"name": "get_metrics", "arguments": {"compact": True}})
+        server_metrics = json.loads(reply["result"]["content"][0]["text"]) if not failed(reply) else None
+    finally:
+        await client.close()
+
+    completed = sum(len(values) for values in latencies.values())
+    every = [value for values in latencies.values() for value in values]
+    return {
+        "summary": {
+            "requests": completed,
+            "errors": sum(errors.values()),
+            "elapsed_seconds": round(elapsed, 3),
+            "offered_rps": round(len(calls) / offered, 2) if offered else None,
+            "throughput_rps": round(completed / elapsed, 2) if elapsed else 0.0,
+            "peak_in_flight": peak,
+            "handshake_ms": round(handshake * 1000, 3),
+            "first_call_ms": round(warmup * 1000, 3),
+            **{k: v for k, v in summarize(every).items() if k != "count"},
+        },
+        "tools": {tool: {"errors": errors[tool], **summarize(values)} for tool, values in sorted(latencies.items())},
+        "server_metrics": server_metrics,
+    }
+
+def change_pct(now, before):
+    return round((now - before) * 100 / before, 2) if before else None
+
+def compare(results: dict, baseline: dict) -> dict:
+    # Positive latency changes are slowdowns; tools missing from either run are skipped
+    report = {
+        "throughput_change_pct": change_pct(results["summary"]["throughput_rps"], baseline["summary"]["throughput_rps"]),
+        "tools": {},
+    }
+    for tool, stats in results["tools"].items():
+        before = baseline.get("tools", {}).get(tool)
+        if before:
+            report["tools"][tool] = {f"{key}_change_pct": change_pct(stats[key], before[key]) for key in ("p50_ms", "p95_ms", "p99_ms")}
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent JSON-RPC load against the stdio server")
+    parser.add_argument("--trace", help="Replay tools/call requests from this JSONL file instead of a synthetic mix")
+    parser.add_argument("--rate", type=float, help="Requests per second (default 20; a trace with \"t\" offsets replays its own timing)")
+    parser.add_argument("--speed", type=float, default=1.0, help="Trace replay speed-up factor")
+    parser.add_argument("--requests", type=int, default=500, help="Synthetic requests to send")
+    parser.add_argument("--mix", default=",".join(f"{tool}={weight}" for tool, weight in DEFAULT_MIX.items()),
+                        help="Synthetic tool mix as tool=weight,...")
+    parser.add_argument("--concurrency", type=int, default=64, help="Requests in flight at most")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a request counts as failed")
+    parser.add_argument("--products", type=int, default=10000, help="Rows in the pre-populated database")
+    parser.add_argument("--latency", type=float, default=0.005, help="Fake server latency in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of fake server responses that are 503")
+    parser.add_argument("--entry", default="mcp", choices=("mcp", *ENTRY_POINTS), help="Server command: mcp.json, main.py or the SDK server")
+    parser.add_argument("--config", default=os.path.join(PROJECT_ROOT, "mcp.json"), help="MCP client config to take the command from")
+    parser.add_argument("--save-trace", help="Write the synthetic workload as a replayable trace")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--baseline", help="Earlier --json results to compare against")
+    parser.add_argument("--max-regression", type=float, help="Exit with status 1 when any tool's p95 is this many percent slower than the baseline")
+    args = parser.parse_args()
+
+    corpus = Corpus()
+    fake = FakeAmazonServer(latency=args.latency, error_rate=args.error_rate, corpus=corpus, seed=1).start()
+    workdir = tempfile.mkdtemp(prefix="amazon-load-")
+    env = dict(
+        os.environ,
+        AMAZON_MCP_BASE_URL=fake.base_url,
+        AMAZON_MCP_DB=os.path.join(workdir, "load.db"),
+        AMAZON_MCP_HTML_STORE_DIR=os.path.join(workdir, "html_store"),
+    )
+    env.setdefault("AMAZON_MCP_SCRAPE_RATE", "0")
+    os.environ.update(env)
+    import logging
+    logging.getLogger("amazon-mcp-server").setLevel(logging.WARNING)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    if args.trace:
+        calls = load_trace(args.trace)
+        rate = args.rate or 20.0
+        if args.rate:
+            calls = [(None, tool, arguments) for _, tool, arguments in calls]
+    else:
+        rate = args.rate or 20.0
+        calls = synthetic_calls(args.requests, parse_mix(args.mix), args.products, corpus, fake.base_url)
+        if args.save_trace:
+            save_trace(args.save_trace, calls, rate)
+    command, cwd, source = server_command(args.config, args.entry)
+
+    async def prepare():
+        from src.database import AmazonDatabase
+        db = AmazonDatabase(env["AMAZON_MCP_DB"])
+        await db.init_db()
+        try:
+            await populate(db, args.products, fake.base_url)
+        finally:
+            await db.close()
+
+    results = {
+        "config": {
+            "command": command, "source": source, "trace": args.trace, "requests": len(calls), "rate": rate,
+            "concurrency": args.concurrency, "products": args.products, "latency": args.latency, "error_rate": args.error_rate,
+        },
+    }
+    log_path = os.path.join(workdir, "server.log")
+    try:
+        asyncio.run(prepare())
+        print(f"Server: {' '.join(command)} ({source}); log in {log_path}", file=sys.stderr)
+        with open(log_path, "wb") as log:
+            results.update(asyncio.run(run_load(command, cwd, env, calls, rate, args.concurrency, args.timeout, args.speed, log)))
+    finally:
+        fake.stop()
+        results["fake_server"] = {"requests": fake.requests, "errors": fake.errors}
+
+    print_table("load summary", {"all": results["summary"]})
+    print_table("latency per tool", results["tools"])
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            results["comparison"] = compare(results, json.load(f))
+        print_table(f"change vs {args.baseline}", results["comparison"]["tools"])
+        print(f"throughput change: {results['comparison']['throughput_change_pct']}%")
+        if args.max_regression is not None:
+            slower = [tool for tool, change in results["comparison"]["tools"].items()
+                      if (change["p95_ms_change_pct"] or 0) > args.max_regression]
+            if slower:
+                print(f"p95 regressed more than {args.max_regression}%: {', '.join(slower)}", file=sys.stderr)
+                status = 1
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}", file=sys.stderr)
+    sys.exit(status)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import json
+import os
+import urllib.parse
+from src.config import BASE_URL
+from src.parsers import get_parser
+from src.scraper import AmazonScraper
+from .corpus import FIXTURES_DIR
+
+# Captures live pages into the fixture corpus; run from the project root: python -m benchmarks.record --query laptop
+
+async def record(queries, asins, pages, root):
+    scraper = AmazonScraper()
+    manifest_path = os.path.join(root, "manifest.json")
+    with open(manifest_path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    parser = get_parser("html.parser")
+    try:
+        for query in queries:
+            for page in range(1, pages + 1):
+                response = await scraper._fetch(f"{BASE_URL}/s?k={urllib.parse.quote(query)}&page={page}")
+                if response.status_code != 200:
+                    print(f"Skipping '{query}' page {page}: HTTP {response.status_code}")
+                    continue
+                relative = f"search/{'-'.join(query.lower().split())}-p{page}.html"
+                with open(os.path.join(root, relative), "w", encoding="utf-8") as f:
+                    f.write(response.text)
+                results = len(parser.parse_search(response.text, BASE_URL))
+                manifest["search"][f"{' '.join(query.lower().split())}|{page}"] = {"file": relative, "results": results}
+                print(f"Recorded '{query}' page {page}: {results} results")
+                asins.extend(p["id"] for p in parser.parse_search(response.text, BASE_URL)[:2] if p["id"])
+        for asin in dict.fromkeys(asins):
+            response = await scraper._fetch(f"{BASE_URL}/dp/{asin}")
+            if response.status_code != 200:
+                print(f"Skipping {asin}: HTTP {response.status_code}")
+                continue
+            relative = f"product/{asin}.html"
+            with open(os.path.join(root, relative), "w", encoding="utf-8") as f:
+                f.write(response.text)
+            manifest["product"][asin] = {"file": relative, "title": parser.parse_details(response.text)["title"]}
+            print(f"Recorded product {asin}")
+    finally:
+        await scraper.close()
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+def main():
+    parser = argparse.ArgumentParser(description="Record live Amazon pages into the benchmark corpus")
+    parser.add_argument("--query", action="append", default=[], help="Search query to record (repeatable)")
+    parser.add_argument("--asin", action="append", default=[], help="Product ASIN to record (repeatable)")
+    parser.add_argument("--pages", type=int, default=1, help="Search result pages per query")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR)
+    args = parser.parse_args()
+    asyncio.run(record(args.query, args.asin, args.pages, args.fixtures))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from .bench import print_table, summarize
+
+# Cold-start benchmark: time from spawning the server to its initialize, tools/list and first tools/call replies.
+#   python -m benchmarks.startup --runs 10 --json startup.json
+# "main" is the default entry point (python main.py); "sdk" serves through the MCP SDK (python -m src.server).
+
+ENTRY_POINTS = {
+    "main": [sys.executable, "main.py"],
+    "sdk": [sys.executable, "-m", "src.server"],
+}
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INITIALIZE = {
+    "jsonrpc": "2.0", "id": 1, "method": "initialize",
+    "params": {"protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "startup-bench", "version": "1"}},
+}
+
+def request(proc, msg):
+    proc.stdin.write((json.dumps(msg) + "\n").encode())
+    proc.stdin.flush()
+    if "id" not in msg:
+        return None
+    while True:
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Server exited before answering {msg['method']}")
+        reply = json.loads(line)
+        if reply.get("id") == msg["id"]:
+            return reply
+
+def one_run(command, env, tool):
+    started = time.perf_counter()
+    proc = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                            stderr=subprocess.DEVNULL)
+    try:
+        timings = {}
+        request(proc, INITIALIZE)
+        timings["initialize"] = time.perf_counter() - started
+        request(proc, {"jsonrpc": "2.0", "method": "notifications/initialized"})
+        request(proc, {"jsonrpc": "2.0", "id": 2, "method": "tools/list"})
+        timings["tools_list"] = time.perf_counter() - started
+        reply = request(proc, {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {"name": tool, "arguments": {}}})
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        timings["first_call"] = time.perf_counter() - started
+        return timings
+    finally:
+        proc.stdin.close()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+def main():
+    parser = argparse.ArgumentParser(description="Time-to-first-response of the stdio entry points")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts per entry point")
+    parser.add_argument("--entry", default="main,sdk", help=f"Comma-separated entry points ({', '.join(ENTRY_POINTS)})")
+    parser.add_argument("--tool", default="get_cache_stats", help="Tool called after the handshake")
+    parser.add_argument("--prewarm", action="store_true", help="Set AMAZON_MCP_PREWARM=1 for main.py")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="amazon-startup-")
+    env = dict(os.environ, AMAZON_MCP_DB=os.path.join(workdir, "startup.db"),
+               AMAZON_MCP_HTML_STORE_DIR=os.path.join(workdir, "html_store"))
+    if args.prewarm:
+        env["AMAZON_MCP_PREWARM"] = "1"
+
+    results = {}
+    for entry in [e for e in args.entry.split(",") if e]:
+        runs = [one_run(ENTRY_POINTS[entry], env, args.tool) for _ in range(args.runs)]
+        results[entry] = {phase: summarize([run[phase] for run in runs]) for phase in runs[0]}
+        print_table(f"startup: {entry}", results[entry])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.json}", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
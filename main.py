@@ -1,119 +1,147 @@
-import sys
+import asyncio
+import importlib
 import json
+import os
+import sys
+
+from src.config import logger
+from src.tools import TOOLS
+
+# MCP over stdio: newline-delimited JSON-RPC on stdin/stdout (logs go to stderr).
+# initialize, ping and tools/list are answered from static data straight away; src.server (mcp, httpx, bs4,
+# aiosqlite, the DB pool and the HTTP client) is imported and started on the first tools/call.
+PROTOCOL_VERSIONS = ("2025-06-18", "2025-03-26", "2024-11-05")
+SERVER_INFO = {"name": "amazon-search", "version": "1.0.0"}
+TOOL_NAMES = {tool["name"] for tool in TOOLS}
+# Start loading src.server as soon as the handshake completes instead of on the first tools/call
+PREWARM = os.environ.get("AMAZON_MCP_PREWARM", "0").lower() in ("1", "true", "yes")
 
 def send(msg):
-    sys.stdout.write(json.dumps(msg) + "\n")
-    sys.stdout.flush()
+    sys.stdout.buffer.write(json.dumps(msg, ensure_ascii=False).encode("utf-8") + b"\n")
+    sys.stdout.buffer.flush()
 
-def main():
-    while True:
+def send_error(req_id, code, message):
+    send({"jsonrpc": "2.0", "id": req_id, "error": {"code": code, "message": message}})
+
+class Backend:
+    """src.server, imported and started once, on first use."""
+
+    def __init__(self):
+        self._task = None
+
+    def load(self) -> asyncio.Future:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._load())
+            self._task.add_done_callback(self._forget_failure)
+        return self._task
+
+    def _forget_failure(self, task: asyncio.Future):
+        # A failed load is not cached: the next tools/call imports and starts the server again
+        if (task.cancelled() or task.exception() is not None) and self._task is task:
+            self._task = None
+
+    async def _load(self):
+        # The import runs in a thread so pings and tools/list keep being answered meanwhile
+        server = await asyncio.to_thread(importlib.import_module, "src.server")
+        await server.startup()
+        return server
+
+    async def close(self):
+        if self._task is None:
+            return
         try:
-            line = sys.stdin.readline()
-            if not line:
-                break
+            server = await self._task
+        except Exception:
+            return
+        await server.shutdown()
+
+async def call_tool(backend: Backend, req_id, params: dict):
+    name = params.get("name")
+    if name not in TOOL_NAMES:
+        send_error(req_id, -32602, f"Unknown tool: {name}")
+        return
+    try:
+        # Shielded: cancelling one call must not cancel the load other calls are waiting on
+        server = await asyncio.shield(backend.load())
+        content = await server.handle_call_tool(name, params.get("arguments") or {})
+    except Exception as e:
+        logger.exception(f"tools/call {name} failed: {e}")
+        send_error(req_id, -32603, str(e))
+        return
+    send({
+        "jsonrpc": "2.0",
+        "id": req_id,
+        "result": {"content": [item.model_dump(mode="json", exclude_none=True) for item in content], "isError": False},
+    })
+
+def dispatch(req: dict, backend: Backend, calls: dict):
+    method = req.get("method")
+    req_id = req.get("id")
 
+    # 1️⃣ REQUIRED MCP HANDSHAKE
+    if method == "initialize":
+        requested = (req.get("params") or {}).get("protocolVersion")
+        send({
+            "jsonrpc": "2.0",
+            "id": req_id,
+            "result": {
+                "protocolVersion": requested if requested in PROTOCOL_VERSIONS else PROTOCOL_VERSIONS[0],
+                "capabilities": {"tools": {"listChanged": False}},
+                "serverInfo": SERVER_INFO,
+            }
+        })
+
+    # 2️⃣ REQUIRED
+    elif method == "notifications/initialized":
+        if PREWARM:
+            backend.load()
+
+    # 3️⃣ REQUIRED
+    elif method == "tools/list":
+        send({"jsonrpc": "2.0", "id": req_id, "result": {"tools": TOOLS}})
+
+    # 4️⃣ REQUIRED: each call runs as its own task so many can be in flight
+    elif method == "tools/call":
+        task = asyncio.ensure_future(call_tool(backend, req_id, req.get("params") or {}))
+        calls[req_id] = task
+        task.add_done_callback(lambda _: calls.pop(req_id, None))
+
+    elif method == "notifications/cancelled":
+        task = calls.get((req.get("params") or {}).get("requestId"))
+        if task is not None:
+            task.cancel()
+
+    # MCP expects a response to Pings
+    elif method == "ping":
+        send({"jsonrpc": "2.0", "id": req_id, "result": {}})
+
+    # Fallback for unknown methods to keep connection alive if they expect response
+    elif req_id is not None:
+        send_error(req_id, -32601, "Method not found")
+
+async def main():
+    backend = Backend()
+    calls = {}
+    while True:
+        # A thread does the blocking read so this works the same on Windows pipes
+        line = await asyncio.to_thread(sys.stdin.buffer.readline)
+        if not line:
+            break
+        if not line.strip():
+            continue
+        try:
             req = json.loads(line)
-        except json.JSONDecodeError:
+        except ValueError:
+            send_error(None, -32700, "Parse error")
             continue
-        except Exception:
-            break
+        for item in req if isinstance(req, list) else [req]:
+            if isinstance(item, dict):
+                dispatch(item, backend, calls)
 
-        method = req.get("method")
-        req_id = req.get("id")
-
-        # 1️⃣ REQUIRED MCP HANDSHAKE
-        if method == "initialize":
-            send({
-                "jsonrpc": "2.0",
-                "id": req_id,
-                "result": {
-                    "protocolVersion": "2024-11-05",
-                    "capabilities": {
-                        "tools": {}
-                    },
-                    "serverInfo": {
-                        "name": "amazon-search",
-                        "version": "1.0.0"
-                    }
-                }
-            })
-
-        # 2️⃣ REQUIRED
-        elif method == "notifications/initialized":
-            # Just acknowledge, no response needed usually, but good to handle
-            pass
-
-        # 3️⃣ REQUIRED
-        elif method == "tools/list":
-            send({
-                "jsonrpc": "2.0",
-                "id": req_id,
-                "result": {
-                    "tools": [
-                        {
-                            "name": "amazon_search",
-                            "description": "Search Amazon products",
-                            "inputSchema": {
-                                "type": "object",
-                                "properties": {
-                                    "query": {
-                                        "type": "string"
-                                    }
-                                },
-                                "required": ["query"]
-                            }
-                        }
-                    ]
-                }
-            })
-
-        # 4️⃣ REQUIRED
-        elif method == "tools/call":
-            tool = req.get("params", {}).get("name")
-            args = req.get("params", {}).get("arguments", {})
-
-            if tool == "amazon_search":
-                send({
-                    "jsonrpc": "2.0",
-                    "id": req_id,
-                    "result": {
-                        "content": [
-                            {
-                                "type": "text",
-                                "text": f"Amazon search result for: {args.get('query')}"
-                            }
-                        ]
-                    }
-                })
-            else:
-                send({
-                    "jsonrpc": "2.0",
-                    "id": req_id,
-                    "error": {
-                        "code": -32601,
-                        "message": "Method not found"
-                    }
-                })
-
-        # MCP expects a response to Pings
-        elif method == "ping":
-             send({
-                "jsonrpc": "2.0",
-                "id": req_id,
-                "result": {}
-            })
-            
-        # Fallback for unknown methods to keep connection alive if they expect response
-        elif req_id is not None:
-            # If it's a request (has id), we must respond
-            send({
-                "jsonrpc": "2.0",
-                "id": req_id,
-                "error": {
-                    "code": -32601,
-                    "message": "Method not found"
-                }
-            })
+    # stdin closed: finish what is in flight, then close the DB and HTTP client
+    if calls:
+        await asyncio.gather(*calls.values(), return_exceptions=True)
+    await backend.close()
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+from .config import CACHE_TTL, SEARCH_CACHE_MAX_STALE, logger
+from .metrics import metrics
+
+UPSERT_SEARCH_CACHE_SQL = """INSERT INTO search_cache (query, asins, fetched_at) VALUES (?, ?, ?)
+                             ON CONFLICT(query) DO UPDATE SET asins = excluded.asins, fetched_at = excluded.fetched_at"""
+
+def normalize_query(query: str) -> str:
+    return " ".join((query or "").lower().split())
+
+class SearchCacheEntry:
+    __slots__ = ("query", "asins", "fetched_at")
+
+    def __init__(self, query: str, asins: List[str], fetched_at: float):
+        self.query = query
+        self.asins = asins
+        self.fetched_at = fetched_at
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+class SearchResultCache:
+    """Query -> ordered ASIN list, served fresh within CACHE_TTL and stale (while revalidating) up to max_stale."""
+
+    def __init__(self, db, fetch: Callable[[str], Awaitable[List[Dict]]], ttl: float = CACHE_TTL, max_stale: float = SEARCH_CACHE_MAX_STALE):
+        self.db = db
+        self.fetch = fetch  # scrapes and persists a query (using store_statement), returns the products
+        self.ttl = ttl
+        self.max_stale = max(max_stale, ttl)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._counts = {"hits": 0, "stale": 0, "misses": 0, "expired": 0, "revalidations": 0, "refresh_errors": 0}
+
+    async def lookup(self, query: str) -> Optional[SearchCacheEntry]:
+        key = normalize_query(query)
+        async with self.db.reader() as conn:
+            cursor = await conn.execute("SELECT asins, fetched_at FROM search_cache WHERE query = ?", (key,))
+            row = await cursor.fetchone()
+        if not row:
+            return None
+        return SearchCacheEntry(key, json.loads(row[0]), row[1])
+
+    def state(self, entry: Optional[SearchCacheEntry]) -> str:
+        if entry is None:
+            return "miss"
+        if entry.age < self.ttl:
+            return "fresh"
+        if entry.age < self.max_stale:
+            return "stale"
+        return "expired"
+
+    def record(self, state: str):
+        metrics.count("cache_lookups", cache="search", result=state)
+        if state == "fresh":
+            self._counts["hits"] += 1
+        elif state == "stale":
+            self._counts["stale"] += 1
+        else:
+            self._counts["misses"] += 1
+            if state == "expired":
+                self._counts["expired"] += 1
+
+    def store_statement(self, query: str, asins: List[str]):
+        return (UPSERT_SEARCH_CACHE_SQL, [(normalize_query(query), json.dumps(asins), time.time())])
+
+    async def refresh(self, query: str) -> List[Dict]:
+        # Concurrent refreshes of the same query share one fetch
+        return await asyncio.shield(self._start(query))
+
+    def revalidate(self, query: str):
+        if normalize_query(query) not in self._inflight:
+            self._counts["revalidations"] += 1
+        self._start(query)
+
+    def _start(self, query: str) -> asyncio.Task:
+        key = normalize_query(query)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._run(key, query))
+            self._inflight[key] = task
+        return task
+
+    async def _run(self, key: str, query: str) -> List[Dict]:
+        try:
+            return await self.fetch(query)
+        except Exception as e:
+            self._counts["refresh_errors"] += 1
+            logger.error(f"Search cache refresh failed for '{key}': {e}")
+            return []
+        finally:
+            self._inflight.pop(key, None)
+
+    async def stats(self) -> dict:
+        async with self.db.reader() as conn:
+            cursor = await conn.execute("SELECT COUNT(*) FROM search_cache")
+            entries = (await cursor.fetchone())[0]
+        lookups = self._counts["hits"] + self._counts["stale"] + self._counts["misses"]
+        return {
+            "entries": entries,
+            **self._counts,
+            "hit_ratio": round((self._counts["hits"] + self._counts["stale"]) / lookups, 4) if lookups else 0.0,
+            "revalidating": len(self._inflight),
+            "ttl_seconds": self.ttl,
+            "max_stale_seconds": self.max_stale,
+        }
+
+    async def close(self):
+        tasks = list(self._inflight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -16,12 +16,107 @@ if sys.platform == 'win32':
 # Use absolute path for DB to avoid CWD issues
 # DB will be in the parent directory of src (i.e., project root)
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DB_NAME = os.path.join(PROJECT_ROOT, "amazon_cache.db")
-BASE_URL = "https://www.amazon.in"
+DB_NAME = os.environ.get("AMAZON_MCP_DB", os.path.join(PROJECT_ROOT, "amazon_cache.db"))
+BASE_URL = os.environ.get("AMAZON_MCP_BASE_URL", "https://www.amazon.in")
 CACHE_TTL = 3600  # 1 hour cache for products
+SEARCH_CACHE_MAX_STALE = 24 * 3600  # search results older than this block on a re-scrape instead of being served stale
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
     "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/14.0 Safari/605.1.15",
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:89.0) Gecko/20100101 Firefox/89.0",
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36"
 ]
+
+# Database connection pool
+DB_POOL_SIZE = int(os.environ.get("AMAZON_MCP_DB_POOL_SIZE", "4"))  # read connections; writes use one dedicated connection
+DB_BUSY_TIMEOUT_MS = 5000
+DB_MMAP_SIZE = 256 * 1024 * 1024
+DB_CACHE_SIZE_KB = 64 * 1024
+
+# Group commit: the writer flushes once this many mutations are queued or the delay (seconds) elapses
+WRITE_BATCH_SIZE = int(os.environ.get("AMAZON_MCP_WRITE_BATCH_SIZE", "256"))
+WRITE_BATCH_DELAY = float(os.environ.get("AMAZON_MCP_WRITE_BATCH_DELAY", "0.005"))
+
+# HTTP transport: HTTP/2 when the h2 package is installed, keep-alive pool and split timeouts (seconds)
+HTTP2 = os.environ.get("AMAZON_MCP_HTTP2", "1").lower() in ("1", "true", "yes")
+HTTP_MAX_CONNECTIONS = int(os.environ.get("AMAZON_MCP_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("AMAZON_MCP_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = 30.0
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("AMAZON_MCP_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("AMAZON_MCP_HTTP_READ_TIMEOUT", "20"))
+HTTP_POOL_TIMEOUT = 10.0
+
+# Outbound scraping: shared request rate (per second, 0 disables) and burst size
+SCRAPE_RATE = float(os.environ.get("AMAZON_MCP_SCRAPE_RATE", "5"))
+SCRAPE_BURST = int(os.environ.get("AMAZON_MCP_SCRAPE_BURST", "10"))
+# Retries of throttled/failed fetches with jittered exponential backoff (seconds); Retry-After is honoured up to the max delay
+SCRAPE_RETRIES = int(os.environ.get("AMAZON_MCP_SCRAPE_RETRIES", "3"))
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = float(os.environ.get("AMAZON_MCP_RETRY_MAX_DELAY", "20"))
+# Circuit breaker: consecutive failed fetches that open it, and seconds it stays open before one probe request
+BREAKER_THRESHOLD = int(os.environ.get("AMAZON_MCP_BREAKER_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("AMAZON_MCP_BREAKER_RESET_TIMEOUT", "30"))
+# Queries batch_search scrapes at the same time
+BATCH_CONCURRENCY = int(os.environ.get("AMAZON_MCP_BATCH_CONCURRENCY", "4"))
+
+# Scrape job queue: with SCRAPE_JOBS on, refresh_cache, batch_search and the price watch hand their fetches to
+# `python -m src.worker` processes through the scrape_jobs table instead of scraping in the server process.
+# Workers hold a job for JOB_LEASE seconds (renewed while it runs); a job whose worker died is claimed again,
+# up to JOB_MAX_ATTEMPTS times in total.
+SCRAPE_JOBS = os.environ.get("AMAZON_MCP_SCRAPE_JOBS", "0").lower() in ("1", "true", "yes")
+JOB_LEASE = float(os.environ.get("AMAZON_MCP_JOB_LEASE", "60"))
+JOB_MAX_ATTEMPTS = 3
+JOB_TIMEOUT = float(os.environ.get("AMAZON_MCP_JOB_TIMEOUT", "300"))  # how long the server waits for a result
+JOB_POLL_INTERVAL = 0.05
+WORKER_PROCESSES = int(os.environ.get("AMAZON_MCP_WORKER_PROCESSES", str(os.cpu_count() or 2)))
+WORKER_CONCURRENCY = int(os.environ.get("AMAZON_MCP_WORKER_CONCURRENCY", "4"))  # jobs in flight per process
+
+# Hot tier for get_product_details: in-process LRU of product records, served while last_updated is within CACHE_TTL.
+# access_count increments are buffered and flushed after HOT_CACHE_FLUSH_SIZE hits or every HOT_CACHE_FLUSH_INTERVAL seconds.
+HOT_CACHE_SIZE = int(os.environ.get("AMAZON_MCP_HOT_CACHE_SIZE", "2048"))  # entries; 0 disables
+HOT_CACHE_FLUSH_SIZE = 200
+HOT_CACHE_FLUSH_INTERVAL = 5.0
+
+# Retention: the cache is pruned every RETENTION_INTERVAL seconds (0 disables). Products beyond the count or file-size
+# cap are evicted least-used first (favorites never), history past its age cap is deleted, and freed pages go back to
+# the filesystem through incremental_vacuum. A cap of 0 means unlimited.
+RETENTION_INTERVAL = float(os.environ.get("AMAZON_MCP_RETENTION_INTERVAL", "600"))
+RETENTION_MAX_PRODUCTS = int(os.environ.get("AMAZON_MCP_RETENTION_MAX_PRODUCTS", "50000"))
+RETENTION_MAX_DB_MB = float(os.environ.get("AMAZON_MCP_RETENTION_MAX_DB_MB", "512"))
+RETENTION_HISTORY_DAYS = int(os.environ.get("AMAZON_MCP_RETENTION_HISTORY_DAYS", "365"))  # price_history
+RETENTION_SEARCH_HISTORY_DAYS = int(os.environ.get("AMAZON_MCP_RETENTION_SEARCH_HISTORY_DAYS", "90"))
+RETENTION_BATCH = 500  # rows deleted per transaction
+RETENTION_VACUUM_PAGES = 256  # pages released per transaction
+
+# Price watch: favorites are re-fetched on per-product intervals that halve after a price change and grow by half after
+# an unchanged check (WATCH_MIN_INTERVAL..WATCH_MAX_INTERVAL seconds), with at most WATCH_BUDGET fetches per hour in total (0 disables)
+WATCH_BUDGET = int(os.environ.get("AMAZON_MCP_WATCH_BUDGET", "120"))
+WATCH_INTERVAL = float(os.environ.get("AMAZON_MCP_WATCH_INTERVAL", "3600"))  # for newly added favorites
+WATCH_MIN_INTERVAL = float(os.environ.get("AMAZON_MCP_WATCH_MIN_INTERVAL", "900"))
+WATCH_MAX_INTERVAL = float(os.environ.get("AMAZON_MCP_WATCH_MAX_INTERVAL", str(24 * 3600)))
+WATCH_TICK = 30.0  # seconds between scheduler passes
+
+# refresh_cache worker pool
+REFRESH_WORKERS = int(os.environ.get("AMAZON_MCP_REFRESH_WORKERS", "4"))
+REFRESH_WRITE_BATCH = 50  # refreshed products written per transaction
+
+# HTML parsing: backend ("html.parser", "lxml" or "selectolax") and where it runs ("thread", "process" or "inline")
+PARSER_BACKEND = os.environ.get("AMAZON_MCP_PARSER", "html.parser")
+PARSER_EXECUTOR = os.environ.get("AMAZON_MCP_PARSER_EXECUTOR", "thread")
+PARSER_WORKERS = int(os.environ.get("AMAZON_MCP_PARSER_WORKERS", "2"))
+
+# Raw HTML store for reparse_cache: compressed pages on disk, LRU-evicted above the cap (MB; 0 disables).
+# Pages fetched less than HTML_STORE_TTL seconds ago are reused instead of refetched.
+HTML_STORE_DIR = os.environ.get("AMAZON_MCP_HTML_STORE_DIR", os.path.join(PROJECT_ROOT, "html_store"))
+HTML_STORE_MAX_MB = float(os.environ.get("AMAZON_MCP_HTML_STORE_MB", "256"))
+HTML_STORE_TTL = float(os.environ.get("AMAZON_MCP_HTML_STORE_TTL", "300"))
+
+# get_metrics: optional Prometheus text file rewritten every interval (seconds) for local scraping
+METRICS_FILE = os.environ.get("AMAZON_MCP_METRICS_FILE", "")
+METRICS_FILE_INTERVAL = float(os.environ.get("AMAZON_MCP_METRICS_INTERVAL", "15"))
+
+# export_data / import_data: rows fetched or written per chunk
+TRANSFER_CHUNK_ROWS = int(os.environ.get("AMAZON_MCP_TRANSFER_CHUNK_ROWS", "5000"))
+
+# Tool responses: compact JSON (no indentation; orjson when installed) unless a call passes compact=false
+COMPACT_JSON = os.environ.get("AMAZON_MCP_COMPACT_JSON", "0").lower() in ("1", "true", "yes")
@@ -1,14 +1,290 @@
 
+import asyncio
+import re
+import sqlite3
+import time
+from datetime import date, datetime, timedelta, timezone
+from contextlib import asynccontextmanager
 import aiosqlite
-from .config import DB_NAME, logger
+from .writer import GroupCommitWriter
+from .metrics import metrics
+from .normalize import parse_count, parse_price_paise, parse_rating
+from .models import PricePoint, Product, row_factory
+from .config import DB_NAME, DB_POOL_SIZE, DB_BUSY_TIMEOUT_MS, DB_MMAP_SIZE, DB_CACHE_SIZE_KB, logger
+
+# Shared mutation statements, submitted through AmazonDatabase.write_batch()
+# Search listings fill new rows; on a known product they only refresh the listing fields they actually carry
+# (price, rating, reviews, image), so nothing a product page wrote is replaced by a blank or a truncated listing title.
+# The parser's placeholders for a missing field ('N/A' price or rating, "0" reviews, "" image) count as not carried,
+# and a listing's zero reviews never replaces a real count.
+# last_updated is left alone: it dates the last product-page fetch, which a listing does not replace.
+INSERT_PRODUCT_SQL = """INSERT INTO products (id, title, url, price, rating, reviews_count, image_url, last_updated,
+                                              price_paise, rating_value, reviews_total)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET price = COALESCE(NULLIF(excluded.price, 'N/A'), price),
+                            rating = COALESCE(NULLIF(excluded.rating, 'N/A'), rating),
+                            reviews_count = COALESCE(NULLIF(excluded.reviews_count, '0'), reviews_count),
+                            image_url = COALESCE(NULLIF(excluded.image_url, ''), image_url),
+                            price_paise = COALESCE(excluded.price_paise, price_paise),
+                            rating_value = COALESCE(excluded.rating_value, rating_value),
+                            reviews_total = COALESCE(NULLIF(excluded.reviews_total, 0), reviews_total)
+                        ON CONFLICT DO NOTHING"""
+# Change points only: a price is recorded when its amount differs from the product's latest recorded one.
+# Unavailable prices (no price_paise) are not points at all, so a price that comes and goes adds no rows.
+INSERT_PRICE_SQL = """INSERT INTO price_history (product_id, price, price_paise)
+                      SELECT ?1, ?2, ?3
+                      WHERE ?3 IS NOT NULL
+                        AND ?3 IS NOT (SELECT price_paise FROM price_history WHERE product_id = ?1 AND price_paise IS NOT NULL
+                                       ORDER BY timestamp DESC, id DESC LIMIT 1)"""
+INSERT_SEARCH_SQL = "INSERT INTO search_history (query, results_count) VALUES (?, ?)"
+
+def _numeric(value, text, parse):
+    # Scraped products carry the parsed value already; anything else is parsed here
+    return value if value is not None else parse(text)
+
+def utc_timestamp(epoch: float = None) -> str:
+    # Stored timestamps are UTC text, the clock of the CURRENT_TIMESTAMP column defaults; now unless an epoch is given
+    moment = datetime.now(timezone.utc) if epoch is None else datetime.fromtimestamp(epoch, timezone.utc)
+    return moment.replace(tzinfo=None).isoformat(" ")
+
+def product_row(product: Product, now) -> tuple:
+    # Parameters for INSERT_PRODUCT_SQL
+    return (
+        product.id, product.title, product.url, product.price, product.rating, product.reviews_count, product.image_url, now,
+        _numeric(product.price_paise, product.price, parse_price_paise),
+        _numeric(product.rating_value, product.rating, parse_rating),
+        _numeric(product.reviews_total, product.reviews_count, parse_count),
+    )
+
+def price_row(product_id: str, product: Product) -> tuple:
+    # Parameters for INSERT_PRICE_SQL
+    return (product_id, product.price, _numeric(product.price_paise, product.price, parse_price_paise))
+
+# Numeric columns added after the original schema: (table, column, type)
+NUMERIC_COLUMNS = (
+    ("products", "price_paise", "INTEGER"),
+    ("products", "rating_value", "REAL"),
+    ("products", "reviews_total", "INTEGER"),
+    ("price_history", "price_paise", "INTEGER"),
+)
+
+# Validators from the last product page fetch, sent back as conditional GET headers on refresh
+VALIDATOR_COLUMNS = (
+    ("products", "etag", "TEXT"),
+    ("products", "last_modified", "TEXT"),
+)
+
+async def _add_missing_columns(db, columns) -> bool:
+    added = False
+    for table, column, column_type in columns:
+        cursor = await db.execute(f"PRAGMA table_info({table})")
+        if column not in [row[1] for row in await cursor.fetchall()]:
+            await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+            added = True
+    return added
+
+PRODUCT_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_products_price_paise ON products (price_paise)",
+    "CREATE INDEX IF NOT EXISTS idx_products_rating_value ON products (rating_value)",
+    "CREATE INDEX IF NOT EXISTS idx_products_reviews_total ON products (reviews_total)",
+    "CREATE INDEX IF NOT EXISTS idx_products_category_price ON products (category, price_paise)",
+    "CREATE INDEX IF NOT EXISTS idx_products_last_updated ON products (last_updated)",  # incremental exports
+)
+
+PRICE_HISTORY_INDEX = "CREATE INDEX IF NOT EXISTS idx_price_history_product_time ON price_history (product_id, timestamp)"
+
+# Drops rows that repeat the previous price of the same product (history written before change-only inserts)
+COMPACT_PRICE_HISTORY_SQL = """
+    DELETE FROM price_history WHERE id IN (
+        SELECT id FROM (
+            SELECT id, price,
+                   LAG(price) OVER w AS previous,
+                   ROW_NUMBER() OVER w AS position
+            FROM price_history
+            WINDOW w AS (PARTITION BY product_id ORDER BY timestamp, id)
+        )
+        WHERE position > 1 AND price IS previous
+    )
+"""
+
+# get_price_history bucket sizes -> strftime() period keys
+PRICE_BUCKETS = {"hour": "%Y-%m-%d %H:00", "day": "%Y-%m-%d", "week": "%Y-W%W", "month": "%Y-%m"}
+
+# Per-period min/max/last over change points; the price carried into a period from an earlier one counts too
+PRICE_BUCKETS_SQL = """
+    WITH points AS (
+        SELECT id, timestamp, price, price_paise, strftime(:format, timestamp) AS period,
+               LAG(price_paise) OVER w AS previous_paise,
+               LAG(strftime(:format, timestamp)) OVER w AS previous_period
+        FROM price_history
+        WHERE product_id = :product_id AND timestamp < :until
+        WINDOW w AS (ORDER BY timestamp, id)
+    ),
+    samples AS (
+        SELECT period, price_paise, 1 AS change,
+               FIRST_VALUE(price) OVER (PARTITION BY period ORDER BY timestamp DESC, id DESC) AS last
+        FROM points WHERE timestamp >= :since
+        UNION ALL
+        SELECT period, previous_paise, 0, NULL FROM points
+        WHERE timestamp >= :since AND previous_period IS NOT period AND previous_paise IS NOT NULL
+    )
+    SELECT period, MIN(price_paise), MAX(price_paise), MAX(last), SUM(change)
+    FROM samples GROUP BY period ORDER BY period
+"""
+
+# PRAGMA user_version: one-time data migrations that have already been applied
+#   1: unchanged prices compacted out of price_history
+#   2: auto_vacuum = INCREMENTAL, so retention can hand freed pages back to the filesystem
+#   3: products.last_updated converted from local time to UTC
+SCHEMA_VERSION = 3
+AUTO_VACUUM_INCREMENTAL = 2
+
+# Version 3 converts only the stamps the application wrote with the local clock: datetime.now() values, stored with
+# fractional seconds. CURRENT_TIMESTAMP defaults and imported values are whole seconds and are left alone, and so
+# are the whole-second results, so running it again cannot shift a row twice.
+LOCAL_LAST_UPDATED_TO_UTC_SQL = """UPDATE products SET last_updated = datetime(last_updated, 'utc')
+                                   WHERE last_updated GLOB '????-??-??[ T]??:??:??.*'"""
+
+# Full-text index over products, kept in sync by triggers (external content: text lives in products only)
+FTS_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+           title, description, category,
+           content='products', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+       )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+           INSERT INTO products_fts (rowid, title, description, category)
+           VALUES (new.rowid, new.title, new.description, new.category);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+           INSERT INTO products_fts (products_fts, rowid, title, description, category)
+           VALUES ('delete', old.rowid, old.title, old.description, old.category);
+       END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF title, description, category ON products BEGIN
+           INSERT INTO products_fts (products_fts, rowid, title, description, category)
+           VALUES ('delete', old.rowid, old.title, old.description, old.category);
+           INSERT INTO products_fts (rowid, title, description, category)
+           VALUES (new.rowid, new.title, new.description, new.category);
+       END""",
+)
+
+# bm25 column weights (title, description, category); the popularity factor grows from 1x towards 2x with access_count
+FTS_SEARCH_SQL = """
+    SELECT p.* FROM products_fts f JOIN products p ON p.rowid = f.rowid
+    WHERE products_fts MATCH ? AND p.id != ?
+    ORDER BY bm25(products_fts, 10.0, 1.0, 4.0) * (1.0 + p.access_count / (p.access_count + 10.0))
+    LIMIT ? OFFSET ?
+"""
+
+def fts_query(text: str, match_any: bool = False, max_terms: int = 12) -> str:
+    # Quote every term so user input can never be parsed as FTS syntax
+    terms = []
+    for term in re.findall(r"\w+", (text or "").lower()):
+        if term not in terms:
+            terms.append(term)
+    quoted = [f'"{term}"' for term in terms[:max_terms]]
+    return (" OR " if match_any else " ").join(quoted)
+
+# Applied to every connection when it is opened
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    f"PRAGMA mmap_size = {DB_MMAP_SIZE}",
+    f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB}",
+    "PRAGMA temp_store = MEMORY",
+    f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}",
+)
+
+async def open_connection(db_path: str, read_only: bool = False) -> aiosqlite.Connection:
+    conn = await aiosqlite.connect(db_path)
+    for pragma in CONNECTION_PRAGMAS:
+        await conn.execute(pragma)
+    if read_only:
+        await conn.execute("PRAGMA query_only = ON")
+    return conn
+
+class ConnectionPool:
+    """Fixed set of long-lived connections handed out one caller at a time."""
+
+    def __init__(self, db_path: str, size: int, read_only: bool = False):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.read_only = read_only
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._connections = []
+        self._opened_at = None
+        # Stats
+        self._checkouts = 0
+        self._waited = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._busy_total = 0.0
+
+    async def open(self):
+        for _ in range(self.size):
+            conn = await open_connection(self.db_path, read_only=self.read_only)
+            self._connections.append(conn)
+            self._idle.put_nowait(conn)
+        self._opened_at = time.monotonic()
+
+    async def close(self):
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+        self._idle = asyncio.Queue()
+        self._opened_at = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        if self._opened_at is None:
+            raise RuntimeError("Connection pool is not open; call init_db() first")
+        requested = time.monotonic()
+        conn = await self._idle.get()
+        checked_out = time.monotonic()
+        wait = checked_out - requested
+        self._checkouts += 1
+        self._wait_total += wait
+        self._wait_max = max(self._wait_max, wait)
+        if wait > 0.001:
+            self._waited += 1
+        metrics.observe("queue", wait)
+        self._in_use += 1
+        self._peak_in_use = max(self._peak_in_use, self._in_use)
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                await conn.rollback()
+            self._in_use -= 1
+            self._busy_total += time.monotonic() - checked_out
+            self._idle.put_nowait(conn)
+
+    def stats(self) -> dict:
+        uptime = time.monotonic() - self._opened_at if self._opened_at else 0.0
+        return {
+            "size": self.size,
+            "in_use": self._in_use,
+            "peak_in_use": self._peak_in_use,
+            "checkouts": self._checkouts,
+            "checkouts_waited": self._waited,
+            "avg_wait_ms": round(self._wait_total / self._checkouts * 1000, 3) if self._checkouts else 0.0,
+            "max_wait_ms": round(self._wait_max * 1000, 3),
+            "utilisation": round(self._busy_total / (uptime * self.size), 4) if uptime else 0.0,
+        }
 
 class AmazonDatabase:
-    def __init__(self, db_path: str = DB_NAME):
+    def __init__(self, db_path: str = DB_NAME, pool_size: int = DB_POOL_SIZE):
         self.db_path = db_path
+        self.read_pool = ConnectionPool(db_path, pool_size, read_only=True)
+        self.write_pool = ConnectionPool(db_path, 1)
+        self.write_queue = GroupCommitWriter(self.write_pool)
+        self.has_fts = False
 
     async def init_db(self):
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            db = await open_connection(self.db_path)
+            try:
                 # Products Table
                 await db.execute("""
                     CREATE TABLE IF NOT EXISTS products (
@@ -60,12 +336,252 @@ class AmazonDatabase:
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                     )
                 """)
+
+
+                # Search Result Cache (normalised query -> ordered ASIN list)
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS search_cache (
+                        query TEXT PRIMARY KEY,
+                        asins TEXT NOT NULL,
+                        fetched_at REAL NOT NULL
+                    )
+                """)
+
+                # Raw HTML store index: URL -> content digest, and one row per compressed blob on disk
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS html_pages (
+                        url TEXT PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        digest TEXT NOT NULL,
+                        etag TEXT,
+                        last_modified TEXT,
+                        fetched_at REAL NOT NULL
+                    )
+                """)
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS html_blobs (
+                        digest TEXT PRIMARY KEY,
+                        codec TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        accessed_at REAL NOT NULL
+                    )
+                """)
+                await db.execute("CREATE INDEX IF NOT EXISTS idx_html_pages_digest ON html_pages (digest)")
+                await db.execute("CREATE INDEX IF NOT EXISTS idx_html_blobs_accessed ON html_blobs (accessed_at)")
+
+                # Price watch schedule per favorite (epoch seconds) and the price changes it found
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS price_watch (
+                        product_id TEXT PRIMARY KEY,
+                        interval REAL NOT NULL,
+                        next_check REAL NOT NULL,
+                        last_checked REAL,
+                        last_change REAL,
+                        checks INTEGER NOT NULL DEFAULT 0,
+                        changes INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS price_alerts (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        product_id TEXT NOT NULL,
+                        old_price TEXT,
+                        new_price TEXT,
+                        old_price_paise INTEGER,
+                        new_price_paise INTEGER,
+                        change_pct REAL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                await db.execute("CREATE INDEX IF NOT EXISTS idx_price_watch_next_check ON price_watch (next_check)")
+
+                # Durable scrape job queue shared with `python -m src.worker` processes (times are epoch seconds)
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS scrape_jobs (
+                        id TEXT PRIMARY KEY,
+                        kind TEXT NOT NULL,
+                        target TEXT NOT NULL,
+                        params TEXT,
+                        status TEXT NOT NULL DEFAULT 'queued',
+                        attempts INTEGER NOT NULL DEFAULT 0,
+                        lease_owner TEXT,
+                        lease_expires REAL,
+                        result TEXT,
+                        error TEXT,
+                        enqueued_at REAL NOT NULL,
+                        finished_at REAL
+                    )
+                """)
+                await db.execute("CREATE INDEX IF NOT EXISTS idx_scrape_jobs_status ON scrape_jobs (status, enqueued_at)")
+
+                # Numeric price/rating/review columns; existing rows are backfilled from the display strings
+                if await _add_missing_columns(db, NUMERIC_COLUMNS):
+                    await db.create_function("parse_price_paise", 1, parse_price_paise, deterministic=True)
+                    await db.create_function("parse_rating", 1, parse_rating, deterministic=True)
+                    await db.create_function("parse_count", 1, parse_count, deterministic=True)
+                    await db.execute("""
+                        UPDATE products SET price_paise = parse_price_paise(price), rating_value = parse_rating(rating),
+                            reviews_total = parse_count(reviews_count)
+                        WHERE price_paise IS NULL AND rating_value IS NULL AND reviews_total IS NULL
+                    """)
+                    await db.execute("UPDATE price_history SET price_paise = parse_price_paise(price) WHERE price_paise IS NULL")
+                    logger.info("Backfilled numeric price/rating/review columns")
+                await _add_missing_columns(db, VALIDATOR_COLUMNS)
+                for statement in PRODUCT_INDEXES:
+                    await db.execute(statement)
+                await db.execute(PRICE_HISTORY_INDEX)
+
+                cursor = await db.execute("PRAGMA user_version")
+                version = (await cursor.fetchone())[0]
+                if version < 1:
+                    cursor = await db.execute(COMPACT_PRICE_HISTORY_SQL)
+                    if cursor.rowcount > 0:
+                        logger.info(f"Compacted price history: removed {cursor.rowcount} unchanged prices")
+                cursor = await db.execute("PRAGMA auto_vacuum")
+                needs_vacuum = version < 2 and (await cursor.fetchone())[0] != AUTO_VACUUM_INCREMENTAL
+                # The timestamp conversion commits together with the version bump, after the VACUUM when there is one
+                if version < SCHEMA_VERSION and not needs_vacuum:
+                    await db.execute(LOCAL_LAST_UPDATED_TO_UTC_SQL)
+                    await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+                # Full-text index; backfilled once when added to an existing database
+                try:
+                    cursor = await db.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+                    fts_existed = await cursor.fetchone() is not None
+                    for statement in FTS_SCHEMA:
+                        await db.execute(statement)
+                    if not fts_existed:
+                        await db.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+                        logger.info("Built full-text index for existing products")
+                    self.has_fts = True
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"FTS5 unavailable, falling back to LIKE matching: {e}")
                 
                 await db.commit()
-                logger.info(f"Database initialized at {self.db_path}")
+
+                if needs_vacuum:
+                    # The mode only changes with a full VACUUM, which may renumber the products rowids the FTS index uses
+                    await db.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                    await db.execute("VACUUM")
+                    await db.execute(LOCAL_LAST_UPDATED_TO_UTC_SQL)
+                    if self.has_fts:
+                        await db.execute("INSERT INTO products_fts (products_fts) VALUES ('rebuild')")
+                    await db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+                    await db.commit()
+                    cursor = await db.execute("SELECT EXISTS (SELECT 1 FROM products)")
+                    if (await cursor.fetchone())[0]:
+                        logger.info("Switched the database to incremental auto_vacuum")
+            finally:
+                await db.close()
+
+            await self._open()
+            logger.info(f"Database initialized at {self.db_path} ({self.read_pool.size} readers + 1 writer)")
         except Exception as e:
             logger.error(f"Failed to initialize database: {e}")
             raise
 
+    async def _open(self):
+        if self.read_pool._opened_at is None:
+            await self.read_pool.open()
+            await self.write_pool.open()
+        self.write_queue.start()
+
+    async def connect(self):
+        # Pools and writer over a database another process (the server) initialises: no schema changes or migrations
+        await self._open()
+        async with self.reader() as conn:
+            cursor = await conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'")
+            self.has_fts = await cursor.fetchone() is not None
+
+    async def schema_version(self) -> int:
+        async with self.reader() as conn:
+            cursor = await conn.execute("PRAGMA user_version")
+            return (await cursor.fetchone())[0]
+
+    @asynccontextmanager
+    async def reader(self):
+        async with self.read_pool.acquire() as conn:
+            with metrics.timed("db"):
+                yield conn
+
+    def writer(self):
+        # Only the group-commit writer and retention's vacuum should need this; tools go through write()/write_batch()
+        return self.write_pool.acquire()
+
+    async def write(self, sql: str, params: tuple = ()):
+        await self.write_queue.submit([(sql, [params])])
+
+    async def write_many(self, sql: str, rows: list):
+        await self.write_queue.submit([(sql, rows)])
+
+    async def write_batch(self, statements: list):
+        # statements: [(sql, rows), ...] applied atomically in one transaction
+        await self.write_queue.submit(statements)
+
+    async def fetch(self, sql: str, params=(), record=Product) -> list:
+        # The one row-mapping path for tools: rows come back as `record` instances (plain dicts when record is None)
+        async with self.reader() as conn:
+            cursor = await conn.execute(sql, params)
+            cursor.row_factory = row_factory(record, cursor.description)
+            return await cursor.fetchall()
+
+    async def fetch_one(self, sql: str, params=(), record=Product):
+        async with self.reader() as conn:
+            cursor = await conn.execute(sql, params)
+            cursor.row_factory = row_factory(record, cursor.description)
+            return await cursor.fetchone()
+
+    async def search_products(self, text: str, limit: int = 10, exclude_id: str = "", match_any: bool = False, offset: int = 0) -> list:
+        # Ranked full-text lookup over cached products
+        match = fts_query(text, match_any=match_any)
+        if not match:
+            return []
+        if self.has_fts:
+            return await self.fetch(FTS_SEARCH_SQL, (match, exclude_id or "", limit, offset))
+        return await self.fetch(
+            "SELECT * FROM products WHERE title LIKE ? AND id != ? ORDER BY access_count DESC LIMIT ? OFFSET ?",
+            (f"%{text}%", exclude_id or "", limit, offset)
+        )
+
+    async def price_history(self, product_id: str, since: str = None, until: str = None, bucket: str = None) -> list:
+        # since/until are inclusive UTC dates (YYYY-MM-DD), matching the CURRENT_TIMESTAMP history column
+        since = date.fromisoformat(since).isoformat() if since else ""
+        until = (date.fromisoformat(until) + timedelta(days=1)).isoformat() if until else "9999-12-31"
+        if not bucket:
+            return await self.fetch(
+                "SELECT price, timestamp AS date, price_paise FROM price_history "
+                "WHERE product_id = ? AND timestamp >= ? AND timestamp < ? ORDER BY timestamp DESC, id DESC",
+                (product_id, since, until), record=PricePoint
+            )
+        if bucket not in PRICE_BUCKETS:
+            raise ValueError(f"Unknown bucket: {bucket} (choose from {', '.join(PRICE_BUCKETS)})")
+        async with self.reader() as conn:
+            cursor = await conn.execute(PRICE_BUCKETS_SQL, {
+                "format": PRICE_BUCKETS[bucket], "product_id": product_id, "since": since, "until": until,
+            })
+            rows = await cursor.fetchall()
+        return [
+            {
+                "period": period,
+                "min": low / 100 if low is not None else None,
+                "max": high / 100 if high is not None else None,
+                "last": last,
+                "changes": changes,
+            }
+            for period, low, high, last, changes in rows
+        ]
+
+    def pool_stats(self) -> dict:
+        return {"read": self.read_pool.stats(), "write": self.write_pool.stats()}
+
+    def writer_stats(self) -> dict:
+        return self.write_queue.stats()
+
+    async def close(self):
+        await self.write_queue.stop()
+        await self.read_pool.close()
+        await self.write_pool.close()
+
     async def get_connection(self):
-        return await aiosqlite.connect(self.db_path)
+        # Standalone connection outside the pool (scripts and tests); caller closes it
+        return await open_connection(self.db_path)
@@ -0,0 +1,114 @@
+import asyncio
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+from .config import CACHE_TTL, HOT_CACHE_FLUSH_INTERVAL, HOT_CACHE_FLUSH_SIZE, HOT_CACHE_SIZE, logger
+from .metrics import metrics
+from .models import Product
+
+ACCESS_COUNT_SQL = "UPDATE products SET access_count = access_count + ? WHERE id = ?"
+
+def age_seconds(last_updated) -> Optional[float]:
+    # products.last_updated is UTC (utc_timestamp() text, or a naive datetime in UTC)
+    if last_updated is None:
+        return None
+    if not isinstance(last_updated, datetime):
+        try:
+            last_updated = datetime.fromisoformat(str(last_updated))
+        except ValueError:
+            return None
+    if last_updated.tzinfo is not None:
+        last_updated = last_updated.astimezone(timezone.utc).replace(tzinfo=None)
+    return (datetime.now(timezone.utc).replace(tzinfo=None) - last_updated).total_seconds()
+
+def is_fresh(product: Product, ttl: float = CACHE_TTL) -> bool:
+    age = age_seconds(product.last_updated)
+    return age is not None and age < ttl
+
+class HotCache:
+    """Bounded LRU of product records in front of the products table and the scraper, keyed by ASIN (or canonical URL)."""
+
+    def __init__(self, db, max_entries: int = HOT_CACHE_SIZE, ttl: float = CACHE_TTL,
+                 flush_size: int = HOT_CACHE_FLUSH_SIZE, flush_interval: float = HOT_CACHE_FLUSH_INTERVAL):
+        self.db = db
+        self.max_entries = max(0, max_entries)  # 0: nothing is cached, access counts are still buffered
+        self.ttl = ttl
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
+        self._entries: "OrderedDict[str, Product]" = OrderedDict()
+        self._pending: Dict[str, int] = {}  # access_count increments not yet written
+        self._pending_total = 0
+        self._counts = {"hits": 0, "misses": 0, "stale": 0, "evictions": 0, "invalidations": 0, "flushes": 0}
+
+    def get(self, key: str) -> Optional[Product]:
+        product = self._entries.get(key)
+        if product is None:
+            self._counts["misses"] += 1
+            metrics.count("cache_lookups", cache="hot", result="miss")
+            return None
+        if not is_fresh(product, self.ttl):
+            del self._entries[key]
+            self._counts["stale"] += 1
+            metrics.count("cache_lookups", cache="hot", result="stale")
+            return None
+        self._entries.move_to_end(key)
+        self._counts["hits"] += 1
+        metrics.count("cache_lookups", cache="hot", result="hit")
+        return product
+
+    def put(self, key: str, product: Product):
+        if not self.max_entries:
+            return
+        self._entries[key] = product
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counts["evictions"] += 1
+
+    def invalidate(self, keys: Iterable[str]):
+        # Rows rewritten elsewhere (search fills, refreshes) are reloaded from SQLite on next use
+        for key in keys:
+            if self._entries.pop(key, None) is not None:
+                self._counts["invalidations"] += 1
+
+    def clear(self):
+        self._counts["invalidations"] += len(self._entries)
+        self._entries.clear()
+
+    async def touch(self, key: str):
+        # One more access: applied to the cached record now, to the table on the next flush
+        self._pending[key] = self._pending.get(key, 0) + 1
+        self._pending_total += 1
+        product = self._entries.get(key)
+        if product is not None and product.access_count is not None:
+            product.access_count += 1
+        if self._pending_total >= self.flush_size:
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+        rows = [(n, key) for key, n in self._pending.items()]
+        self._pending = {}
+        self._pending_total = 0
+        await self.db.write_many(ACCESS_COUNT_SQL, rows)
+        self._counts["flushes"] += 1
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"access_count flush failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self._counts["hits"] + self._counts["misses"] + self._counts["stale"]
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            **self._counts,
+            "hit_ratio": round(self._counts["hits"] / lookups, 4) if lookups else 0.0,
+            "pending_access_counts": self._pending_total,
+            "ttl_seconds": self.ttl,
+        }
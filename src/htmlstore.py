@@ -0,0 +1,197 @@
+import asyncio
+import hashlib
+import os
+import time
+import zlib
+from typing import List, Optional
+from .config import HTML_STORE_DIR, HTML_STORE_MAX_MB, logger
+from .metrics import metrics
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+UPSERT_PAGE_SQL = """INSERT INTO html_pages (url, kind, digest, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?, ?)
+                     ON CONFLICT(url) DO UPDATE SET kind = excluded.kind, digest = excluded.digest, etag = excluded.etag,
+                         last_modified = excluded.last_modified, fetched_at = excluded.fetched_at"""
+INSERT_BLOB_SQL = "INSERT OR IGNORE INTO html_blobs (digest, codec, size, accessed_at) VALUES (?, ?, ?, ?)"
+TOUCH_BLOB_SQL = "UPDATE html_blobs SET accessed_at = ? WHERE digest = ?"
+PAGE_SQL = """SELECT p.url, p.kind, p.digest, p.etag, p.last_modified, p.fetched_at, b.codec
+              FROM html_pages p JOIN html_blobs b ON b.digest = p.digest"""
+
+def compress(data: bytes) -> tuple:
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=6).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+def decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Page was stored with zstd but the zstandard package is not installed")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+class StoredPage:
+    __slots__ = ("url", "kind", "digest", "etag", "last_modified", "fetched_at", "codec", "html")
+
+    def __init__(self, url, kind, digest, etag, last_modified, fetched_at, codec, html=None):
+        self.url = url
+        self.kind = kind  # "search" or "details"
+        self.digest = digest
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.codec = codec
+        self.html = html
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+class HtmlStore:
+    """Fetched pages on disk: compressed blobs named by the SHA-256 of their HTML, indexed by URL, LRU-evicted above max_bytes."""
+
+    def __init__(self, db, root: str = HTML_STORE_DIR, max_mb: float = HTML_STORE_MAX_MB):
+        self.db = db
+        self.root = root
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self._bytes = None  # stored blob bytes, loaded on first use
+        self._writing = set()  # digests being written, so identical pages stored concurrently are counted once
+        self._evicting = asyncio.Lock()
+        self._counts = {"stored": 0, "deduplicated": 0, "hits": 0, "evicted": 0, "missing": 0}
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest)
+
+    async def _size(self) -> int:
+        if self._bytes is None:
+            async with self.db.reader() as conn:
+                cursor = await conn.execute("SELECT COALESCE(SUM(size), 0) FROM html_blobs")
+                self._bytes = (await cursor.fetchone())[0]
+        return self._bytes
+
+    def _write_blob(self, digest: str, data: bytes) -> Optional[tuple]:
+        # Runs in a thread; returns (codec, size) when a new blob was written
+        path = self._path(digest)
+        if os.path.exists(path):
+            return None
+        codec, blob = compress(data)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+        return codec, len(blob)
+
+    def _read_blob(self, digest: str, codec: str) -> Optional[str]:
+        try:
+            with open(self._path(digest), "rb") as f:
+                return decompress(codec, f.read()).decode("utf-8")
+        except FileNotFoundError:
+            return None
+
+    async def put(self, kind: str, url: str, html: str, etag: str = None, last_modified: str = None):
+        data = html.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        await self._size()
+        written = None
+        if digest not in self._writing:
+            self._writing.add(digest)
+            try:
+                written = await asyncio.to_thread(self._write_blob, digest, data)
+            finally:
+                self._writing.discard(digest)
+        now = time.time()
+        if written:
+            codec, size = written
+            self._bytes += size
+            self._counts["stored"] += 1
+        else:
+            codec, size = "", 0
+            self._counts["deduplicated"] += 1
+        await self.db.write_batch([
+            (INSERT_BLOB_SQL, [(digest, codec, size, now)] if written else []),
+            (TOUCH_BLOB_SQL, [] if written else [(now, digest)]),
+            (UPSERT_PAGE_SQL, [(url, kind, digest, etag, last_modified, now)]),
+        ])
+        if self._bytes > self.max_bytes:
+            await self.evict()
+
+    async def get(self, url: str, max_age: float = None) -> Optional[StoredPage]:
+        # The stored page for a URL (with its HTML), or None when absent or older than max_age seconds
+        rows = await self.db.fetch(PAGE_SQL + " WHERE p.url = ?", (url,), None)
+        page = StoredPage(**rows[0]) if rows else None
+        if page is not None and (max_age is None or page.age <= max_age):
+            page.html = await self.load(page)
+        if page is None or page.html is None:
+            metrics.count("cache_lookups", cache="html", result="miss")
+            return None
+        metrics.count("cache_lookups", cache="html", result="hit")
+        self._counts["hits"] += 1
+        await self.db.write(TOUCH_BLOB_SQL, (time.time(), page.digest))
+        return page
+
+    async def load(self, page: StoredPage) -> Optional[str]:
+        html = await asyncio.to_thread(self._read_blob, page.digest, page.codec)
+        if html is None:
+            self._counts["missing"] += 1
+        return html
+
+    async def touch(self, url: str):
+        # A 304 confirmed the stored copy is current
+        await self.db.write("UPDATE html_pages SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    async def pages(self, kind: str = None, limit: int = None, offset: int = 0) -> List[StoredPage]:
+        # Index entries (without HTML) in URL order, for reparsing in chunks
+        sql = PAGE_SQL + (" WHERE p.kind = ?" if kind else "") + " ORDER BY p.url LIMIT ? OFFSET ?"
+        params = ((kind,) if kind else ()) + (-1 if limit is None else limit, offset)
+        return [StoredPage(**row) for row in await self.db.fetch(sql, params, None)]
+
+    async def evict(self):
+        # Least recently used blobs go first until the store is back under 90% of its cap
+        target = int(self.max_bytes * 0.9)
+        async with self._evicting:
+            await self._evict(target)
+        logger.info(f"HTML store evicted to {self._bytes} bytes")
+
+    async def _evict(self, target: int):
+        while await self._size() > target:
+            victims = await self.db.fetch("SELECT digest, size FROM html_blobs ORDER BY accessed_at LIMIT 100", (), None)
+            if not victims:
+                self._bytes = 0
+                break
+            removed = []
+            for victim in victims:
+                if self._bytes <= target:
+                    break
+                removed.append((victim["digest"],))
+                self._bytes -= victim["size"]
+            await self.db.write_batch([
+                ("DELETE FROM html_pages WHERE digest = ?", removed),
+                ("DELETE FROM html_blobs WHERE digest = ?", removed),
+            ])
+            await asyncio.to_thread(self._unlink, [digest for digest, in removed])
+            self._counts["evicted"] += len(removed)
+
+    def _unlink(self, digests: List[str]):
+        for digest in digests:
+            try:
+                os.remove(self._path(digest))
+            except FileNotFoundError:
+                pass
+
+    async def stats(self) -> dict:
+        async with self.db.reader() as conn:
+            cursor = await conn.execute("SELECT kind, COUNT(*) FROM html_pages GROUP BY kind")
+            pages = dict(await cursor.fetchall())
+            cursor = await conn.execute("SELECT COUNT(*) FROM html_blobs")
+            blobs = (await cursor.fetchone())[0]
+        return {
+            "pages": pages,
+            "blobs": blobs,
+            "bytes": await self._size(),
+            "max_bytes": self.max_bytes,
+            "codec": "zstd" if zstandard is not None else "zlib",
+            **self._counts,
+        }
@@ -0,0 +1,147 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Dict, List, Optional
+from .config import JOB_POLL_INTERVAL, JOB_TIMEOUT, SCRAPE_BURST, SCRAPE_RATE, WORKER_PROCESSES, logger
+from .models import Product
+from .ratelimit import HostRateLimiter
+from .scraper import NOT_MODIFIED
+
+ENQUEUE_SQL = "INSERT INTO scrape_jobs (id, kind, target, params, enqueued_at) VALUES (?, ?, ?, ?, ?)"
+# Queued jobs, and running ones whose worker stopped renewing the lease; oldest first
+CLAIM_SQL = """
+    UPDATE scrape_jobs SET status = 'running', lease_owner = :owner, lease_expires = :expires, attempts = attempts + 1
+    WHERE id IN (
+        SELECT id FROM scrape_jobs
+        WHERE (status = 'queued' OR (status = 'running' AND lease_expires < :now)) AND attempts < :max_attempts
+        ORDER BY enqueued_at
+        LIMIT :limit
+    )
+    RETURNING id, kind, target, params, attempts
+"""
+CLAIMABLE_SQL = """SELECT 1 FROM scrape_jobs WHERE status = 'queued' OR (status = 'running' AND lease_expires < ?) LIMIT 1"""
+# Out of attempts with an expired lease: its worker died on every try
+ABANDON_SQL = """UPDATE scrape_jobs SET status = 'failed', error = 'lease expired', finished_at = ?
+                 WHERE status = 'running' AND lease_expires < ? AND attempts >= ?"""
+RENEW_SQL = "UPDATE scrape_jobs SET lease_expires = ? WHERE lease_owner = ? AND status = 'running'"
+# Only the current lease holder may finish a job, so a worker that lost its lease cannot overwrite a newer result
+COMPLETE_SQL = """UPDATE scrape_jobs SET status = 'done', result = ?, finished_at = ?, lease_owner = NULL
+                  WHERE id = ? AND lease_owner = ?"""
+FAIL_SQL = """UPDATE scrape_jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, error = ?,
+                  finished_at = ?, lease_owner = NULL, lease_expires = NULL
+              WHERE id = ? AND lease_owner = ?"""
+RELEASE_SQL = """UPDATE scrape_jobs SET status = 'queued', attempts = attempts - 1, lease_owner = NULL, lease_expires = NULL
+                 WHERE lease_owner = ? AND status = 'running'"""
+
+# With the job queue on, the server's own scraper and every worker process each get an equal slice of SCRAPE_RATE,
+# so together they stay within it. Both sides size the split from AMAZON_MCP_WORKER_PROCESSES.
+RATE_SHARES = WORKER_PROCESSES + 1
+
+def shared_limiter(shares: int = RATE_SHARES) -> HostRateLimiter:
+    return HostRateLimiter(SCRAPE_RATE / shares, max(1, SCRAPE_BURST // shares))
+
+def encode_result(result) -> str:
+    # search -> list of products, details -> product, NOT_MODIFIED or None
+    if result is NOT_MODIFIED:
+        return json.dumps({"not_modified": True})
+    if isinstance(result, list):
+        return json.dumps([p.to_dict() for p in result])
+    return json.dumps(result.to_dict() if result is not None else None)
+
+def decode_result(text: Optional[str]):
+    data = json.loads(text) if text else None
+    if isinstance(data, list):
+        return [Product.from_dict(p) for p in data]
+    if isinstance(data, dict):
+        return NOT_MODIFIED if data.get("not_modified") else Product.from_dict(data)
+    return None
+
+class JobFailed(Exception):
+    pass
+
+class JobQueue:
+    """Server side of the scrape_jobs table: enqueue jobs and wait for the workers' results."""
+
+    def __init__(self, db, poll_interval: float = JOB_POLL_INTERVAL, timeout: float = JOB_TIMEOUT):
+        self.db = db
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._waiters: Dict[str, asyncio.Future] = {}
+        self._poller = None
+        self._counts = {"enqueued": 0, "completed": 0, "failed": 0, "timed_out": 0}
+
+    async def run(self, kind: str, target: str, **params):
+        job_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[job_id] = future
+        await self.db.write(ENQUEUE_SQL, (job_id, kind, target, json.dumps(params), time.time()))
+        self._counts["enqueued"] += 1
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll())
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            # Nobody will read the result any more
+            self._counts["timed_out"] += 1
+            await self.db.write("DELETE FROM scrape_jobs WHERE id = ?", (job_id,))
+            raise
+        finally:
+            self._waiters.pop(job_id, None)
+
+    async def _poll(self):
+        # One query per interval for every job being waited on, however many callers there are
+        while self._waiters:
+            await asyncio.sleep(self.poll_interval)
+            ids = list(self._waiters)
+            try:
+                rows = await self.db.fetch(
+                    f"SELECT id, status, result, error FROM scrape_jobs WHERE id IN ({','.join('?' * len(ids))}) "
+                    "AND status IN ('done', 'failed')", ids, None
+                )
+                if rows:
+                    # Results are handed over once; the rows have served their purpose
+                    await self.db.write_many("DELETE FROM scrape_jobs WHERE id = ?", [(row["id"],) for row in rows])
+            except Exception as e:
+                logger.error(f"Scrape job poll failed: {e}")
+                continue
+            for row in rows:
+                future = self._waiters.get(row["id"])
+                if future is None or future.done():
+                    continue
+                if row["status"] == "done":
+                    self._counts["completed"] += 1
+                    future.set_result(decode_result(row["result"]))
+                else:
+                    self._counts["failed"] += 1
+                    future.set_exception(JobFailed(row["error"] or "failed"))
+
+    async def stats(self) -> dict:
+        rows = await self.db.fetch("SELECT status, COUNT(*) AS n FROM scrape_jobs GROUP BY status", (), None)
+        return {"jobs": {row["status"]: row["n"] for row in rows}, "waiting": len(self._waiters), **self._counts}
+
+    async def close(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+
+class QueuedScraper:
+    """AmazonScraper's search/get_details, run by worker processes through the job queue."""
+
+    def __init__(self, queue: JobQueue, local):
+        self.queue = queue
+        self.limiter = local.limiter  # reported by refresh_cache; the workers enforce their own share of the rate
+
+    async def search(self, query: str, page: int = 1) -> List[Product]:
+        try:
+            return await self.queue.run("search", query, page=page) or []
+        except (JobFailed, asyncio.TimeoutError) as e:
+            logger.error(f"Queued search for {query!r} failed: {str(e) or 'timed out'}")
+            return []
+
+    async def get_details(self, product_url: str, etag: str = None, last_modified: str = None):
+        try:
+            return await self.queue.run("details", product_url, etag=etag, last_modified=last_modified)
+        except (JobFailed, asyncio.TimeoutError) as e:
+            logger.error(f"Queued fetch of {product_url} failed: {str(e) or 'timed out'}")
+            return None
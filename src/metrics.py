@@ -0,0 +1,145 @@
+import asyncio
+import bisect
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Tuple
+from .config import logger
+
+# Upper bounds (seconds) of the latency buckets; the last bucket is unbounded
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Tool whose call is running in this context; background tasks inherit it from the call that started them.
+# Calls are broken down into phases: queue (waiting for a DB connection or rate-limit token), db, fetch, parse,
+# serialize, and total for the whole call.
+current_tool: ContextVar[str] = ContextVar("current_tool", default="background")
+
+def label_value(value) -> str:
+    # Prometheus text format: backslash, double quote and newline are escaped inside label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    __slots__ = ("counts", "total", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q: float) -> float:
+        # Linear interpolation inside the bucket holding the q-th observation
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS[i - 1] if i else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(self.max, low + (high - low) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+    def summary(self) -> dict:
+        ms = lambda seconds: round(seconds * 1000, 3)
+        return {
+            "count": self.count,
+            "mean_ms": ms(self.total / self.count) if self.count else 0.0,
+            "p50_ms": ms(self.quantile(0.5)),
+            "p95_ms": ms(self.quantile(0.95)),
+            "p99_ms": ms(self.quantile(0.99)),
+            "max_ms": ms(self.max),
+        }
+
+class Metrics:
+    """Latency histograms per (tool, phase) and labelled counters, kept in process."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+
+    def observe(self, phase: str, seconds: float, tool: str = None):
+        key = (tool or current_tool.get(), phase)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = Histogram()
+        histogram.observe(seconds)
+
+    @contextmanager
+    def timed(self, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(phase, time.perf_counter() - started)
+
+    def count(self, name: str, n: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self._counters[key] = self._counters.get(key, 0) + n
+
+    def reset(self):
+        self.started = time.time()
+        self._histograms.clear()
+        self._counters.clear()
+
+    def snapshot(self) -> dict:
+        latency = {}
+        for (tool, phase), histogram in sorted(self._histograms.items()):
+            latency.setdefault(tool, {})[phase] = histogram.summary()
+        counters = {}
+        for (name, labels), value in sorted(self._counters.items()):
+            counters.setdefault(name, {})[",".join(f"{k}={v}" for k, v in labels) or "all"] = value
+        return {"uptime_seconds": round(time.time() - self.started, 3), "latency": latency, "counters": counters}
+
+    def prometheus(self) -> str:
+        # Text exposition format (version 0.0.4)
+        lines = [
+            "# HELP amazon_mcp_latency_seconds Tool call latency by phase",
+            "# TYPE amazon_mcp_latency_seconds histogram",
+        ]
+        for (tool, phase), histogram in sorted(self._histograms.items()):
+            labels = f'tool="{label_value(tool)}",phase="{label_value(phase)}"'
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float("inf"),), histogram.counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'amazon_mcp_latency_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"amazon_mcp_latency_seconds_sum{{{labels}}} {histogram.total:.6f}")
+            lines.append(f"amazon_mcp_latency_seconds_count{{{labels}}} {histogram.count}")
+        declared = set()
+        for (name, labels), value in sorted(self._counters.items()):
+            metric = f"amazon_mcp_{name}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            label_text = ",".join(f'{k}="{label_value(v)}"' for k, v in labels)
+            lines.append(f"{metric}{{{label_text}}} {value}" if label_text else f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, text: str = None):
+        # Atomic replace so a scraper (e.g. node_exporter's textfile collector) never reads a partial file
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.prometheus() if text is None else text)
+        os.replace(tmp, path)
+
+    async def export_loop(self, path: str, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Rendered on the loop (the registry is not thread-safe), written from a thread
+                await asyncio.to_thread(self.write_prometheus, path, self.prometheus())
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {path}: {e}")
+
+# Shared by every module so one get_metrics call sees the whole process
+metrics = Metrics()
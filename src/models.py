@@ -0,0 +1,61 @@
+from dataclasses import dataclass, fields
+from typing import Dict, Iterable, Optional
+
+@dataclass(slots=True)
+class Product:
+    """One products row; scraped results use the same record with the columns they know."""
+
+    id: Optional[str] = None
+    title: Optional[str] = None
+    url: Optional[str] = None
+    price: Optional[str] = None
+    rating: Optional[str] = None
+    reviews_count: Optional[str] = None
+    image_url: Optional[str] = None
+    category: Optional[str] = None
+    availability: Optional[str] = None
+    description: Optional[str] = None
+    specs: Optional[str] = None
+    created_at: Optional[str] = None
+    last_updated: Optional[str] = None
+    access_count: Optional[int] = None
+    price_paise: Optional[int] = None
+    rating_value: Optional[float] = None
+    reviews_total: Optional[int] = None
+    etag: Optional[str] = None  # HTTP validators of the last product page fetch
+    last_modified: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Product":
+        # Parser output and imported records; keys that are not columns are dropped
+        known = {k: v for k, v in data.items() if k in PRODUCT_FIELDS}
+        if "last_updated" not in known and "timestamp" in data:
+            known["last_updated"] = data["timestamp"]
+        return cls(**known)
+
+    def to_dict(self, only: Optional[Iterable[str]] = None) -> Dict:
+        return {name: getattr(self, name) for name in (only or PRODUCT_FIELDS)}
+
+@dataclass(slots=True)
+class PricePoint:
+    price: Optional[str]
+    date: str
+    price_paise: Optional[int] = None
+
+    def to_dict(self, only: Optional[Iterable[str]] = None) -> Dict:
+        return {name: getattr(self, name) for name in (only or PRICE_POINT_FIELDS)}
+
+PRODUCT_FIELDS = tuple(f.name for f in fields(Product))
+PRICE_POINT_FIELDS = tuple(f.name for f in fields(PricePoint))
+
+def row_factory(record, description):
+    # sqlite3 row factory for one result set; runs on the connection thread so no intermediate dicts reach the loop
+    names = tuple(d[0] for d in description)
+    if record is None:
+        return lambda cursor, row: dict(zip(names, row))
+    record_fields = tuple(f.name for f in fields(record))
+    if names == record_fields:
+        return lambda cursor, row: record(*row)
+    # Projections and column subsets go by name; columns the record does not know are skipped
+    keep = [(i, name) for i, name in enumerate(names) if name in record_fields]
+    return lambda cursor, row: record(**{name: row[i] for i, name in keep})
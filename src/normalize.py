@@ -0,0 +1,53 @@
+import re
+from typing import Optional
+
+# Scraped display strings -> numbers: "₹1,299.00" -> 129900 paise, "4.3 out of 5" -> 4.3, "12,345" / "1.2K" -> int
+
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+_COUNT_SUFFIX = {"k": 1_000, "m": 1_000_000, "l": 100_000, "lakh": 100_000, "cr": 10_000_000}
+
+def parse_price_paise(text) -> Optional[int]:
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return int(round(text * 100))
+    match = _NUMBER.search(str(text))  # price ranges keep their lower bound
+    if not match:
+        return None
+    return int(round(float(match.group(0).replace(",", "")) * 100))
+
+def parse_rating(text) -> Optional[float]:
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return float(text)
+    match = _NUMBER.search(str(text))
+    if not match:
+        return None
+    value = float(match.group(0).replace(",", ""))
+    return value if 0 <= value <= 5 else None
+
+def parse_count(text) -> Optional[int]:
+    if text is None:
+        return None
+    if isinstance(text, (int, float)):
+        return int(text)
+    text = str(text).strip().lower()
+    match = _NUMBER.search(text)
+    if not match:
+        return None
+    value = float(match.group(0).replace(",", ""))
+    suffix = re.match(r"\s*([a-z]+)", text[match.end():])
+    if suffix and suffix.group(1) in _COUNT_SUFFIX:
+        value *= _COUNT_SUFFIX[suffix.group(1)]
+    return int(round(value))
+
+def normalize_product(product: dict) -> dict:
+    # Adds the numeric columns next to the display strings
+    if 'price' in product:
+        product['price_paise'] = parse_price_paise(product['price'])
+    if 'rating' in product:
+        product['rating_value'] = parse_rating(product['rating'])
+    if 'reviews_count' in product:
+        product['reviews_total'] = parse_count(product['reviews_count'])
+    return product
@@ -0,0 +1,214 @@
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+from .config import logger
+
+# Selectors shared by every backend so they all produce identical product dicts
+SEARCH_ITEM = '.s-result-item[data-component-type="s-search-result"]'
+SEARCH_TITLE = 'h2 a span'
+SEARCH_LINK = 'h2 a'
+SEARCH_PRICE = '.a-price .a-offscreen'
+SEARCH_RATING = '.a-icon-star-small .a-icon-alt'
+SEARCH_REVIEWS = '.a-size-base.s-underline-text'
+SEARCH_IMAGE = '.s-image'
+DETAIL_TITLE = '#productTitle'
+DETAIL_PRICES = ('.a-price .a-offscreen', '#priceblock_ourprice', '#priceblock_dealprice')
+DETAIL_DESCRIPTION = '#feature-bullets'
+DETAIL_AVAILABILITY = '#availability'
+
+class ParserBackend:
+    """Extraction logic lives here; subclasses only supply the DOM primitives."""
+
+    name = ""
+
+    def parse_document(self, html: str):
+        raise NotImplementedError
+
+    def select(self, node, css: str) -> list:
+        raise NotImplementedError
+
+    def select_one(self, node, css: str):
+        raise NotImplementedError
+
+    def text(self, node) -> str:
+        raise NotImplementedError
+
+    def attr(self, node, name: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def _required_attr(self, node, name: str) -> str:
+        value = self.attr(node, name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def parse_search(self, html: str, base_url: str) -> List[Dict]:
+        root = self.parse_document(html)
+        results = []
+        for item in self.select(root, SEARCH_ITEM):
+            try:
+                title_elem = self.select_one(item, SEARCH_TITLE)
+                link_elem = self.select_one(item, SEARCH_LINK)
+                price_elem = self.select_one(item, SEARCH_PRICE)
+                rating_elem = self.select_one(item, SEARCH_RATING)
+                reviews_elem = self.select_one(item, SEARCH_REVIEWS)
+                image_elem = self.select_one(item, SEARCH_IMAGE)
+
+                if title_elem is None or link_elem is None:
+                    continue
+
+                href = self._required_attr(link_elem, 'href')
+                results.append({
+                    'id': self.attr(item, 'data-asin'),
+                    'title': self.text(title_elem).strip(),
+                    'url': base_url + href if not href.startswith('http') else href,
+                    'price': self.text(price_elem).strip() if price_elem is not None else "N/A",
+                    'rating': self.text(rating_elem).strip().split(' out')[0] if rating_elem is not None else "N/A",
+                    'reviews_count': self.text(reviews_elem).strip() if reviews_elem is not None else "0",
+                    'image_url': self._required_attr(image_elem, 'src') if image_elem is not None else "",
+                    'source': 'amazon.in'
+                })
+            except Exception as e:
+                logger.error(f"Error parsing item: {e}")
+                continue
+        return results
+
+    def parse_details(self, html: str) -> Dict:
+        root = self.parse_document(html)
+        title_elem = self.select_one(root, DETAIL_TITLE)
+        price_elem = None
+        for css in DETAIL_PRICES:
+            price_elem = self.select_one(root, css)
+            if price_elem is not None:
+                break
+        description_elem = self.select_one(root, DETAIL_DESCRIPTION)
+        availability_elem = self.select_one(root, DETAIL_AVAILABILITY)
+        return {
+            'title': self.text(title_elem).strip() if title_elem is not None else "Unknown",
+            'price': self.text(price_elem).strip() if price_elem is not None else "N/A",
+            'description': self.text(description_elem).strip() if description_elem is not None else "",
+            'availability': self.text(availability_elem).strip() if availability_elem is not None else "Unknown",
+        }
+
+class SoupParser(ParserBackend):
+    name = "html.parser"
+
+    def __init__(self):
+        from bs4 import BeautifulSoup
+        self._soup = BeautifulSoup
+
+    def parse_document(self, html):
+        return self._soup(html, 'html.parser')
+
+    def select(self, node, css):
+        return node.select(css)
+
+    def select_one(self, node, css):
+        return node.select_one(css)
+
+    def text(self, node):
+        return node.text
+
+    def attr(self, node, name):
+        return node.get(name)
+
+class LxmlParser(ParserBackend):
+    name = "lxml"
+
+    def __init__(self):
+        import lxml.html
+        from lxml.cssselect import CSSSelector  # needs the cssselect package
+        self._fromstring = lxml.html.fromstring
+        self._compile = CSSSelector
+        self._selectors = {}
+
+    def _selector(self, css):
+        selector = self._selectors.get(css)
+        if selector is None:
+            selector = self._selectors[css] = self._compile(css)
+        return selector
+
+    def parse_document(self, html):
+        return self._fromstring(html)
+
+    def select(self, node, css):
+        return self._selector(css)(node)
+
+    def select_one(self, node, css):
+        matches = self._selector(css)(node)
+        return matches[0] if matches else None
+
+    def text(self, node):
+        return node.text_content()
+
+    def attr(self, node, name):
+        return node.get(name)
+
+class SelectolaxParser(ParserBackend):
+    name = "selectolax"
+
+    def __init__(self):
+        try:
+            from selectolax.lexbor import LexborHTMLParser as HTMLParser
+        except ImportError:  # selectolax < 0.3.13 only ships the Modest engine
+            from selectolax.parser import HTMLParser
+        self._parser = HTMLParser
+
+    def parse_document(self, html):
+        return self._parser(html)
+
+    def select(self, node, css):
+        return node.css(css)
+
+    def select_one(self, node, css):
+        return node.css_first(css)
+
+    def text(self, node):
+        return node.text(deep=True)
+
+    def attr(self, node, name):
+        return node.attributes.get(name)
+
+PARSER_BACKENDS = {cls.name: cls for cls in (SoupParser, LxmlParser, SelectolaxParser)}
+_instances: Dict[str, ParserBackend] = {}
+
+def get_parser(name: str) -> ParserBackend:
+    # One instance per backend per process (worker processes build their own)
+    parser = _instances.get(name)
+    if parser is None:
+        if name not in PARSER_BACKENDS:
+            raise ValueError(f"Unknown parser backend: {name} (choose from {', '.join(PARSER_BACKENDS)})")
+        parser = _instances[name] = PARSER_BACKENDS[name]()
+    return parser
+
+def resolve_parser(name: str) -> str:
+    # Optional backends fall back to html.parser when their package is missing
+    try:
+        get_parser(name)
+        return name
+    except ImportError as e:
+        logger.warning(f"Parser backend '{name}' unavailable ({e}); using html.parser")
+        return SoupParser.name
+
+def available_parsers() -> List[str]:
+    names = []
+    for name in PARSER_BACKENDS:
+        try:
+            get_parser(name)
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+# Module-level entry points so they can be shipped to a process pool
+def parse_search(backend: str, html: str, base_url: str) -> List[Dict]:
+    return get_parser(backend).parse_search(html, base_url)
+
+def parse_details(backend: str, html: str) -> Dict:
+    return get_parser(backend).parse_details(html)
+
+def make_executor(kind: str, workers: int) -> Optional[Executor]:
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="amazon-parse")
+    return None  # "inline": parse on the event loop
@@ -0,0 +1,91 @@
+import asyncio
+import time
+import urllib.parse
+
+# Responses that mean the host wants us to slow down
+THROTTLE_STATUSES = (429, 503)
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average with bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+        self.waited = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def pause(self, seconds: float):
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = min(self._tokens, 0.0)
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # The lock keeps waiters in FIFO order
+        async with self._lock:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                self.waited += pause
+                await asyncio.sleep(pause)
+            self._refill()
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                self.waited += delay
+                await asyncio.sleep(delay)
+                self._refill()
+            self._tokens -= 1
+
+class HostRateLimiter:
+    """One token bucket per host that backs off on throttling responses and recovers gradually (AIMD)."""
+
+    def __init__(self, rate: float, burst: int = 1, min_rate: float = 0.2, backoff: float = 0.5,
+                 recovery: float = 0.1, cooldown: float = 5.0):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min(min_rate, rate) if rate > 0 else 0
+        self.backoff = backoff
+        self.recovery = recovery  # requests/second regained per successful response
+        self.cooldown = cooldown
+        self._buckets = {}
+        self._throttled = {}
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urllib.parse.urlsplit(url).hostname or ""
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def acquire(self, url: str):
+        await self.bucket(url).acquire()
+
+    def observe(self, url: str, status: int):
+        bucket = self.bucket(url)
+        if self.rate <= 0:
+            return
+        if status in THROTTLE_STATUSES:
+            host = urllib.parse.urlsplit(url).hostname or ""
+            self._throttled[host] = self._throttled.get(host, 0) + 1
+            bucket.rate = max(self.min_rate, bucket.rate * self.backoff)
+            bucket.pause(self.cooldown)
+        elif status < 400 and bucket.rate < self.rate:
+            bucket.rate = min(self.rate, bucket.rate + self.recovery)
+
+    def stats(self) -> dict:
+        return {
+            host: {
+                "rate": round(bucket.rate, 3),
+                "max_rate": self.rate,
+                "throttled": self._throttled.get(host, 0),
+                "waited_seconds": round(bucket.waited, 3),
+            }
+            for host, bucket in self._buckets.items()
+        }
@@ -0,0 +1,149 @@
+import asyncio
+import time
+from .config import CACHE_TTL, REFRESH_WORKERS, REFRESH_WRITE_BATCH, logger
+from .database import INSERT_PRICE_SQL, INSERT_PRODUCT_SQL, price_row, product_row, utc_timestamp
+from .scraper import NOT_MODIFIED
+
+# Rows older than the TTL (or never stamped), most important first: older rows, popular rows and favourites
+REFRESH_CANDIDATES_SQL = """
+    SELECT p.id, p.url, p.etag, p.last_modified,
+           (julianday('now') - julianday(p.last_updated)) * 86400.0
+               * (1.0 + p.access_count / (p.access_count + 10.0))
+               * (CASE WHEN f.product_id IS NULL THEN 1.0 ELSE 2.0 END) AS priority
+    FROM products p LEFT JOIN favorites f ON f.product_id = p.id
+    WHERE p.last_updated IS NULL OR (julianday('now') - julianday(p.last_updated)) * 86400.0 > ?
+    ORDER BY priority DESC
+    LIMIT ?
+"""
+
+UPDATE_DETAILS_SQL = """UPDATE products SET price = ?, price_paise = ?, description = ?, availability = ?, etag = ?, last_modified = ?,
+                            last_updated = ? WHERE id = ?"""
+# 304 Not Modified: nothing to parse or store beyond the refresh time
+TOUCH_SQL = "UPDATE products SET last_updated = ? WHERE id = ?"
+# Re-parsed product pages: parsed fields only, the row keeps its refresh time and price history
+# Re-parsed search listings: like a search fill, but a known product also takes the re-parsed title (a product page
+# re-parsed in the same batch is applied afterwards and wins)
+REPARSE_LISTING_SQL = INSERT_PRODUCT_SQL.replace(
+    "DO UPDATE SET ", "DO UPDATE SET title = COALESCE(NULLIF(excluded.title, 'Unknown'), title), ", 1
+)
+REPARSE_DETAILS_SQL = """UPDATE products SET title = COALESCE(NULLIF(?, 'Unknown'), title), price = ?, price_paise = ?,
+                             description = ?, availability = ? WHERE id = ?"""
+
+class RefreshEngine:
+    """Re-scrapes stale cached products, most important first, with a pool of workers."""
+
+    def __init__(self, db, scraper, workers: int = REFRESH_WORKERS, write_batch: int = REFRESH_WRITE_BATCH, ttl: float = CACHE_TTL):
+        self.db = db
+        self.scraper = scraper
+        self.ttl = ttl
+        self.workers = max(1, workers)
+        self.write_batch = max(1, write_batch)
+        self.on_write = None  # called with the ids of every written batch (the server drops them from its hot cache)
+
+    async def run(self, limit: int, workers: int = None) -> dict:
+        started = time.monotonic()
+        async with self.db.reader() as conn:
+            cursor = await conn.execute(REFRESH_CANDIDATES_SQL, (self.ttl, limit))
+            rows = await cursor.fetchall()
+        # Already in priority order; workers take the next row as they free up
+        candidates = iter(rows)
+
+        progress = {"queued": len(rows), "refreshed": 0, "not_modified": 0, "failed": 0, "written": 0}
+        pending = []
+        unchanged = []
+
+        async def flush():
+            if not pending and not unchanged:
+                return
+            batch = pending[:]
+            touched = unchanged[:]
+            pending.clear()
+            unchanged.clear()
+            now = utc_timestamp()
+            prices = [price_row(pid, d) for pid, d in batch]
+            await self.db.write_batch([
+                (UPDATE_DETAILS_SQL, [
+                    (d.price, paise, d.description, d.availability, d.etag, d.last_modified, now, pid)
+                    for (pid, d), (_, _, paise) in zip(batch, prices)
+                ]),
+                (INSERT_PRICE_SQL, prices),
+                (TOUCH_SQL, [(now, pid) for pid in touched]),
+            ])
+            progress["written"] += len(batch) + len(touched)
+            if self.on_write is not None:
+                self.on_write([pid for pid, _ in batch] + touched)
+
+        async def worker():
+            while True:
+                row = next(candidates, None)
+                if row is None:
+                    return
+                pid, url, etag, last_modified, _ = row
+                try:
+                    details = await self.scraper.get_details(url, etag=etag, last_modified=last_modified)
+                except Exception as e:
+                    logger.error(f"Refresh failed for {pid}: {e}")
+                    details = None
+                if details is NOT_MODIFIED:
+                    unchanged.append(pid)
+                    progress["not_modified"] += 1
+                elif details:
+                    pending.append((pid, details))
+                    progress["refreshed"] += 1
+                else:
+                    progress["failed"] += 1
+                done = progress["refreshed"] + progress["not_modified"] + progress["failed"]
+                if len(pending) + len(unchanged) >= self.write_batch:
+                    await flush()
+                if done % 100 == 0:
+                    logger.info(f"Refresh progress: {done}/{progress['queued']}")
+
+        worker_count = max(1, min(workers or self.workers, len(rows) or 1))
+        await asyncio.gather(*(worker() for _ in range(worker_count)))
+        await flush()
+
+        elapsed = time.monotonic() - started
+        return {
+            **progress,
+            "workers": worker_count,
+            "elapsed_seconds": round(elapsed, 3),
+            "products_per_second": round((progress["refreshed"] + progress["not_modified"]) / elapsed, 2) if elapsed else 0.0,
+            "rate_limits": self.scraper.limiter.stats(),
+        }
+
+async def reparse_store(db, scraper, store, kind: str = None, limit: int = None, chunk: int = REFRESH_WRITE_BATCH) -> dict:
+    # Rebuild product rows from stored HTML with the current parser; no network traffic
+    started = time.monotonic()
+    report = {"pages": 0, "products": 0, "missing": 0, "failed": 0}
+    offset = 0
+    while limit is None or offset < limit:
+        pages = await store.pages(kind, chunk if limit is None else min(chunk, limit - offset), offset)
+        if not pages:
+            break
+        offset += len(pages)
+        details, listed = [], []
+        for page in pages:
+            report["pages"] += 1
+            page.html = await store.load(page)
+            if page.html is None:
+                report["missing"] += 1
+                continue
+            try:
+                products = await scraper.parse_page(page)
+            except Exception as e:
+                logger.error(f"Reparse failed for {page.url}: {e}")
+                report["failed"] += 1
+                continue
+            if page.kind == "search":
+                listed.extend((p, utc_timestamp(page.fetched_at)) for p in products)
+            else:
+                details.extend(p for p in products if p.id)
+        rows = [product_row(p, fetched) for p, fetched in listed]
+        await db.write_batch([
+            (REPARSE_LISTING_SQL, rows),
+            (REPARSE_DETAILS_SQL, [(d.title, d.price, d.price_paise, d.description, d.availability, d.id) for d in details]),
+        ])
+        report["products"] += len(rows) + len(details)
+
+    elapsed = time.monotonic() - started
+    return {**report, "elapsed_seconds": round(elapsed, 3)}
@@ -0,0 +1,73 @@
+import base64
+import binascii
+import json
+from typing import Iterable, List, Optional, Sequence
+from .config import COMPACT_JSON
+from .metrics import metrics
+
+try:
+    import orjson
+except ImportError:  # optional; compact responses fall back to the json module
+    orjson = None
+
+def _record(obj):
+    # Product / PricePoint records (orjson serialises them natively)
+    if hasattr(obj, "to_dict"):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def encode(data, compact: Optional[bool] = None) -> str:
+    with metrics.timed("serialize"):
+        return _encode(data, compact)
+
+def _encode(data, compact: Optional[bool]) -> str:
+    if compact is None:
+        compact = COMPACT_JSON
+    if not compact:
+        return json.dumps(data, indent=2, default=_record)
+    if orjson is not None:
+        try:
+            return orjson.dumps(data).decode()
+        except TypeError:  # e.g. integers beyond 64 bits
+            pass
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=_record)
+
+def check_fields(fields: Optional[Sequence[str]], allowed: Iterable[str]) -> List[str]:
+    if not fields:
+        return []
+    allowed = list(allowed)
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (choose from {', '.join(allowed)})")
+    return list(dict.fromkeys(fields))
+
+def select_list(fields: List[str], prefix: str = "") -> str:
+    # SQL column list for an already checked projection
+    return ", ".join(prefix + f for f in fields) if fields else prefix + "*"
+
+def project(rows: list, fields: List[str]) -> list:
+    if not fields:
+        return rows
+    return [row.to_dict(fields) if hasattr(row, "to_dict") else {f: row.get(f) for f in fields} for row in rows]
+
+def encode_cursor(tool: str, offset: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([tool, offset]).encode()).decode().rstrip("=")
+
+def decode_cursor(tool: str, cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        name, offset = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if name != tool or not isinstance(offset, int) or offset < 0:
+        raise ValueError("Invalid cursor")
+    return offset
+
+def paginate(tool: str, rows: list, offset: int, limit: int, paged: bool):
+    # rows holds up to limit + 1 items; the extra one only signals that another page exists
+    page = rows[:limit]
+    if not paged:
+        return page
+    more = len(rows) > limit
+    return {"results": page, "next_cursor": encode_cursor(tool, offset + limit) if more else None}
@@ -0,0 +1,162 @@
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta, timezone
+from .config import (RETENTION_BATCH, RETENTION_HISTORY_DAYS, RETENTION_INTERVAL, RETENTION_MAX_DB_MB, RETENTION_MAX_PRODUCTS,
+                     RETENTION_SEARCH_HISTORY_DAYS, RETENTION_VACUUM_PAGES, SEARCH_CACHE_MAX_STALE, logger)
+
+# Least valuable first: accesses per day of age (LFU decayed by last_updated), oldest first on ties.
+# Favorites are never candidates.
+EVICTION_CANDIDATES_SQL = """
+    SELECT id FROM products
+    WHERE id NOT IN (SELECT product_id FROM favorites WHERE product_id IS NOT NULL)
+    ORDER BY COALESCE(access_count, 1) / (1.0 + MAX(0.0, julianday('now') - COALESCE(julianday(last_updated), 0))),
+             last_updated
+    LIMIT ?
+"""
+EVICTABLE_COUNT_SQL = "SELECT COUNT(*) AS n FROM products WHERE id NOT IN (SELECT product_id FROM favorites WHERE product_id IS NOT NULL)"
+# Run as a script: sqlite3's execute() steps the pragma once, which releases a single page whatever the argument
+INCREMENTAL_VACUUM_SQL = "PRAGMA incremental_vacuum({pages});"
+
+# Tables pruned by age -> (key column, timestamp column); timestamps are UTC CURRENT_TIMESTAMP text
+AGED_TABLES = {
+    "price_history": ("id", "timestamp"),
+    "search_history": ("id", "created_at"),
+    "price_alerts": ("id", "created_at"),
+}
+
+def utc_cutoff(days: float) -> str:
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+class RetentionManager:
+    """Keeps the SQLite cache inside its caps: product count, history age and file size."""
+
+    def __init__(self, db, max_products: int = RETENTION_MAX_PRODUCTS, max_db_mb: float = RETENTION_MAX_DB_MB,
+                 history_days: int = RETENTION_HISTORY_DAYS, search_history_days: int = RETENTION_SEARCH_HISTORY_DAYS,
+                 batch_size: int = RETENTION_BATCH, vacuum_pages: int = RETENTION_VACUUM_PAGES, interval: float = RETENTION_INTERVAL):
+        self.db = db
+        self.max_products = max(0, max_products)
+        self.max_bytes = int(max_db_mb * 1024 * 1024)
+        self.ages = {"price_history": history_days, "search_history": search_history_days, "price_alerts": history_days}
+        self.batch_size = max(1, batch_size)
+        self.vacuum_pages = max(1, vacuum_pages)
+        self.interval = interval
+        self.on_evict = None  # called with the ids of every evicted batch (the server drops them from its hot cache)
+        self._lock = asyncio.Lock()
+        self._totals = {"runs": 0, "products": 0, "price_history": 0, "search_history": 0, "price_alerts": 0, "search_cache": 0,
+                        "pages_vacuumed": 0}
+        self._last_run = None
+
+    async def size(self) -> dict:
+        async with self.db.reader() as conn:
+            values = []
+            for pragma in ("page_count", "page_size", "freelist_count"):
+                cursor = await conn.execute(f"PRAGMA {pragma}")
+                values.append((await cursor.fetchone())[0])
+        pages, page_size, free = values
+        return {"bytes": pages * page_size, "free_bytes": free * page_size, "free_pages": free}
+
+    async def run(self) -> dict:
+        # One pass at a time; the background loop and an explicit call never interleave their deletes
+        async with self._lock:
+            started = time.monotonic()
+            report = {"products": 0, "price_history": 0, "search_history": 0, "price_alerts": 0, "search_cache": 0, "pages_vacuumed": 0}
+
+            for table, days in self.ages.items():
+                if days > 0:
+                    report[table] = await self._delete_aged(table, utc_cutoff(days))
+            rows = await self.db.fetch("SELECT query FROM search_cache WHERE fetched_at < ?",
+                                       (time.time() - SEARCH_CACHE_MAX_STALE,), None)
+            if rows:
+                # Too old to be served even stale; the next search scrapes anyway
+                await self.db.write_many("DELETE FROM search_cache WHERE query = ?", [(row["query"],) for row in rows])
+                report["search_cache"] = len(rows)
+
+            if self.max_products:
+                excess = (await self.db.fetch_one(EVICTABLE_COUNT_SQL, (), None))["n"] - self.max_products
+                if excess > 0:
+                    report["products"] += await self._evict(excess)
+            report["pages_vacuumed"] += await self._vacuum()
+
+            # File size: evict the estimated number of products to get to 90% of the cap, re-measuring after each round
+            for _ in range(3):
+                if not self.max_bytes:
+                    break
+                size = (await self.size())["bytes"]
+                if size <= self.max_bytes:
+                    break
+                count = (await self.db.fetch_one("SELECT COUNT(*) AS n FROM products", (), None))["n"]
+                if not count:
+                    break
+                evicted = await self._evict(math.ceil((size - self.max_bytes * 0.9) / (size / count)))
+                report["products"] += evicted
+                report["pages_vacuumed"] += await self._vacuum()
+                if not evicted:
+                    break
+
+            for key, n in report.items():
+                self._totals[key] += n
+            self._totals["runs"] += 1
+            report["seconds"] = round(time.monotonic() - started, 3)
+            report["finished_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")  # UTC, like the stored timestamps
+            self._last_run = report
+            if report["products"] or report["price_history"] or report["search_history"]:
+                logger.info(f"Retention: evicted {report['products']} products, {report['price_history']} price points, "
+                            f"{report['search_history']} searches; released {report['pages_vacuumed']} pages")
+            return report
+
+    async def _delete_aged(self, table: str, cutoff: str) -> int:
+        key, column = AGED_TABLES[table]
+        deleted = 0
+        while True:
+            rows = await self.db.fetch(f"SELECT {key} FROM {table} WHERE {column} < ? LIMIT ?", (cutoff, self.batch_size), None)
+            if not rows:
+                return deleted
+            await self.db.write_many(f"DELETE FROM {table} WHERE {key} = ?", [(row[key],) for row in rows])
+            deleted += len(rows)
+
+    async def _evict(self, n: int) -> int:
+        # Candidates are ranked once; deletes go in small transactions so other writers interleave
+        rows = await self.db.fetch(EVICTION_CANDIDATES_SQL, (n,), None)
+        ids = [row["id"] for row in rows]
+        for start in range(0, len(ids), self.batch_size):
+            chunk = [(pid,) for pid in ids[start:start + self.batch_size]]
+            await self.db.write_batch([
+                ("DELETE FROM price_history WHERE product_id = ?", chunk),
+                ("DELETE FROM products WHERE id = ?", chunk),
+            ])
+            if self.on_evict is not None:
+                self.on_evict([pid for pid, in chunk])
+        return len(ids)
+
+    async def _vacuum(self) -> int:
+        # vacuum_pages at a time, so queued writes get the connection in between
+        released = 0
+        free = (await self.size())["free_pages"]
+        while free > 0:
+            async with self.db.writer() as conn:
+                await conn.executescript(INCREMENTAL_VACUUM_SQL.format(pages=min(free, self.vacuum_pages)))
+            left = (await self.size())["free_pages"]
+            if left >= free:
+                break  # auto_vacuum is not INCREMENTAL on this file
+            released += free - left
+            free = left
+        return released
+
+    async def loop(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run()
+            except Exception as e:
+                logger.error(f"Retention pass failed: {e}")
+
+    async def stats(self) -> dict:
+        return {
+            "max_products": self.max_products,
+            "max_db_bytes": self.max_bytes,
+            "max_age_days": self.ages,
+            **(await self.size()),
+            "evicted": self._totals,
+            "last_run": self._last_run,
+        }
@@ -0,0 +1,107 @@
+import random
+import time
+import urllib.parse
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from .config import BREAKER_RESET_TIMEOUT, BREAKER_THRESHOLD, RETRY_BASE_DELAY, RETRY_MAX_DELAY
+
+# Responses worth another attempt: throttling and transient server errors
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    # "Full jitter": uniform over the exponential window so synchronised callers spread out
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    # Retry-After is either delta-seconds or an HTTP date
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the host's circuit is open."""
+
+class _Circuit:
+    __slots__ = ("failures", "open_until", "probing", "trips", "rejected")
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.trips = 0
+        self.rejected = 0
+
+class CircuitBreaker:
+    """Per-host breaker: opens after `threshold` consecutive failures and lets a single probe through once `reset_timeout` has passed."""
+
+    def __init__(self, threshold: int = BREAKER_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.threshold = max(1, threshold)
+        self.reset_timeout = reset_timeout
+        self._circuits = {}
+
+    def _circuit(self, url: str) -> _Circuit:
+        host = urllib.parse.urlsplit(url).hostname or ""
+        circuit = self._circuits.get(host)
+        if circuit is None:
+            circuit = self._circuits[host] = _Circuit()
+        return circuit
+
+    @staticmethod
+    def _state(circuit: _Circuit) -> str:
+        if not circuit.open_until:
+            return "closed"
+        return "open" if time.monotonic() < circuit.open_until else "half_open"
+
+    def state(self, url: str) -> str:
+        return self._state(self._circuit(url))
+
+    def before(self, url: str):
+        circuit = self._circuit(url)
+        state = self._state(circuit)
+        if state == "open" or (state == "half_open" and circuit.probing):
+            circuit.rejected += 1
+            raise CircuitOpenError(f"Circuit open for {urllib.parse.urlsplit(url).hostname}")
+        if state == "half_open":
+            circuit.probing = True
+
+    def success(self, url: str):
+        circuit = self._circuit(url)
+        circuit.failures = 0
+        circuit.open_until = 0.0
+        circuit.probing = False
+
+    def failure(self, url: str, hold: float = 0.0):
+        # hold: the host asked us (Retry-After) to stay away at least this long
+        circuit = self._circuit(url)
+        circuit.failures += 1
+        if circuit.failures >= self.threshold or circuit.probing or hold > 0:
+            circuit.open_until = time.monotonic() + max(self.reset_timeout, hold)
+            circuit.trips += 1
+        circuit.probing = False
+
+    def release(self, url: str):
+        # The request ended without telling us anything about the host; the next one may probe instead
+        self._circuit(url).probing = False
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            host: {
+                "state": self._state(circuit),
+                "consecutive_failures": circuit.failures,
+                "trips": circuit.trips,
+                "short_circuited": circuit.rejected,
+                "retry_in_seconds": round(max(0.0, circuit.open_until - now), 3),
+            }
+            for host, circuit in self._circuits.items()
+        }
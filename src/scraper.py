@@ -1,109 +1,257 @@
 
+import asyncio
+import importlib.util
 import httpx
 import urllib.parse
 import random
-from datetime import datetime
-from bs4 import BeautifulSoup
-from typing import List, Dict
-from .config import BASE_URL, USER_AGENTS, logger
+from typing import List
+from .config import (
+    BASE_URL, USER_AGENTS, SCRAPE_RATE, SCRAPE_BURST, PARSER_BACKEND, PARSER_EXECUTOR, PARSER_WORKERS,
+    HTTP2, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, HTTP_KEEPALIVE_EXPIRY, HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT,
+    HTTP_POOL_TIMEOUT, SCRAPE_RETRIES, RETRY_MAX_DELAY, HTML_STORE_TTL, logger,
+)
+from .parsers import make_executor, parse_details, parse_search, resolve_parser
+from .ratelimit import HostRateLimiter
+from .retry import RETRY_STATUSES, CircuitBreaker, CircuitOpenError, backoff_delay, parse_retry_after
+from .singleflight import SingleFlight
+from .cache import normalize_query
+from .normalize import normalize_product
+from .database import utc_timestamp
+from .models import Product
+from .metrics import metrics
+
+def extract_asin(product_url: str) -> str:
+    # ASIN from URL
+    asin = ""
+    if '/dp/' in product_url:
+        parts = product_url.split('/dp/')
+        if len(parts) > 1:
+            asin = parts[1].split('/')[0].split('?')[0]
+    return asin
+
+def canonical_product_url(product_url: str) -> str:
+    # Tracking parameters and slugs vary between links to the same product
+    asin = extract_asin(product_url)
+    if asin:
+        return f"{BASE_URL}/dp/{asin}"
+    return urllib.parse.urldefrag(product_url)[0]
+
+# get_details() result when the page has not changed since the given validators
+NOT_MODIFIED = object()
+
+def _installed(*modules: str) -> bool:
+    return any(importlib.util.find_spec(m) is not None for m in modules)
+
+def accept_encoding() -> str:
+    # httpx only decodes br / zstd when their optional packages are installed
+    encodings = ["gzip", "deflate"]
+    if _installed("brotli", "brotlicffi"):
+        encodings.append("br")
+    if _installed("zstandard"):
+        encodings.append("zstd")
+    return ", ".join(encodings)
 
 class AmazonScraper:
-    def __init__(self):
+    def __init__(self, base_url: str = BASE_URL):
+        self.base_url = base_url.rstrip('/')
+        self.http2 = HTTP2 and _installed("h2")  # pip install httpx[http2]
         self.client = httpx.AsyncClient(
             headers={
                 "User-Agent": random.choice(USER_AGENTS),
                 "Accept-Language": "en-US,en;q=0.9",
                 "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+                "Accept-Encoding": accept_encoding(),
             },
             follow_redirects=True,
-            timeout=30.0,
+            http2=self.http2,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+            ),
+            timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT),
             verify=False # Often helps with local SSL issues, though use with caution in prod
         )
+        self._transport = {"requests": 0, "not_modified": 0, "bytes_downloaded": 0, "http_versions": {},
+                           "retries": 0, "retry_wait_seconds": 0.0, "gave_up": 0}
+        # Shared by every caller so concurrent tools cannot exceed the configured per-host request rate
+        self.limiter = HostRateLimiter(SCRAPE_RATE, SCRAPE_BURST)
+        # While the site keeps failing, fetches fail fast and the tools answer from the cache
+        self.breaker = CircuitBreaker()
+        self.retries = SCRAPE_RETRIES
+        # Optional HtmlStore of fetched pages (wired up by the server) for reuse and reparse_cache
+        self.html_store = None
+        # Identical searches/detail fetches in flight at the same time share one request
+        self.singleflight = SingleFlight()
+        # HTML parsing runs off the event loop so other tool calls stay responsive
+        self.parser = resolve_parser(PARSER_BACKEND)
+        self.executor = make_executor(PARSER_EXECUTOR, PARSER_WORKERS)
+
+    async def _parse(self, fn, *args):
+        with metrics.timed("parse"):
+            if self.executor is None:
+                return fn(*args)
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def close(self):
+        await self.client.aclose()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
 
-    async def search(self, query: str, page: int = 1) -> List[Dict]:
-        url = f"{BASE_URL}/s?k={urllib.parse.quote(query)}&page={page}"
-        logger.info(f"Searching: {url}")
+    async def _fetch(self, url: str, headers: dict = None) -> httpx.Response:
+        # Retryable statuses and transport errors are retried with backoff; raises CircuitOpenError while the host is failing
+        attempt = 0
+        while True:
+            self.breaker.before(url)
+            try:
+                with metrics.timed("queue"):
+                    await self.limiter.acquire(url)
+                with metrics.timed("fetch"):
+                    response = await self.client.get(url, headers=headers)
+            except httpx.TransportError:
+                metrics.count("fetches", status="error")
+                self.breaker.failure(url)
+                if attempt >= self.retries:
+                    self._transport["gave_up"] += 1
+                    raise
+                delay = backoff_delay(attempt)
+            except httpx.HTTPError:
+                # TooManyRedirects, DecodingError, ...: the host answered badly; not worth a retry
+                metrics.count("fetches", status="error")
+                self.breaker.failure(url)
+                self._transport["gave_up"] += 1
+                raise
+            except BaseException:
+                # Cancelled without a verdict on the host; a half-open probe must not stay claimed
+                self.breaker.release(url)
+                raise
+            else:
+                self.limiter.observe(url, response.status_code)
+                self._transport["requests"] += 1
+                self._transport["bytes_downloaded"] += response.num_bytes_downloaded
+                versions = self._transport["http_versions"]
+                versions[response.http_version] = versions.get(response.http_version, 0) + 1
+                metrics.count("fetches", status=response.status_code)
+                metrics.count("fetched_bytes", response.num_bytes_downloaded)
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.success(url)
+                    return response
+                retry_after = parse_retry_after(response.headers.get("Retry-After")) or 0.0
+                if attempt >= self.retries or retry_after > RETRY_MAX_DELAY:
+                    # Not waiting that long here; keep the circuit open for at least the requested time instead
+                    self.breaker.failure(url, retry_after if retry_after > RETRY_MAX_DELAY else 0.0)
+                    self._transport["gave_up"] += 1
+                    return response
+                self.breaker.failure(url)
+                delay = max(backoff_delay(attempt), retry_after)
+            attempt += 1
+            self._transport["retries"] += 1
+            self._transport["retry_wait_seconds"] += delay
+            await asyncio.sleep(delay)
+
+    def transport_stats(self) -> dict:
+        stats = {"http2": self.http2, "accept_encoding": self.client.headers.get("Accept-Encoding"), **self._transport}
+        stats["retry_wait_seconds"] = round(stats["retry_wait_seconds"], 3)
+        return stats
+
+    async def search(self, query: str, page: int = 1) -> List[Product]:
+        return await self.singleflight.do(("search", normalize_query(query), page), lambda: self._search(query, page))
+
+    async def get_details(self, product_url: str, etag: str = None, last_modified: str = None):
+        # With validators from an earlier fetch an unchanged page returns NOT_MODIFIED instead of a Product
+        key = ("details", canonical_product_url(product_url), etag, last_modified)
+        return await self.singleflight.do(key, lambda: self._get_details(product_url, etag, last_modified))
+
+    async def _stored(self, url: str):
+        # A page fetched within HTML_STORE_TTL is reused rather than fetched again
+        if self.html_store is None:
+            return None
+        return await self.html_store.get(url, HTML_STORE_TTL)
+
+    async def _keep(self, kind: str, url: str, response: httpx.Response):
+        if self.html_store is None:
+            return
+        try:
+            await self.html_store.put(kind, url, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        except Exception as e:
+            logger.warning(f"Could not store page {url}: {e}")
+
+    async def parse_page(self, page) -> List[Product]:
+        # Products from a stored page, without touching the network
+        if page.kind == "search":
+            results = await self._parse(parse_search, self.parser, page.html, self.base_url)
+            return [Product.from_dict(normalize_product(p)) for p in results]
+        return [await self._details_product(page.url, page.html, page.etag, page.last_modified)]
+
+    async def _details_product(self, product_url: str, html: str, etag: str = None, last_modified: str = None) -> Product:
+        details = await self._parse(parse_details, self.parser, html)
+        asin = extract_asin(product_url)
+        return Product.from_dict(normalize_product({
+            'id': asin,
+            'url': f"{self.base_url}/dp/{asin}",
+            **details,
+            'etag': etag,
+            'last_modified': last_modified,
+            'timestamp': utc_timestamp()
+        }))
+
+    async def _search(self, query: str, page: int = 1) -> List[Product]:
+        url = f"{self.base_url}/s?k={urllib.parse.quote(query)}&page={page}"
         
         try:
-            response = await self.client.get(url)
-            # Response handling...
-            if response.status_code != 200:
-                logger.error(f"Failed to fetch search results: {response.status_code}")
-                # Fallback or retry logic could go here
-                return []
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            results = []
+            stored = await self._stored(url)
+            if stored is not None:
+                html = stored.html
+            else:
+                logger.info(f"Searching: {url}")
+                response = await self._fetch(url)
+                # Response handling...
+                if response.status_code != 200:
+                    logger.error(f"Failed to fetch search results: {response.status_code}")
+                    return []
+                html = response.text
+                await self._keep("search", url, response)
             
-            items = soup.select('.s-result-item[data-component-type="s-search-result"]')
-            
-            for item in items:
-                try:
-                    title_elem = item.select_one('h2 a span')
-                    link_elem = item.select_one('h2 a')
-                    price_elem = item.select_one('.a-price .a-offscreen')
-                    rating_elem = item.select_one('.a-icon-star-small .a-icon-alt')
-                    reviews_elem = item.select_one('.a-size-base.s-underline-text')
-                    image_elem = item.select_one('.s-image')
-                    
-                    if not title_elem or not link_elem:
-                        continue
-
-                    product = {
-                        'id': item.get('data-asin'),
-                        'title': title_elem.text.strip(),
-                        'url': BASE_URL + link_elem['href'] if not link_elem['href'].startswith('http') else link_elem['href'],
-                        'price': price_elem.text.strip() if price_elem else "N/A",
-                        'rating': rating_elem.text.strip().split(' out')[0] if rating_elem else "N/A",
-                        'reviews_count': reviews_elem.text.strip() if reviews_elem else "0",
-                        'image_url': image_elem['src'] if image_elem else "",
-                        'source': 'amazon.in'
-                    }
-                    results.append(product)
-                except Exception as e:
-                    logger.error(f"Error parsing item: {e}")
-                    continue
-                    
-            return results
+            results = await self._parse(parse_search, self.parser, html, self.base_url)
+            return [Product.from_dict(normalize_product(p)) for p in results]
+        except CircuitOpenError as e:
+            logger.warning(f"Search skipped: {e}")
+            return []
         except Exception as e:
             logger.error(f"Search error: {e}")
             return []
 
-    async def get_details(self, product_url: str) -> Dict:
-        logger.info(f"Fetching details: {product_url}")
+    async def _get_details(self, product_url: str, etag: str = None, last_modified: str = None):
+        key = canonical_product_url(product_url)
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
         try:
-            response = await self.client.get(product_url)
+            stored = await self._stored(key)
+            if stored is not None:
+                return await self._details_product(product_url, stored.html, stored.etag, stored.last_modified)
+            logger.info(f"Fetching details: {product_url}")
+            response = await self._fetch(product_url, headers)
+            if response.status_code == 304 and headers:
+                self._transport["not_modified"] += 1
+                if self.html_store is not None:
+                    await self.html_store.touch(key)
+                return NOT_MODIFIED
             if response.status_code != 200:
-                return {}
+                return None
                 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract basic details
-            title_elem = soup.select_one('#productTitle')
-            price_elem = soup.select_one('.a-price .a-offscreen') or soup.select_one('#priceblock_ourprice') or soup.select_one('#priceblock_dealprice')
-            
-            # Detailed description - scraping simplified for brevity
-            description_elem = soup.select_one('#feature-bullets')
-            availability_elem = soup.select_one('#availability')
-            
-            # ASIN from URL or page
-            asin = ""
-            if '/dp/' in product_url:
-                parts = product_url.split('/dp/')
-                if len(parts) > 1:
-                    asin = parts[1].split('/')[0]
-            
-            return {
-                'id': asin,
-                'title': title_elem.text.strip() if title_elem else "Unknown",
-                'price': price_elem.text.strip() if price_elem else "N/A",
-                'description': description_elem.text.strip() if description_elem else "",
-                'availability': availability_elem.text.strip() if availability_elem else "Unknown",
-                'timestamp': datetime.now().isoformat()
-            }
+            await self._keep("details", key, response)
+            return await self._details_product(
+                product_url, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified')
+            )
+        except CircuitOpenError as e:
+            logger.warning(f"Details skipped: {e}")
+            return None
         except Exception as e:
             logger.error(f"Details error: {e}")
-            return {}
+            return None
 
-    async def get_bestsellers(self, category: str = "electronics") -> List[Dict]:
+    async def get_bestsellers(self, category: str = "electronics") -> List[Product]:
         return []
@@ -1,453 +1,524 @@
 
 import asyncio
-import json
 import sqlite3
 import os
-from datetime import datetime
+import sys
+import time
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
 import mcp.types as types
 
-from .config import logger
-from .database import AmazonDatabase
-from .scraper import AmazonScraper
+from .config import (BATCH_CONCURRENCY, HTML_STORE_MAX_MB, METRICS_FILE, METRICS_FILE_INTERVAL, RETENTION_INTERVAL, SCRAPE_JOBS,
+                     WATCH_BUDGET, logger)
+from .database import AmazonDatabase, INSERT_PRODUCT_SQL, INSERT_PRICE_SQL, INSERT_SEARCH_SQL, product_row, price_row, utc_timestamp
+from .models import PRODUCT_FIELDS, Product
+from .scraper import NOT_MODIFIED, AmazonScraper, canonical_product_url, extract_asin
+from .cache import SearchResultCache, normalize_query
+from .refresh import RefreshEngine, reparse_store
+from .htmlstore import HtmlStore
+from .hotcache import HotCache, is_fresh
+from .retention import RetentionManager
+from .watch import PriceWatcher
+from .jobs import JobQueue, QueuedScraper, shared_limiter
+from .metrics import current_tool, metrics
+from .transfer import export_table, import_table
+from .tools import TOOLS
+from .responses import check_fields, decode_cursor, encode, encode_cursor, paginate, project, select_list
+
+TOOL_NAMES = frozenset(tool["name"] for tool in TOOLS)
+
+# Price bands (in rupees) for get_market_analytics
+PRICE_BAND_SQL = """CASE
+        WHEN price_paise < 50000 THEN 'under_500'
+        WHEN price_paise < 100000 THEN '500_1000'
+        WHEN price_paise < 500000 THEN '1000_5000'
+        WHEN price_paise < 2000000 THEN '5000_20000'
+        ELSE '20000_plus' END"""
+
+# filter_products sort keys -> ORDER BY (NULLs last so unparsed rows never lead)
+FILTER_SORTS = {
+    "price": "price_paise IS NULL, price_paise ASC",
+    "price_desc": "price_paise IS NULL, price_paise DESC",
+    "rating": "rating_value IS NULL, rating_value DESC",
+    "reviews": "reviews_total IS NULL, reviews_total DESC",
+}
+
+SEARCH_HISTORY_COLUMNS = ("id", "query", "results_count", "created_at")
 
 # Initialize components
 db = AmazonDatabase()
 scraper = AmazonScraper()
+# Bulk scraping (batch_search, refresh_cache, the price watch) goes to worker processes when the job queue is on;
+# interactive lookups always scrape in-process
+job_queue = JobQueue(db)
+if SCRAPE_JOBS:
+    scraper.limiter = shared_limiter()  # the workers take the other slices of the outbound rate
+background_scraper = QueuedScraper(job_queue, scraper) if SCRAPE_JOBS else scraper
+
+async def load_products(asins: list) -> list:
+    # Cached product rows in the order of the given ASIN list
+    if not asins:
+        return []
+    rows = await db.fetch(f"SELECT * FROM products WHERE id IN ({','.join('?' * len(asins))})", asins)
+    by_id = {product.id: product for product in rows}
+    return [by_id[asin] for asin in asins if asin in by_id]
+
+async def list_page(name: str, arguments: dict, sql: str, params: tuple = (), default_limit: int = 20,
+                    allowed=PRODUCT_FIELDS, prefix: str = "", record=Product) -> str:
+    # fields / cursor / compact handling shared by the list-style tools; sql selects "{columns}" and ends with ORDER BY
+    limit = arguments.get("limit", default_limit)
+    fields = check_fields(arguments.get("fields"), allowed)
+    offset = decode_cursor(name, arguments.get("cursor"))
+    rows = await db.fetch(sql.format(columns=select_list(fields, prefix)) + " LIMIT ? OFFSET ?", (*params, limit + 1, offset), record)
+    return encode(paginate(name, project(rows, fields), offset, limit, "cursor" in arguments), arguments.get("compact"))
+
+def cache_fill_statements(scraped: dict) -> list:
+    # Products, price history and search cache entries for {query: scraped products}, as one mutation
+    now = utc_timestamp()
+    products = [p for results in scraped.values() for p in results]
+    statements = [
+        (INSERT_PRODUCT_SQL, [product_row(p, now) for p in products]),
+        (INSERT_PRICE_SQL, [price_row(p.id, p) for p in products]),
+    ]
+    for query, results in scraped.items():
+        statements.append(search_cache.store_statement(query, [p.id for p in results]))
+    return statements
+
+async def scrape_search(query: str) -> list:
+    # Scrape a query and persist products, price history and the search cache entry together
+    scraped_results = await scraper.search(query)
+    if scraped_results:
+        await db.write_batch(cache_fill_statements({query: scraped_results}))
+        hot_cache.invalidate(p.id for p in scraped_results)
+    return scraped_results
+
+async def batch_search(queries: list, per_query: int = 3, concurrency: int = BATCH_CONCURRENCY) -> list:
+    # One entry per input query, in input order; normalised duplicates share a single lookup
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    scraped = {}
+
+    async def run(query):
+        entry = await search_cache.lookup(query)
+        state = search_cache.state(entry)
+        search_cache.record(state)
+        if state in ("fresh", "stale"):
+            products = await load_products(entry.asins[:per_query])
+            if products:
+                if state == "stale":
+                    search_cache.revalidate(query)
+                return "cached", products
+        async with semaphore:
+            results = await background_scraper.search(query)
+        if results:
+            scraped[query] = results
+            return "scraped", results[:per_query]
+        if entry:
+            products = await load_products(entry.asins[:per_query])
+            if products:
+                return "stale", products
+        return "empty", []
+
+    tasks = {}
+    for query in queries:
+        key = normalize_query(query)
+        if key and key not in tasks:
+            tasks[key] = asyncio.create_task(run(query))
+    if tasks:
+        await asyncio.wait(tasks.values())
+
+    # Persist every newly scraped query in one transaction
+    if scraped:
+        await db.write_batch(cache_fill_statements(scraped))
+        hot_cache.invalidate(p.id for results in scraped.values() for p in results)
+
+    entries = []
+    for query in queries:
+        task = tasks.get(normalize_query(query))
+        if task is None:
+            entries.append({"query": query, "status": "error", "error": "empty query", "results": []})
+        elif task.exception() is not None:
+            entries.append({"query": query, "status": "error", "error": str(task.exception()), "results": []})
+        else:
+            status, results = task.result()
+            entries.append({"query": query, "status": status, "results": results})
+    return entries
+
+search_cache = SearchResultCache(db, scrape_search)
+refresh_engine = RefreshEngine(db, background_scraper)
+# Recently served product records, in front of SQLite and the scraper
+hot_cache = HotCache(db)
+refresh_engine.on_write = hot_cache.invalidate
+# Size caps for the SQLite file, enforced in the background
+retention = RetentionManager(db)
+retention.on_evict = hot_cache.invalidate
+# Keeps favorites' prices fresh in the background
+price_watcher = PriceWatcher(db, background_scraper)
+price_watcher.on_write = hot_cache.invalidate
+# Fetched pages kept on disk so parsing changes can be applied with reparse_cache instead of re-scraping
+html_store = HtmlStore(db) if HTML_STORE_MAX_MB > 0 else None
+scraper.html_store = html_store
 
 # Server Definition
 server = Server("amazon-search")
 
 @server.list_tools()
 async def handle_list_tools() -> list[types.Tool]:
-    return [
-        types.Tool(
-            name="search_product",
-            description="Search Amazon.in products with intelligent caching",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "query": {"type": "string", "description": "Product name or keywords"},
-                    "limit": {"type": "integer", "description": "Max results (default: 10)"}
-                },
-                "required": ["query"]
-            }
-        ),
-        types.Tool(
-            name="get_product_details",
-            description="Get detailed product info including price, rating, reviews",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "url": {"type": "string", "description": "Product page URL"}
-                },
-                "required": ["url"]
-            }
-        ),
-        types.Tool(
-            name="get_trending_products",
-            description="Get trending products based on access patterns and cache",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "limit": {"type": "integer", "default": 20}
-                }
-            }
-        ),
-        types.Tool(
-            name="get_price_history",
-            description="Get historical price data for a product",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "product_id": {"type": "string", "description": "ASIN or Product ID"}
-                },
-                "required": ["product_id"]
-            }
-        ),
-        types.Tool(
-            name="add_to_favorites",
-            description="Add a product to favorites/watchlist",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "product_id": {"type": "string", "description": "ASIN or Product ID"},
-                    "url": {"type": "string", "description": "Product URL if ID unknown"}
-                },
-                "required": ["product_id"]
-            }
-        ),
-        types.Tool(
-            name="get_favorites",
-            description="List all favorite products",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "limit": {"type": "integer", "default": 50}
-                }
-            }
-        ),
-        types.Tool(
-            name="remove_from_favorites",
-            description="Remove a product from favorites",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "product_id": {"type": "string"}
-                },
-                "required": ["product_id"]
-            }
-        ),
-        types.Tool(
-            name="get_search_history",
-            description="Get recent search queries",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "limit": {"type": "integer", "default": 20}
-                }
-            }
-        ),
-
-        types.Tool(
-            name="get_product_recommendations",
-            description="Get product recommendations based on a product you like",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "product_id": {"type": "string", "description": "ASIN of product"},
-                    "limit": {"type": "integer", "default": 10}
-                },
-                "required": ["product_id"]
-            }
-        ),
-        types.Tool(
-            name="get_market_analytics",
-            description="Get price ranges and rating distribution analytics",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "category": {"type": "string", "description": "Category to analyze (optional)"}
-                }
-            }
-        ),
-        types.Tool(
-            name="search_by_category",
-            description="Search products by category (Electronics, Fashion, etc.)",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "category": {"type": "string", "description": "Category name"},
-                    "limit": {"type": "integer", "default": 10}
-                },
-                "required": ["category"]
-            }
-        ),
-        types.Tool(
-            name="get_latest_products",
-            description="Get latest products added to the cache",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "limit": {"type": "integer", "default": 20}
-                }
-            }
-        ),
-        types.Tool(
-            name="refresh_cache",
-            description="Refresh cached product data from Amazon",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "limit": {"type": "integer", "default": 10, "description": "Max items to refresh"}
-                }
-            }
-        ),
-        types.Tool(
-            name="batch_search",
-            description="Search multiple products at once",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "queries": {"type": "array", "items": {"type": "string"}}
-                },
-                "required": ["queries"]
-            }
-        ),
-        types.Tool(
-            name="get_cache_stats",
-            description="Get database and cache statistics",
-            inputSchema={
-                "type": "object",
-                "properties": {}
-            }
-        ),
-        types.Tool(
-            name="clear_cache",
-            description="Clear all cached data",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "confirm": {"type": "boolean"}
-                },
-                "required": ["confirm"]
-            }
-        ),
-        types.Tool(
-            name="export_data",
-            description="Export product data to JSON",
-            inputSchema={
-                "type": "object",
-                "properties": {
-                    "filename": {"type": "string", "default": "amazon_export.json"}
-                }
-            }
-        )
-    ]
+    return [types.Tool(**tool) for tool in TOOLS]
 
 @server.call_tool()
 async def handle_call_tool(
     name: str, arguments: dict | None
 ) -> list[types.TextContent | types.ImageContent | types.EmbeddedResource]:
-    if not arguments:
-        arguments = {}
+    # Timed end to end; DB, fetch, parse and serialize time inside the call is attributed to the tool via current_tool.
+    # Names the client made up share one "unknown" series, so they cannot grow the metrics without bound.
+    token = current_tool.set(name if name in TOOL_NAMES else "unknown")
+    started = time.perf_counter()
+    try:
+        return await call_tool(name, arguments or {})
+    finally:
+        metrics.observe("total", time.perf_counter() - started)
+        metrics.count("tool_calls", tool=current_tool.get())
+        current_tool.reset(token)
+
+async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
 
-    conn = await db.get_connection()
-    
     try:
         if name == "search_product":
             query = arguments.get("query")
             limit = arguments.get("limit", 10)
+            fields = check_fields(arguments.get("fields"), PRODUCT_FIELDS)
+            offset = decode_cursor(name, arguments.get("cursor"))
+            window = slice(offset, offset + limit + 1)  # one extra to detect a next page
             
-            # Log history
-            await conn.execute("INSERT INTO search_history (query, results_count) VALUES (?, ?)", (query, 0))
-            await conn.commit()
-
-            # First check cache for exact match on title (fuzzy match would be better but keeping simple)
-            cursor = await conn.execute(
-                "SELECT * FROM products WHERE title LIKE ? ORDER BY access_count DESC LIMIT ?", 
-                (f"%{query}%", limit)
-            )
-            cached_results = await cursor.fetchall()
-            columns = [description[0] for description in cursor.description]
-            results = [dict(zip(columns, row)) for row in cached_results]
-            
-            if not results:
-                # Scrape
-                scraped_results = await scraper.search(query)
-                results = scraped_results[:limit]
-                
-                # Cache results
-                for p in results:
-                    await conn.execute(
-                        """INSERT OR IGNORE INTO products (id, title, url, price, rating, reviews_count, image_url, last_updated) 
-                           VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                        (p['id'], p['title'], p['url'], p['price'], p['rating'], p['reviews_count'], p['image_url'], datetime.now())
-                    )
-                    # Update price history
-                    await conn.execute("INSERT INTO price_history (product_id, price) VALUES (?, ?)", (p['id'], p['price']))
-                
-                await conn.commit()
-                
-                # Update history count
-                if results:
-                    await conn.execute("UPDATE search_history SET results_count = ? WHERE query = ? AND id = (SELECT MAX(id) FROM search_history)", (len(results), query))
-                    await conn.commit()
-
-            return [types.TextContent(type="text", text=json.dumps(results, indent=2))]
+            entry = await search_cache.lookup(query)
+            state = search_cache.state(entry)
+            search_cache.record(state)
+            # Paging past the end of a cached result list must not trigger a scrape
+            past_end = state in ("fresh", "stale") and offset >= len(entry.asins)
+
+            results = []
+            if state in ("fresh", "stale"):
+                results = await load_products(entry.asins[window])
+                if state == "stale":
+                    # Serve what we have and re-scrape in the background
+                    search_cache.revalidate(query)
+            if not results and not past_end:
+                results = (await search_cache.refresh(query))[window]
+            if not results and entry and not past_end:
+                # Scrape failed: an expired entry is better than nothing
+                results = await load_products(entry.asins[window])
+            if not results and not past_end:
+                # Fall back to a full-text match over cached products
+                results = await db.search_products(query, limit + 1, offset=offset)
+
+            if offset == 0:
+                await db.write(INSERT_SEARCH_SQL, (query, len(results[:limit])))
+
+            page = paginate(name, project(results, fields), offset, limit, "cursor" in arguments)
+            return [types.TextContent(type="text", text=encode(page, arguments.get("compact")))]
 
         elif name == "get_product_details":
             url = arguments.get("url")
-            # Try to scrape details
-            details = await scraper.get_details(url)
-            
-            if details and details.get('id'):
-                 # Update DB
-                await conn.execute(
-                    "UPDATE products SET description = ?, availability = ?, last_updated = ?, access_count = access_count + 1 WHERE id = ?",
-                    (details.get('description'), details.get('availability'), datetime.now(), details.get('id'))
+            asin = extract_asin(url)
+            key = asin or canonical_product_url(url)
+            # Hot tier, then a fresh SQLite row; only stale or unknown products reach the scraper
+            product = hot_cache.get(key)
+            cached = None
+            if product is None and asin:
+                cached = await db.fetch_one("SELECT * FROM products WHERE id = ?", (asin,))
+                # Rows only seen in search results have no description yet and still need the product page
+                if cached is not None and cached.description is not None and is_fresh(cached):
+                    product = cached
+                    hot_cache.put(key, product)
+
+            if product is None:
+                # Conditional fetch: an unchanged page costs a 304 and no parse
+                details = await scraper.get_details(
+                    url, etag=cached.etag if cached else None, last_modified=cached.last_modified if cached else None
                 )
-                await conn.commit()
-            
-            # Fetch full record
-            if details.get('id'):
-                cursor = await conn.execute("SELECT * FROM products WHERE id = ?", (details['id'],))
-                row = await cursor.fetchone()
-                if row:
-                    columns = [description[0] for description in cursor.description]
-                    details = dict(zip(columns, row))
+                now = utc_timestamp()
+                if details is NOT_MODIFIED:
+                    await db.write("UPDATE products SET last_updated = ? WHERE id = ?", (now, asin))
+                    cached.last_updated = now
+                    product = cached
+                elif not details or not details.id:
+                    if cached is None:
+                        return [types.TextContent(type="text", text=f"Could not fetch product details for {url}")]
+                    # Site failing or circuit open: the cached record is better than nothing
+                    return [types.TextContent(type="text", text=encode(cached, arguments.get("compact")))]
+                else:
+                    # Update DB
+                    await db.write(
+                        "UPDATE products SET description = ?, availability = ?, etag = ?, last_modified = ?, last_updated = ? WHERE id = ?",
+                        (details.description, details.availability, details.etag, details.last_modified, now, details.id)
+                    )
+                    product = details
+                    if cached is not None:
+                        # Full cached record with the fresh fields, without reading it back
+                        cached.description, cached.availability = details.description, details.availability
+                        cached.etag, cached.last_modified, cached.last_updated = details.etag, details.last_modified, now
+                        product = cached
+                if cached is not None:
+                    hot_cache.put(key, product)
 
-            return [types.TextContent(type="text", text=json.dumps(details, indent=2))]
+            # access_count is buffered and written in batches
+            await hot_cache.touch(product.id or key)
+
+            return [types.TextContent(type="text", text=encode(product, arguments.get("compact")))]
 
         elif name == "get_trending_products":
-            limit = arguments.get("limit", 20)
-            cursor = await conn.execute("SELECT * FROM products ORDER BY access_count DESC LIMIT ?", (limit,))
-            rows = await cursor.fetchall()
-            columns = [description[0] for description in cursor.description]
-            results = [dict(zip(columns, row)) for row in rows]
-            return [types.TextContent(type="text", text=json.dumps(results, indent=2))]
+            text = await list_page(name, arguments, "SELECT {columns} FROM products ORDER BY access_count DESC, id")
+            return [types.TextContent(type="text", text=text)]
 
         elif name == "get_price_history":
-            product_id = arguments.get("product_id")
-            cursor = await conn.execute("SELECT price, timestamp FROM price_history WHERE product_id = ? ORDER BY timestamp DESC", (product_id,))
-            rows = await cursor.fetchall()
-            history = [{"price": r[0], "date": r[1]} for r in rows]
-            return [types.TextContent(type="text", text=json.dumps(history, indent=2))]
+            history = await db.price_history(
+                arguments.get("product_id"), arguments.get("since"), arguments.get("until"), arguments.get("bucket")
+            )
+            return [types.TextContent(type="text", text=encode(history, arguments.get("compact")))]
 
         elif name == "add_to_favorites":
             product_id = arguments.get("product_id")
             try:
-                await conn.execute("INSERT INTO favorites (product_id) VALUES (?)", (product_id,))
-                await conn.commit()
+                await db.write("INSERT INTO favorites (product_id) VALUES (?)", (product_id,))
                 return [types.TextContent(type="text", text=f"Added {product_id} to favorites")]
             except sqlite3.IntegrityError:
                 return [types.TextContent(type="text", text=f"Product {product_id} already in favorites")]
 
         elif name == "get_favorites":
-            limit = arguments.get("limit", 50)
-            cursor = await conn.execute("""
-                SELECT p.* FROM products p 
-                JOIN favorites f ON p.id = f.product_id 
-                ORDER BY f.created_at DESC LIMIT ?
-            """, (limit,))
-            rows = await cursor.fetchall()
-            columns = [description[0] for description in cursor.description]
-            results = [dict(zip(columns, row)) for row in rows]
-            return [types.TextContent(type="text", text=json.dumps(results, indent=2))]
+            text = await list_page(name, arguments, """
+                SELECT {columns} FROM products p
+                JOIN favorites f ON p.id = f.product_id
+                ORDER BY f.created_at DESC, f.id DESC
+            """, default_limit=50, prefix="p.")
+            return [types.TextContent(type="text", text=text)]
 
         elif name == "remove_from_favorites":
             product_id = arguments.get("product_id")
-            await conn.execute("DELETE FROM favorites WHERE product_id = ?", (product_id,))
-            await conn.commit()
+            await db.write("DELETE FROM favorites WHERE product_id = ?", (product_id,))
             return [types.TextContent(type="text", text=f"Removed {product_id} from favorites")]
 
         elif name == "get_search_history":
-            limit = arguments.get("limit", 20)
-            cursor = await conn.execute("SELECT * FROM search_history ORDER BY created_at DESC LIMIT ?", (limit,))
-            rows = await cursor.fetchall()
-            columns = [description[0] for description in cursor.description]
-            results = [dict(zip(columns, row)) for row in rows]
-            return [types.TextContent(type="text", text=json.dumps(results, indent=2))]
+            text = await list_page(
+                name, arguments, "SELECT {columns} FROM search_history ORDER BY created_at DESC, id DESC",
+                allowed=SEARCH_HISTORY_COLUMNS, record=None
+            )
+            return [types.TextContent(type="text", text=text)]
 
         elif name == "batch_search":
             queries = arguments.get("queries", [])
-            results = {}
-            for q in queries:
-                # Reuse search logic (simplified)
-                search_res = await scraper.search(q)
-                results[q] = search_res[:3] # Top 3 per query
-            return [types.TextContent(type="text", text=json.dumps(results, indent=2))]
+            entries = await batch_search(
+                queries,
+                per_query=arguments.get("limit", 3),
+                concurrency=min(arguments.get("concurrency", BATCH_CONCURRENCY), 16)
+            )
+            # One content block per query so a failed query does not hide the others
+            return [types.TextContent(type="text", text=encode(e, arguments.get("compact"))) for e in entries]
 
         elif name == "get_cache_stats":
             stats = {}
-            async with conn.execute("SELECT COUNT(*) FROM products") as c:
-                stats["total_products"] = (await c.fetchone())[0]
-            async with conn.execute("SELECT COUNT(*) FROM favorites") as c:
-                stats["total_favorites"] = (await c.fetchone())[0]
-            async with conn.execute("SELECT COUNT(*) FROM search_history") as c:
-                stats["total_searches"] = (await c.fetchone())[0]
-            return [types.TextContent(type="text", text=json.dumps(stats, indent=2))]
+            async with db.reader() as conn:
+                async with conn.execute("SELECT COUNT(*) FROM products") as c:
+                    stats["total_products"] = (await c.fetchone())[0]
+                async with conn.execute("SELECT COUNT(*) FROM favorites") as c:
+                    stats["total_favorites"] = (await c.fetchone())[0]
+                async with conn.execute("SELECT COUNT(*) FROM search_history") as c:
+                    stats["total_searches"] = (await c.fetchone())[0]
+            stats["db_pool"] = db.pool_stats()
+            stats["db_writer"] = db.writer_stats()
+            stats["search_cache"] = await search_cache.stats()
+            stats["hot_cache"] = hot_cache.stats()
+            stats["retention"] = await retention.stats()
+            stats["price_watch"] = await price_watcher.stats()
+            stats["scrape_jobs"] = {"enabled": SCRAPE_JOBS, **(await job_queue.stats())}
+            stats["html_store"] = await html_store.stats() if html_store else None
+            stats["scraper"] = {
+                "coalescing": scraper.singleflight.stats(),
+                "rate_limits": scraper.limiter.stats(),
+                "transport": scraper.transport_stats(),
+                "circuit_breaker": scraper.breaker.stats(),
+            }
+            return [types.TextContent(type="text", text=encode(stats, arguments.get("compact")))]
         
+        elif name == "get_price_alerts":
+            # Alert ids only grow, so the cursor is the last id seen; it comes back unchanged when nothing is new
+            after = decode_cursor(name, arguments.get("cursor"))
+            alerts = await price_watcher.alerts(after, arguments.get("limit", 50), arguments.get("product_id"))
+            cursor = encode_cursor(name, alerts[-1]["id"] if alerts else after)
+            return [types.TextContent(type="text", text=encode({"alerts": alerts, "next_cursor": cursor}, arguments.get("compact")))]
+
+        elif name == "get_metrics":
+            if arguments.get("format") == "prometheus":
+                text = metrics.prometheus()
+            else:
+                text = encode(metrics.snapshot(), arguments.get("compact"))
+            if arguments.get("reset"):
+                metrics.reset()
+            return [types.TextContent(type="text", text=text)]
+
         elif name == "get_product_recommendations":
-             # Simple recommendation: same category or random
+             # Recommend cached products whose title/description/category overlap with this one
             product_id = arguments.get("product_id")
             limit = arguments.get("limit", 10)
             
-            # Find category of current product
-            cursor = await conn.execute("SELECT title FROM products WHERE id = ?", (product_id,))
-            row = await cursor.fetchone()
-            if row:
-                title_part = row[0].split(' ')[0] # Simple match on first word
-                cursor = await conn.execute("SELECT * FROM products WHERE title LIKE ? AND id != ? LIMIT ?", (f"%{title_part}%", product_id, limit))
-                rows = await cursor.fetchall()
-                columns = [description[0] for description in cursor.description]
-                results = [dict(zip(columns, row)) for row in rows]
-                return [types.TextContent(type="text", text=json.dumps(results, indent=2))]
+            product = await db.fetch_one("SELECT title, category FROM products WHERE id = ?", (product_id,))
+            if product:
+                results = await db.search_products(
+                    f"{product.title} {product.category or ''}", limit, exclude_id=product_id, match_any=True
+                )
+                return [types.TextContent(type="text", text=encode(results, arguments.get("compact")))]
             return [types.TextContent(type="text", text="Product not found or no recommendations")]
 
         elif name == "get_market_analytics":
-             # Basic aggregation
-            analytics = {}
-            async with conn.execute("SELECT AVG(access_count) FROM products") as c:
-                analytics["avg_popularity"] = (await c.fetchone())[0]
-            
-             # Count by approximate rating (if we parsed it properly as float, but it's text "4.5 out of 5")
-             # This is a bit rough due to text storage, but demonstrating intent
-            return [types.TextContent(type="text", text=json.dumps(analytics, indent=2))]
+            # Aggregated in SQL over the numeric columns
+            category = arguments.get("category")
+            where, params = ("WHERE category = ?", (category,)) if category else ("", ())
+            analytics = {"category": category}
+            async with db.reader() as conn:
+                async with conn.execute(f"""
+                    SELECT COUNT(*), AVG(access_count), MIN(price_paise), MAX(price_paise), AVG(price_paise),
+                           AVG(rating_value), SUM(reviews_total)
+                    FROM products {where}
+                """, params) as c:
+                    count, popularity, low, high, mean, rating, reviews = await c.fetchone()
+                analytics.update({
+                    "products": count,
+                    "avg_popularity": popularity,
+                    "price_range": {
+                        "min": low / 100 if low is not None else None,
+                        "max": high / 100 if high is not None else None,
+                        "avg": round(mean / 100, 2) if mean is not None else None,
+                    },
+                    "avg_rating": round(rating, 2) if rating is not None else None,
+                    "total_reviews": reviews or 0,
+                })
+                async with conn.execute(f"""
+                    SELECT CAST(rating_value AS INTEGER) AS stars, COUNT(*) FROM products
+                    {where + " AND" if where else "WHERE"} rating_value IS NOT NULL
+                    GROUP BY stars ORDER BY stars DESC
+                """, params) as c:
+                    analytics["rating_distribution"] = {f"{stars}-{stars + 1}": n for stars, n in await c.fetchall()}
+                async with conn.execute(f"""
+                    SELECT {PRICE_BAND_SQL} AS band, COUNT(*) FROM products
+                    {where + " AND" if where else "WHERE"} price_paise IS NOT NULL
+                    GROUP BY band ORDER BY MIN(price_paise)
+                """, params) as c:
+                    analytics["price_bands"] = dict(await c.fetchall())
+            return [types.TextContent(type="text", text=encode(analytics, arguments.get("compact")))]
+
+        elif name == "filter_products":
+            clauses, params = [], []
+            if arguments.get("min_price") is not None:
+                clauses.append("price_paise >= ?")
+                params.append(int(round(arguments["min_price"] * 100)))
+            if arguments.get("max_price") is not None:
+                clauses.append("price_paise <= ?")
+                params.append(int(round(arguments["max_price"] * 100)))
+            if arguments.get("min_rating") is not None:
+                clauses.append("rating_value >= ?")
+                params.append(arguments["min_rating"])
+            if arguments.get("min_reviews") is not None:
+                clauses.append("reviews_total >= ?")
+                params.append(arguments["min_reviews"])
+            if arguments.get("category"):
+                clauses.append("category = ?")
+                params.append(arguments["category"])
+            sort_by = arguments.get("sort_by", "price")
+            if sort_by not in FILTER_SORTS:
+                raise ValueError(f"Unknown sort_by: {sort_by} (choose from {', '.join(FILTER_SORTS)})")
+            where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+            params.append(arguments.get("limit", 20))
+            results = await db.fetch(f"SELECT * FROM products {where} ORDER BY {FILTER_SORTS[sort_by]} LIMIT ?", params)
+            return [types.TextContent(type="text", text=encode(results, arguments.get("compact")))]
 
         elif name == "search_by_category":
             category = arguments.get("category")
             limit = arguments.get("limit", 10)
             # Find closest Amazon category or just search with category keyword
             products = await scraper.search(category, page=1)
-            return [types.TextContent(type="text", text=json.dumps(products[:limit], indent=2))]
+            return [types.TextContent(type="text", text=encode(products[:limit], arguments.get("compact")))]
 
         elif name == "get_latest_products":
-            limit = arguments.get("limit", 20)
-            cursor = await conn.execute("SELECT * FROM products ORDER BY created_at DESC LIMIT ?", (limit,))
-            rows = await cursor.fetchall()
-            columns = [description[0] for description in cursor.description]
-            results = [dict(zip(columns, row)) for row in rows]
-            return [types.TextContent(type="text", text=json.dumps(results, indent=2))]
+            text = await list_page(name, arguments, "SELECT {columns} FROM products ORDER BY created_at DESC, id")
+            return [types.TextContent(type="text", text=text)]
 
         elif name == "refresh_cache":
             limit = arguments.get("limit", 10)
-            # Get oldest updated products
-            cursor = await conn.execute("SELECT id, url FROM products ORDER BY last_updated ASC LIMIT ?", (limit,))
-            rows = await cursor.fetchall()
-            
-            refreshed_count = 0
-            for row in rows:
-                pid, url = row
-                details = await scraper.get_details(url)
-                if details:
-                    await conn.execute(
-                        "UPDATE products SET price = ?, description = ?, availability = ?, last_updated = ? WHERE id = ?",
-                        (details.get('price'), details.get('description'), details.get('availability'), datetime.now(), pid)
-                    )
-                    # Update price history if changed? (simplified here)
-                    await conn.execute("INSERT INTO price_history (product_id, price) VALUES (?, ?)", (pid, details.get('price')))
-                    refreshed_count += 1
-            
-            await conn.commit()
-            return [types.TextContent(type="text", text=f"Refreshed {refreshed_count} products")]
+            report = await refresh_engine.run(limit, workers=arguments.get("workers"))
+            return [types.TextContent(type="text", text=encode(report, arguments.get("compact")))]
+
+        elif name == "reparse_cache":
+            if html_store is None:
+                return [types.TextContent(type="text", text="HTML store is disabled (AMAZON_MCP_HTML_STORE_MB=0)")]
+            report = await reparse_store(db, scraper, html_store, kind=arguments.get("kind"), limit=arguments.get("limit"))
+            hot_cache.clear()
+            return [types.TextContent(type="text", text=encode(report, arguments.get("compact")))]
 
         elif name == "clear_cache":
             if arguments.get("confirm"):
-                await conn.execute("DELETE FROM products")
-                await conn.execute("DELETE FROM price_history")
-                await conn.execute("DELETE FROM search_history")
-                await conn.commit()
+                await db.write_batch([
+                    ("DELETE FROM products", [()]),
+                    ("DELETE FROM price_history", [()]),
+                    ("DELETE FROM search_history", [()]),
+                ])
+                hot_cache.clear()
                 return [types.TextContent(type="text", text="Cache cleared successfully")]
             return [types.TextContent(type="text", text="Confirmation required to clear cache")]
 
         elif name == "export_data":
             filename = arguments.get("filename", "amazon_export.json")
-            cursor = await conn.execute("SELECT * FROM products")
-            rows = await cursor.fetchall()
-            columns = [description[0] for description in cursor.description]
-            data = [dict(zip(columns, row)) for row in rows]
-            
             filepath = os.path.join(os.getcwd(), filename)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2)
-            
-            return [types.TextContent(type="text", text=f"Data exported to {filepath}")]
+            # Streamed from a worker thread in chunks, so large caches never sit in memory
+            report = await export_table(
+                db.db_path, arguments.get("table", "products"), filepath,
+                fmt=arguments.get("format"), compress=arguments.get("gzip"), since=arguments.get("since")
+            )
+            return [types.TextContent(type="text", text=encode(report, arguments.get("compact")))]
+
+        elif name == "import_data":
+            filepath = os.path.join(os.getcwd(), arguments["filename"])
+            report = await import_table(
+                db, arguments.get("table", "products"), filepath, fmt=arguments.get("format"), compress=arguments.get("gzip")
+            )
+            hot_cache.clear()
+            return [types.TextContent(type="text", text=encode(report, arguments.get("compact")))]
 
         else:
             raise ValueError(f"Unknown tool: {name}")
 
     except Exception as e:
+        metrics.count("tool_errors", tool=name)
         logger.error(f"Error executing tool {name}: {e}")
         return [types.TextContent(type="text", text=f"Error: {str(e)}")]
-    finally:
-        await conn.close()
+
+# Long-running tasks started by startup(), cancelled by shutdown()
+background_tasks = []
+
+async def startup():
+    # Initialize DB (opens the connection pool) and background tasks; main.py calls this on the first tools/call
+    await db.init_db()
+    background_tasks.append(asyncio.create_task(hot_cache.flush_loop()))
+    if RETENTION_INTERVAL > 0:
+        background_tasks.append(asyncio.create_task(retention.loop()))
+    if WATCH_BUDGET > 0:
+        background_tasks.append(asyncio.create_task(price_watcher.loop()))
+    if METRICS_FILE:
+        background_tasks.append(asyncio.create_task(metrics.export_loop(METRICS_FILE, METRICS_FILE_INTERVAL)))
+
+async def shutdown():
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    await job_queue.close()
+    await hot_cache.flush()
+    await search_cache.close()
+    await scraper.close()
+    await db.close()
 
 async def serve():
+    # Standalone entry point on the MCP SDK's stdio transport (main.py is the lighter default)
     try:
-        # Initialize DB
-        await db.init_db()
+        await startup()
         
         # Run server
         async with stdio_server() as (read_stream, write_stream):
@@ -459,3 +530,8 @@ async def serve():
     except Exception as e:
         logger.critical(f"Server crash: {e}", exc_info=True)
         sys.exit(1)
+    finally:
+        await shutdown()
+
+if __name__ == "__main__":
+    asyncio.run(serve())
@@ -0,0 +1,274 @@
+# Static MCP tool table: names, descriptions and input schemas.
+# Kept free of heavy imports so main.py can answer initialize / tools/list before the server modules load.
+
+# Shared inputSchema properties for the list-style tools
+PAGING_PROPERTIES = {
+    "fields": {"type": "array", "items": {"type": "string"}, "description": "Only return these fields"},
+    "cursor": {"type": "string", "description": "Page through results: pass \"\" for the first page, then next_cursor"},
+    "compact": {"type": "boolean", "description": "Compact JSON without indentation"},
+}
+
+TOOLS = [
+    {
+        "name": "search_product",
+        "description": "Search Amazon.in products with intelligent caching",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "Product name or keywords"},
+                "limit": {"type": "integer", "description": "Max results (default: 10)"},
+                **PAGING_PROPERTIES
+            },
+            "required": ["query"]
+        }
+    },
+    {
+        "name": "get_product_details",
+        "description": "Get detailed product info including price, rating, reviews",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "url": {"type": "string", "description": "Product page URL"}
+            },
+            "required": ["url"]
+        }
+    },
+    {
+        "name": "get_trending_products",
+        "description": "Get trending products based on access patterns and cache",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {"type": "integer", "default": 20},
+                **PAGING_PROPERTIES
+            }
+        }
+    },
+    {
+        "name": "get_price_history",
+        "description": "Get historical price data for a product",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "product_id": {"type": "string", "description": "ASIN or Product ID"},
+                "since": {"type": "string", "format": "date", "description": "First day to include (YYYY-MM-DD, UTC)"},
+                "until": {"type": "string", "format": "date", "description": "Last day to include (YYYY-MM-DD, UTC)"},
+                "bucket": {"type": "string", "enum": ["hour", "day", "week", "month"], "description": "Summarise as min/max/last per period"}
+            },
+            "required": ["product_id"]
+        }
+    },
+    {
+        "name": "add_to_favorites",
+        "description": "Add a product to favorites/watchlist",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "product_id": {"type": "string", "description": "ASIN or Product ID"},
+                "url": {"type": "string", "description": "Product URL if ID unknown"}
+            },
+            "required": ["product_id"]
+        }
+    },
+    {
+        "name": "get_favorites",
+        "description": "List all favorite products",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {"type": "integer", "default": 50},
+                **PAGING_PROPERTIES
+            }
+        }
+    },
+    {
+        "name": "remove_from_favorites",
+        "description": "Remove a product from favorites",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "product_id": {"type": "string"}
+            },
+            "required": ["product_id"]
+        }
+    },
+    {
+        "name": "get_search_history",
+        "description": "Get recent search queries",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {"type": "integer", "default": 20},
+                **PAGING_PROPERTIES
+            }
+        }
+    },
+
+    {
+        "name": "get_product_recommendations",
+        "description": "Get product recommendations based on a product you like",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "product_id": {"type": "string", "description": "ASIN of product"},
+                "limit": {"type": "integer", "default": 10}
+            },
+            "required": ["product_id"]
+        }
+    },
+    {
+        "name": "get_market_analytics",
+        "description": "Get price ranges and rating distribution analytics",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "category": {"type": "string", "description": "Category to analyze (optional)"}
+            }
+        }
+    },
+    {
+        "name": "filter_products",
+        "description": "Filter cached products by price, rating and review count",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "min_price": {"type": "number", "description": "Minimum price in rupees"},
+                "max_price": {"type": "number", "description": "Maximum price in rupees"},
+                "min_rating": {"type": "number", "description": "Minimum rating (0-5)"},
+                "min_reviews": {"type": "integer", "description": "Minimum number of reviews"},
+                "category": {"type": "string"},
+                "sort_by": {"type": "string", "enum": ["price", "price_desc", "rating", "reviews"], "default": "price"},
+                "limit": {"type": "integer", "default": 20}
+            }
+        }
+    },
+    {
+        "name": "search_by_category",
+        "description": "Search products by category (Electronics, Fashion, etc.)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "category": {"type": "string", "description": "Category name"},
+                "limit": {"type": "integer", "default": 10}
+            },
+            "required": ["category"]
+        }
+    },
+    {
+        "name": "get_latest_products",
+        "description": "Get latest products added to the cache",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {"type": "integer", "default": 20},
+                **PAGING_PROPERTIES
+            }
+        }
+    },
+    {
+        "name": "refresh_cache",
+        "description": "Refresh stale cached product data from Amazon, most important first",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "limit": {"type": "integer", "default": 10, "description": "Max items to refresh"},
+                "workers": {"type": "integer", "description": "Parallel refresh workers (default: 4)"}
+            }
+        }
+    },
+    {
+        "name": "reparse_cache",
+        "description": "Rebuild cached products from stored HTML pages with the current parser (no network traffic)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "kind": {"type": "string", "enum": ["search", "details"], "description": "Only re-parse this kind of page (default: both)"},
+                "limit": {"type": "integer", "description": "Max pages to re-parse (default: all)"}
+            }
+        }
+    },
+    {
+        "name": "batch_search",
+        "description": "Search multiple products at once",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "queries": {"type": "array", "items": {"type": "string"}},
+                "limit": {"type": "integer", "default": 3, "description": "Max results per query"},
+                "concurrency": {"type": "integer", "description": "Queries scraped in parallel (default: 4, max 16)"}
+            },
+            "required": ["queries"]
+        }
+    },
+    {
+        "name": "get_cache_stats",
+        "description": "Get database and cache statistics",
+        "inputSchema": {
+            "type": "object",
+            "properties": {}
+        }
+    },
+    {
+        "name": "get_price_alerts",
+        "description": "Price changes the background price watch found on favorited products since a cursor",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "cursor": {"type": "string", "description": "next_cursor of the previous call; omit to start from the oldest alert"},
+                "product_id": {"type": "string", "description": "Only alerts for this product"},
+                "limit": {"type": "integer", "default": 50},
+                "compact": {"type": "boolean", "description": "Compact JSON without indentation"}
+            }
+        }
+    },
+    {
+        "name": "get_metrics",
+        "description": "Latency percentiles per tool and phase (queue, db, fetch, parse, serialize, total), fetched bytes and cache hit/miss counts",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "format": {"type": "string", "enum": ["json", "prometheus"], "default": "json"},
+                "reset": {"type": "boolean", "default": False, "description": "Start a new measurement window after reading"}
+            }
+        }
+    },
+    {
+        "name": "clear_cache",
+        "description": "Clear all cached data",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "confirm": {"type": "boolean"}
+            },
+            "required": ["confirm"]
+        }
+    },
+    {
+        "name": "export_data",
+        "description": "Export cached data to a JSON, NDJSON or CSV file (optionally gzip-compressed)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "filename": {"type": "string", "default": "amazon_export.json", "description": "Format and gzip are taken from the extension unless given"},
+                "table": {"type": "string", "enum": ["products", "price_history", "favorites"], "default": "products"},
+                "format": {"type": "string", "enum": ["json", "ndjson", "csv"]},
+                "gzip": {"type": "boolean"},
+                "since": {"type": "string", "description": "Only rows changed at or after this timestamp (use next_since from the previous export)"}
+            }
+        }
+    },
+    {
+        "name": "import_data",
+        "description": "Bulk-load products or price history from an NDJSON or CSV file (optionally gzip-compressed)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "filename": {"type": "string", "description": "Format and gzip are taken from the extension unless given"},
+                "table": {"type": "string", "enum": ["products", "price_history"], "default": "products"},
+                "format": {"type": "string", "enum": ["ndjson", "csv"]},
+                "gzip": {"type": "boolean"}
+            },
+            "required": ["filename"]
+        }
+    },
+]
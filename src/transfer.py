@@ -0,0 +1,288 @@
+import asyncio
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import re
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+from .config import BASE_URL, TRANSFER_CHUNK_ROWS, logger
+from .normalize import parse_count, parse_price_paise, parse_rating
+
+# Exportable tables -> column used for incremental (since=...) exports
+EXPORT_TABLES: Dict[str, str] = {
+    "products": "last_updated",
+    "price_history": "timestamp",
+    "favorites": "created_at",
+}
+
+FORMATS = ("json", "ndjson", "csv")
+
+def resolve_format(filename: str, fmt: Optional[str] = None, compress: Optional[bool] = None) -> Tuple[str, bool]:
+    # Explicit arguments win; otherwise "x.ndjson.gz" -> ("ndjson", True)
+    name = filename.lower()
+    if compress is None:
+        compress = name.endswith(".gz")
+    if name.endswith(".gz"):
+        name = name[:-3]
+    if fmt is None:
+        ext = os.path.splitext(name)[1].lstrip(".")
+        fmt = "ndjson" if ext == "jsonl" else ext if ext in FORMATS else "json"
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format: {fmt} (choose from {', '.join(FORMATS)})")
+    return fmt, compress
+
+def open_text(path: str, mode: str, compress: bool):
+    if compress:
+        return gzip.open(path, mode + "t", compresslevel=6, encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+def _export(db_path: str, table: str, path: str, fmt: str, compress: bool, since: Optional[str], chunk_rows: int) -> dict:
+    # Runs in a worker thread on its own read-only connection; one read transaction gives a consistent snapshot
+    started = time.monotonic()
+    column = EXPORT_TABLES[table]
+    sql = f"SELECT * FROM {table}"
+    params = ()
+    if since:
+        sql += f" WHERE {column} >= ?"
+        params = (since,)
+
+    rows = 0
+    latest = None
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        cursor = conn.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+        position = columns.index(column)
+        with open_text(path, "w", compress) as f:
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(columns)
+            elif fmt == "json":
+                f.write("[")
+            while True:
+                chunk = cursor.fetchmany(chunk_rows)
+                if not chunk:
+                    break
+                if fmt == "csv":
+                    writer.writerows(chunk)
+                elif fmt == "ndjson":
+                    f.write("".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in chunk))
+                else:
+                    f.write(("," if rows else "") + ",".join("\n" + json.dumps(dict(zip(columns, row)), ensure_ascii=False) for row in chunk))
+                rows += len(chunk)
+                newest = max((row[position] for row in chunk if row[position] is not None), default=None)
+                if newest is not None and (latest is None or newest > latest):
+                    latest = newest
+            if fmt == "json":
+                f.write("\n]\n")
+    finally:
+        conn.close()
+
+    elapsed = time.monotonic() - started
+    return {
+        "table": table,
+        "path": path,
+        "format": fmt,
+        "gzip": compress,
+        "since": since,
+        "rows": rows,
+        "bytes": os.path.getsize(path),
+        "next_since": latest,  # pass back as since= for the next incremental export
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(rows / elapsed, 1) if elapsed else 0.0,
+    }
+
+async def export_table(db_path: str, table: str, path: str, fmt: Optional[str] = None, compress: Optional[bool] = None,
+                       since: Optional[str] = None, chunk_rows: int = TRANSFER_CHUNK_ROWS) -> dict:
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table: {table} (choose from {', '.join(EXPORT_TABLES)})")
+    fmt, compress = resolve_format(path, fmt, compress)
+    report = await asyncio.to_thread(_export, db_path, table, path, fmt, compress, since, max(1, chunk_rows))
+    logger.info(f"Exported {report['rows']} {table} rows to {path} in {report['elapsed_seconds']}s")
+    return report
+
+# Imports upsert by id; optional fields missing from the file keep their cached values
+IMPORT_PRODUCT_SQL = """INSERT INTO products (id, title, url, price, rating, reviews_count, image_url, category, availability,
+                                              description, last_updated, price_paise, rating_value, reviews_total)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET title = excluded.title,
+                            price = COALESCE(excluded.price, price), rating = COALESCE(excluded.rating, rating),
+                            reviews_count = COALESCE(excluded.reviews_count, reviews_count),
+                            image_url = COALESCE(excluded.image_url, image_url), category = COALESCE(excluded.category, category),
+                            availability = COALESCE(excluded.availability, availability),
+                            description = COALESCE(excluded.description, description), last_updated = excluded.last_updated,
+                            price_paise = COALESCE(excluded.price_paise, price_paise),
+                            rating_value = COALESCE(excluded.rating_value, rating_value),
+                            reviews_total = COALESCE(excluded.reviews_total, reviews_total)
+                        ON CONFLICT DO NOTHING"""
+
+# Re-importing the same history is a no-op: one point per product and timestamp
+IMPORT_PRICE_SQL = """INSERT INTO price_history (product_id, price, price_paise, timestamp)
+                      SELECT ?1, ?2, ?3, ?4
+                      WHERE NOT EXISTS (SELECT 1 FROM price_history WHERE product_id = ?1 AND timestamp = ?4)"""
+
+IMPORT_TABLES = ("products", "price_history")
+MAX_REJECTED_SAMPLES = 20
+URL_LOOKUP_CHUNK = 500  # bound parameters per url lookup
+
+_ID = re.compile(r"^[A-Za-z0-9]{1,32}$")
+
+def _field(record: dict, key: str):
+    value = record.get(key)
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+def _number(record: dict, key: str, source: str, parse, low=0, high=None):
+    # Explicit numeric columns must be valid; otherwise fall back to parsing the display string
+    value = _field(record, key)
+    if value is None:
+        return parse(_field(record, source))
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} is not a number")
+    if value < low or (high is not None and value > high):
+        raise ValueError(f"{key} out of range")
+    return value if high is not None else int(value)
+
+def _product_params(record: dict, now: str) -> tuple:
+    product_id = _field(record, "id")
+    if not product_id or not _ID.match(str(product_id)):
+        raise ValueError("missing or invalid id")
+    title = _field(record, "title")
+    if not title:
+        raise ValueError("missing title")
+    return (
+        product_id, title, _field(record, "url") or f"{BASE_URL}/dp/{product_id}",
+        _field(record, "price"), _field(record, "rating"), _field(record, "reviews_count"), _field(record, "image_url"),
+        _field(record, "category"), _field(record, "availability"), _field(record, "description"),
+        _field(record, "last_updated") or now,
+        _number(record, "price_paise", "price", parse_price_paise),
+        _number(record, "rating_value", "rating", parse_rating, high=5),
+        _number(record, "reviews_total", "reviews_count", parse_count),
+    )
+
+def _price_params(record: dict, now: str) -> tuple:
+    product_id = _field(record, "product_id")
+    if not product_id or not _ID.match(str(product_id)):
+        raise ValueError("missing or invalid product_id")
+    price = _field(record, "price")
+    paise = _number(record, "price_paise", "price", parse_price_paise)
+    if price is None and paise is None:
+        raise ValueError("missing price")
+    return (product_id, price, paise, _field(record, "timestamp") or now)
+
+class _RecordReader:
+    """Reads and validates a file chunk by chunk (called from a worker thread)."""
+
+    def __init__(self, path: str, fmt: str, compress: bool, table: str):
+        self.file = open_text(path, "r", compress)
+        self.table = table
+        self.convert = _product_params if table == "products" else _price_params
+        self.records = csv.DictReader(self.file) if fmt == "csv" else self.file
+        self.json_lines = fmt != "csv"
+        self.line = 0
+        self.read_rows = 0
+        self.rejected = 0
+        self.samples: List[dict] = []
+
+    def read(self, limit: int) -> list:
+        now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")  # stored timestamps are UTC
+        rows = []
+        for record in self.records:
+            if self.json_lines:
+                self.line += 1
+                if not record.strip():
+                    continue
+            else:
+                self.line = self.records.line_num
+            self.read_rows += 1
+            try:
+                if self.json_lines:
+                    record = json.loads(record)
+                if not isinstance(record, dict):
+                    raise ValueError("not an object")
+                rows.append(self.convert(record, now))
+            except ValueError as e:
+                self.rejected += 1
+                if len(self.samples) < MAX_REJECTED_SAMPLES:
+                    self.samples.append({"line": self.line, "reason": str(e)})
+                continue
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def close(self):
+        self.file.close()
+
+async def _skip_url_conflicts(db, rows: list, skipped: List[dict]) -> list:
+    # products.url is UNIQUE: a url owned by another id would make the insert a silent no-op, so such rows are skipped
+    # and reported. Earlier rows of the same chunk claim their urls too.
+    owners = {}
+    for start in range(0, len(rows), URL_LOOKUP_CHUNK):
+        urls = [row[2] for row in rows[start:start + URL_LOOKUP_CHUNK]]
+        sql = f"SELECT url, id FROM products WHERE url IN ({','.join('?' * len(urls))})"
+        owners.update((record["url"], record["id"]) for record in await db.fetch(sql, urls, None))
+    kept = []
+    for row in rows:
+        owner = owners.setdefault(row[2], row[0])
+        if owner == row[0]:
+            kept.append(row)
+        else:
+            skipped.append({"id": row[0], "url": row[2], "owner": owner})
+    return kept
+
+async def import_table(db, table: str, path: str, fmt: Optional[str] = None, compress: Optional[bool] = None,
+                       chunk_rows: int = TRANSFER_CHUNK_ROWS) -> dict:
+    # File reading and validation run in a worker thread while the previous chunk is being written
+    if table not in IMPORT_TABLES:
+        raise ValueError(f"Unknown table: {table} (choose from {', '.join(IMPORT_TABLES)})")
+    fmt, compress = resolve_format(path, fmt, compress)
+    if fmt == "json":
+        raise ValueError("import_data reads NDJSON or CSV; export with format=ndjson to round-trip")
+    sql = IMPORT_PRODUCT_SQL if table == "products" else IMPORT_PRICE_SQL
+    started = time.monotonic()
+    reader = await asyncio.to_thread(_RecordReader, path, fmt, compress, table)
+    imported = 0
+    skipped: List[dict] = []
+    write = None
+    try:
+        while True:
+            rows = await asyncio.to_thread(reader.read, max(1, chunk_rows))
+            if write is not None:
+                await write
+            if not rows:
+                break
+            if table == "products":
+                # After the previous chunk has landed, so its urls are seen
+                rows = await _skip_url_conflicts(db, rows, skipped)
+            write = asyncio.ensure_future(db.write_many(sql, rows))
+            imported += len(rows)
+    finally:
+        if write is not None and not write.done():
+            await asyncio.gather(write, return_exceptions=True)
+        reader.close()
+
+    elapsed = time.monotonic() - started
+    report = {
+        "table": table,
+        "path": path,
+        "format": fmt,
+        "gzip": compress,
+        "rows": reader.read_rows,
+        "imported": imported,
+        "rejected": reader.rejected,
+        "rejected_samples": reader.samples,
+        "skipped_url_conflicts": len(skipped),
+        "skipped_samples": skipped[:MAX_REJECTED_SAMPLES],
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(imported / elapsed, 1) if elapsed else 0.0,
+    }
+    logger.info(f"Imported {imported} {table} rows from {path} ({reader.rejected} rejected, {len(skipped)} skipped) "
+                f"in {report['elapsed_seconds']}s")
+    return report
@@ -0,0 +1,159 @@
+import asyncio
+import random
+import time
+from .config import WATCH_BUDGET, WATCH_INTERVAL, WATCH_MAX_INTERVAL, WATCH_MIN_INTERVAL, WATCH_TICK, logger
+from .database import INSERT_PRICE_SQL, price_row, utc_timestamp
+from .refresh import TOUCH_SQL, UPDATE_DETAILS_SQL
+from .scraper import NOT_MODIFIED
+
+# Favorites without a schedule start due now; schedules of unfavorited products are dropped
+ADD_WATCH_SQL = """INSERT OR IGNORE INTO price_watch (product_id, interval, next_check)
+                   SELECT product_id, ?, ? FROM favorites WHERE product_id IS NOT NULL"""
+DROP_WATCH_SQL = "DELETE FROM price_watch WHERE product_id NOT IN (SELECT product_id FROM favorites WHERE product_id IS NOT NULL)"
+# Most overdue first; products no longer cached have no URL to fetch and are skipped
+DUE_SQL = """
+    SELECT w.product_id, w.interval, p.url, p.etag, p.last_modified, p.price, p.price_paise
+    FROM price_watch w JOIN products p ON p.id = w.product_id
+    WHERE w.next_check <= ?
+    ORDER BY w.next_check
+    LIMIT ?
+"""
+DUE_COUNT_SQL = "SELECT COUNT(*) AS n FROM price_watch w JOIN products p ON p.id = w.product_id WHERE w.next_check <= ?"
+RESCHEDULE_SQL = """UPDATE price_watch SET interval = ?, next_check = ?, last_checked = ?, checks = checks + 1,
+                        changes = changes + ?, last_change = CASE WHEN ? THEN ? ELSE last_change END
+                    WHERE product_id = ?"""
+INSERT_ALERT_SQL = """INSERT INTO price_alerts (product_id, old_price, new_price, old_price_paise, new_price_paise, change_pct)
+                      VALUES (?, ?, ?, ?, ?, ?)"""
+ALERTS_SQL = """
+    SELECT a.id, a.product_id, p.title, p.url, a.old_price, a.new_price, a.change_pct, a.created_at
+    FROM price_alerts a LEFT JOIN products p ON p.id = a.product_id
+    WHERE a.id > ? AND (? IS NULL OR a.product_id = ?)
+    ORDER BY a.id
+    LIMIT ?
+"""
+
+class PriceWatcher:
+    """Re-fetches favorited products on adaptive per-product intervals within a global hourly fetch budget."""
+
+    def __init__(self, db, scraper, budget: int = WATCH_BUDGET, interval: float = WATCH_INTERVAL,
+                 min_interval: float = WATCH_MIN_INTERVAL, max_interval: float = WATCH_MAX_INTERVAL, tick: float = WATCH_TICK):
+        self.db = db
+        self.scraper = scraper
+        self.budget = max(0, budget)  # fetches per hour
+        self.interval = interval
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.tick = tick
+        self.on_write = None  # called with the ids of every written batch (the server drops them from its hot cache)
+        # Token bucket over the budget; at most five minutes' worth is saved up
+        self.burst = max(1.0, self.budget / 12)
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._deferred = 0
+        self._totals = {"ticks": 0, "checked": 0, "changed": 0, "not_modified": 0, "failed": 0}
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.budget / 3600)
+        self._refilled = now
+
+    def next_interval(self, interval: float, changed: bool) -> float:
+        # Moving prices are checked twice as often, stable ones half as often again
+        return min(self.max_interval, max(self.min_interval, interval / 2 if changed else interval * 1.5))
+
+    async def run_once(self) -> dict:
+        now = time.time()
+        await self.db.write_batch([(ADD_WATCH_SQL, [(self.interval, now)]), (DROP_WATCH_SQL, [()])])
+        self._refill()
+        allowed = int(self._tokens)
+        due = await self.db.fetch(DUE_SQL, (now, allowed), None) if allowed else []
+        # Over budget: the rest stay due, most overdue first on the next tick
+        deferred = (await self.db.fetch_one(DUE_COUNT_SQL, (now,), None))["n"] - len(due)
+        report = {"checked": 0, "changed": 0, "not_modified": 0, "failed": 0, "deferred": deferred}
+        if not due:
+            self._count(report)
+            return report
+        self._tokens -= len(due)
+
+        results = await asyncio.gather(*(self._check(row) for row in due))
+        stamp = utc_timestamp()
+        updated, touched, prices, alerts, schedule = [], [], [], [], []
+        for row, (details, change) in zip(due, results):
+            pid = row["product_id"]
+            if details is NOT_MODIFIED:
+                touched.append((stamp, pid))
+                report["not_modified"] += 1
+            elif details is not None:
+                price = price_row(pid, details)
+                updated.append((details.price, price[2], details.description, details.availability, details.etag,
+                                details.last_modified, stamp, pid))
+                prices.append(price)
+                if change is not None:
+                    alerts.append((pid, row["price"], details.price, row["price_paise"], price[2], change))
+            else:
+                report["failed"] += 1
+            changed = change is not None
+            interval = row["interval"] if details is None else self.next_interval(row["interval"], changed)
+            # A little jitter so products added together drift apart
+            schedule.append((interval, now + interval * random.uniform(0.9, 1.1), now, int(changed), changed, now, pid))
+        report["checked"] = len(due)
+        report["changed"] = len(alerts)
+
+        await self.db.write_batch([
+            (UPDATE_DETAILS_SQL, updated),
+            (INSERT_PRICE_SQL, prices),
+            (TOUCH_SQL, touched),
+            (INSERT_ALERT_SQL, alerts),
+            (RESCHEDULE_SQL, schedule),
+        ])
+        if self.on_write is not None:
+            self.on_write([row["product_id"] for row in due])
+        self._count(report)
+        return report
+
+    async def _check(self, row: dict):
+        try:
+            details = await self.scraper.get_details(row["url"], etag=row["etag"], last_modified=row["last_modified"])
+        except Exception as e:
+            logger.error(f"Price watch failed for {row['product_id']}: {e}")
+            return None, None
+        if details is NOT_MODIFIED or not details or not details.id:
+            return (details if details is NOT_MODIFIED else None), None
+        old, new = row["price_paise"], price_row(row["product_id"], details)[2]
+        if old is None or new is None or old == new:
+            return details, None
+        return details, round((new - old) * 100 / old, 2)
+
+    def _count(self, report: dict):
+        self._totals["ticks"] += 1
+        for key in ("checked", "changed", "not_modified", "failed"):
+            self._totals[key] += report[key]
+        self._deferred = report["deferred"]
+
+    async def alerts(self, after: int = 0, limit: int = 50, product_id: str = None) -> list:
+        return await self.db.fetch(ALERTS_SQL, (after, product_id, product_id, limit), None)
+
+    async def loop(self):
+        while True:
+            try:
+                report = await self.run_once()
+                if report["changed"]:
+                    logger.info(f"Price watch: {report['changed']} of {report['checked']} watched products changed price")
+            except Exception as e:
+                logger.error(f"Price watch pass failed: {e}")
+            await asyncio.sleep(self.tick)
+
+    async def stats(self) -> dict:
+        row = await self.db.fetch_one(
+            "SELECT COUNT(*) AS watched, SUM(next_check <= ?) AS due, MIN(interval) AS min_interval, MAX(interval) AS max_interval "
+            "FROM price_watch", (time.time(),), None
+        )
+        self._refill()
+        return {
+            **row,
+            "due": row["due"] or 0,
+            "budget_per_hour": self.budget,
+            "tokens": round(self._tokens, 2),
+            "deferred_last_tick": self._deferred,
+            **self._totals,
+        }
@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from .config import DB_NAME, HTML_STORE_MAX_MB, JOB_LEASE, JOB_MAX_ATTEMPTS, WORKER_CONCURRENCY, WORKER_PROCESSES, logger
+from .database import SCHEMA_VERSION, AmazonDatabase
+from .htmlstore import HtmlStore
+from .jobs import (ABANDON_SQL, CLAIM_SQL, CLAIMABLE_SQL, COMPLETE_SQL, FAIL_SQL, RATE_SHARES, RELEASE_SQL, RENEW_SQL, encode_result,
+                   shared_limiter)
+from .scraper import AmazonScraper
+
+# Scrape workers for the scrape_jobs queue (AMAZON_MCP_SCRAPE_JOBS=1 on the server):
+#   python -m src.worker --processes 4
+# Each process claims jobs under a lease, fetches and parses with its own AmazonScraper and writes the result back.
+# SIGTERM / Ctrl-C: running jobs are finished first. Jobs of a worker that died are claimed again once their lease expires.
+# The server creates and migrates the schema; workers only connect, waiting until it is in place.
+IDLE_POLL_INTERVAL = 0.1
+SCHEMA_POLL_INTERVAL = 1.0
+
+class ScrapeWorker:
+    """One process's claim / scrape / complete loop."""
+
+    def __init__(self, db_path: str = DB_NAME, concurrency: int = WORKER_CONCURRENCY, lease: float = JOB_LEASE,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, shares: int = RATE_SHARES, scraper=None):
+        self.db_path = db_path
+        self.concurrency = max(1, concurrency)
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.shares = max(1, shares)  # slices of the configured scrape rate: the server and every worker process
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.scraper = scraper
+        self.done = 0
+        self.failed = 0
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        db = AmazonDatabase(self.db_path, pool_size=1)
+        await db.connect()
+        try:
+            ready = await self._wait_for_schema(db)
+        except BaseException:
+            await db.close()
+            raise
+        if not ready:
+            await db.close()
+            return
+        scraper = self.scraper
+        if scraper is None:
+            scraper = AmazonScraper()
+            scraper.limiter = shared_limiter(self.shares)
+            scraper.html_store = HtmlStore(db) if HTML_STORE_MAX_MB > 0 else None
+        # Claims need UPDATE ... RETURNING, which the group-commit writer does not hand back; they get their own connection
+        claims = await db.get_connection()
+        running = set()
+        heartbeat = asyncio.create_task(self._heartbeat(db))
+        logger.info(f"Scrape worker {self.name} started ({self.concurrency} jobs at a time)")
+        try:
+            while not self._stopping.is_set():
+                jobs = await self._claim(claims, self.concurrency - len(running)) if len(running) < self.concurrency else []
+                for job in jobs:
+                    task = asyncio.create_task(self._process(db, scraper, job))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                if not jobs:
+                    waiters = [asyncio.create_task(self._stopping.wait())]
+                    await asyncio.wait(waiters + list(running), timeout=IDLE_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+                    waiters[0].cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+            await db.write(RELEASE_SQL, (self.name,))
+            await claims.close()
+            if self.scraper is None:
+                await scraper.close()
+            await db.close()
+            logger.info(f"Scrape worker {self.name} stopped: {self.done} done, {self.failed} failed")
+
+    async def _wait_for_schema(self, db) -> bool:
+        # False when stopped before the server got there
+        announced = False
+        while await db.schema_version() < SCHEMA_VERSION:
+            if not announced:
+                logger.info(f"Scrape worker {self.name} waiting for the server to initialise {self.db_path}")
+                announced = True
+            try:
+                await asyncio.wait_for(self._stopping.wait(), SCHEMA_POLL_INTERVAL)
+                return False
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    async def _claim(self, conn, limit: int) -> list:
+        now = time.time()
+        cursor = await conn.execute(CLAIMABLE_SQL, (now,))
+        if await cursor.fetchone() is None:
+            return []
+        await conn.execute(ABANDON_SQL, (now, now, self.max_attempts))
+        cursor = await conn.execute(CLAIM_SQL, {
+            "owner": self.name, "expires": now + self.lease, "now": now, "max_attempts": self.max_attempts, "limit": limit,
+        })
+        jobs = await cursor.fetchall()
+        await conn.commit()
+        return jobs
+
+    async def _process(self, db, scraper, job):
+        job_id, kind, target, params, attempts = job
+        params = json.loads(params or "{}")
+        try:
+            if kind == "search":
+                result = await scraper.search(target, page=params.get("page", 1))
+            elif kind == "details":
+                result = await scraper.get_details(target, etag=params.get("etag"), last_modified=params.get("last_modified"))
+            else:
+                raise ValueError(f"Unknown job kind: {kind}")
+            await db.write(COMPLETE_SQL, (encode_result(result), time.time(), job_id, self.name))
+            self.done += 1
+        except Exception as e:
+            logger.error(f"Scrape job {job_id} ({kind} {target}) failed on attempt {attempts}: {e}")
+            await db.write(FAIL_SQL, (self.max_attempts, str(e), time.time(), job_id, self.name))
+            self.failed += 1
+
+    async def _heartbeat(self, db):
+        # Leases of jobs still running are pushed out well before they expire
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await db.write(RENEW_SQL, (time.time() + self.lease, self.name))
+            except Exception as e:
+                logger.error(f"Lease renewal failed: {e}")
+
+def run_process(db_path: str, concurrency: int, shares: int):
+    worker = ScrapeWorker(db_path, concurrency=concurrency, shares=shares)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, worker.stop)
+            except NotImplementedError:  # Windows: Ctrl-C arrives as KeyboardInterrupt instead
+                pass
+        await worker.run()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+def main():
+    parser = argparse.ArgumentParser(description="Scrape workers for the scrape_jobs queue")
+    parser.add_argument("--processes", type=int, default=WORKER_PROCESSES, help="Worker processes")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="Jobs in flight per process")
+    parser.add_argument("--db", default=DB_NAME, help="SQLite cache shared with the server")
+    args = parser.parse_args()
+
+    processes = max(1, args.processes)
+    if processes != WORKER_PROCESSES:
+        # The server sizes its own slice of the rate from AMAZON_MCP_WORKER_PROCESSES
+        logger.warning(f"--processes {processes} differs from AMAZON_MCP_WORKER_PROCESSES={WORKER_PROCESSES}; "
+                       "set both to the same value to keep the total scrape rate within AMAZON_MCP_SCRAPE_RATE")
+    workers = [
+        multiprocessing.Process(target=run_process, args=(args.db, args.concurrency, processes + 1), name=f"scrape-worker-{i}")
+        for i in range(processes)
+    ]
+    for process in workers:
+        process.start()
+    # A SIGTERM to the parent (e.g. from a service manager) stops every child the same graceful way
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in workers])
+    try:
+        for process in workers:
+            process.join()
+    except KeyboardInterrupt:
+        # The children got the same Ctrl-C; give them time to finish their running jobs
+        for process in workers:
+            process.join(timeout=60)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import asyncio
+from typing import List, Sequence, Tuple
+from .config import WRITE_BATCH_SIZE, WRITE_BATCH_DELAY, logger
+from .metrics import metrics
+
+# One mutation is a list of (sql, rows) statements that must land in the same transaction
+Statement = Tuple[str, Sequence[Sequence]]
+
+class _Mutation:
+    __slots__ = ("statements", "shape", "future")
+
+    def __init__(self, statements: List[Statement], future: asyncio.Future):
+        self.statements = statements
+        self.shape = tuple(sql for sql, _ in statements)
+        self.future = future
+
+class GroupCommitWriter:
+    """Single coroutine that owns the write connection and commits queued mutations in batches."""
+
+    def __init__(self, pool, batch_size: int = WRITE_BATCH_SIZE, batch_delay: float = WRITE_BATCH_DELAY):
+        self.pool = pool
+        self.batch_size = max(1, batch_size)
+        self.batch_delay = batch_delay
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+        # Stats
+        self._mutations = 0
+        self._rows = 0
+        self._batches = 0
+        self._max_batch = 0
+        self._failed = 0
+        self._flush_size = 0
+        self._flush_time = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._queue.put_nowait(None)
+            await self._task
+            self._task = None
+
+    async def submit(self, statements: List[Statement]):
+        if self._task is None:
+            raise RuntimeError("Database writer is not running; call init_db() first")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Mutation(statements, future))
+        # Callers see queueing plus the commit of their batch
+        with metrics.timed("db"):
+            await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            if len(batch) >= self.batch_size:
+                self._flush_size += 1
+            else:
+                self._flush_time += 1
+            try:
+                await self._commit(batch)
+            except Exception as e:
+                # Never let the writer die with callers still waiting
+                logger.error(f"Writer batch failed: {e}")
+                for m in batch:
+                    if not m.future.done():
+                        m.future.set_exception(e)
+
+    async def _commit(self, batch: List[_Mutation]):
+        # Adjacent mutations with the same statement shape are merged so each statement runs once via executemany
+        groups = []
+        for m in batch:
+            if groups and groups[-1][0] == m.shape:
+                for merged, (_, rows) in zip(groups[-1][1], m.statements):
+                    merged.extend(rows)
+            else:
+                groups.append((m.shape, [list(rows) for _, rows in m.statements]))
+
+        error = None
+        async with self.pool.acquire() as conn:
+            try:
+                for shape, rows_per_statement in groups:
+                    for sql, rows in zip(shape, rows_per_statement):
+                        if rows:
+                            await conn.executemany(sql, rows)
+                await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                error = e
+
+        if error is not None:
+            if len(batch) == 1:
+                self._failed += 1
+                if not batch[0].future.done():
+                    batch[0].future.set_exception(error)
+                return
+            # Replay one by one so only the offending mutation sees the error
+            for m in batch:
+                await self._commit([m])
+            return
+
+        self._batches += 1
+        self._max_batch = max(self._max_batch, len(batch))
+        for m in batch:
+            self._mutations += 1
+            self._rows += sum(len(rows) for _, rows in m.statements)
+            if not m.future.done():
+                m.future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "mutations": self._mutations,
+            "rows": self._rows,
+            "transactions": self._batches,
+            "avg_batch": round(self._mutations / self._batches, 2) if self._batches else 0.0,
+            "max_batch": self._max_batch,
+            "failed": self._failed,
+            "flushed_on_size": self._flush_size,
+            "flushed_on_time": self._flush_time,
+        }
@@ -1,7 +1,38 @@
 
 import asyncio
-from src.database import AmazonDatabase
-from src.scraper import AmazonScraper
+import csv
+import gzip
+import httpx
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from src.database import AmazonDatabase, INSERT_PRICE_SQL, INSERT_PRODUCT_SQL, product_row, utc_timestamp
+from src.scraper import NOT_MODIFIED, AmazonScraper
+from src.cache import SearchResultCache
+from src.parsers import available_parsers, get_parser, parse_search
+from benchmarks.corpus import Corpus
+from benchmarks.fake_amazon import FakeAmazonServer
+from benchmarks.loadtest import compare, load_trace, run_load, save_trace, server_command, synthetic_calls
+from src.ratelimit import HostRateLimiter
+from src.retry import CircuitBreaker, backoff_delay, parse_retry_after
+from src.refresh import RefreshEngine, reparse_store
+from src.htmlstore import HtmlStore
+from src.hotcache import HotCache, age_seconds, is_fresh
+from src.retention import RetentionManager
+from src.watch import PriceWatcher
+from src.jobs import JobFailed, JobQueue, QueuedScraper
+from src.worker import ScrapeWorker
+from src.metrics import Histogram, Metrics, current_tool
+from src.tools import TOOLS
+from src.transfer import export_table, import_table
+from src.models import PricePoint, Product, row_factory
+from src.responses import decode_cursor, encode, encode_cursor, paginate, project
+from src.normalize import normalize_product, parse_count, parse_price_paise, parse_rating
 
 async def test_search():
     print("\n--- Testing Search ---")
@@ -9,7 +40,7 @@ async def test_search():
     results = await scraper.search("laptop", page=1)
     print(f"Found {len(results)} results")
     if results:
-        print(f"First result: {results[0]['title']} - {results[0]['price']}")
+        print(f"First result: {results[0].title} - {results[0].price}")
     return results
 
 async def test_db():
@@ -30,9 +61,1002 @@ async def test_db():
     row = await cursor.fetchone()
     print(f"Database item: {row}")
     await conn.close()
+    await db.close()
+
+async def test_pool():
+    print("\n--- Testing Connection Pool ---")
+    db = AmazonDatabase(os.path.join(tempfile.mkdtemp(), "pool.db"), pool_size=2)
+    await db.init_db()
+
+    async with db.writer() as conn:
+        await conn.execute("INSERT INTO products (id, title, url) VALUES ('P1', 'Pooled', 'http://example.com/p1')")
+        await conn.commit()
+
+    async def read():
+        async with db.reader() as conn:
+            cursor = await conn.execute("SELECT title FROM products WHERE id = 'P1'")
+            return (await cursor.fetchone())[0]
+
+    titles = await asyncio.gather(*(read() for _ in range(10)))
+    assert titles == ["Pooled"] * 10
+    stats = db.pool_stats()
+    assert stats["read"]["checkouts"] == 10 and stats["read"]["in_use"] == 0
+    print(f"Pool stats: {stats}")
+    await db.close()
+
+async def test_group_commit():
+    print("\n--- Testing Group Commit Writer ---")
+    db = AmazonDatabase(os.path.join(tempfile.mkdtemp(), "writer.db"))
+    await db.init_db()
+
+    # Concurrent mutations share transactions; a bad one fails alone
+    async def add(i):
+        await db.write_batch([
+            ("INSERT INTO products (id, title, url) VALUES (?, ?, ?)", [(f"W{i}", f"Item {i}", f"http://example.com/{i}")]),
+            ("INSERT INTO price_history (product_id, price) VALUES (?, ?)", [(f"W{i}", "100")]),
+        ])
+
+    await asyncio.gather(*(add(i) for i in range(50)))
+    try:
+        await asyncio.gather(add(50), add(0))
+        raise AssertionError("duplicate insert should fail")
+    except sqlite3.IntegrityError:
+        pass
+
+    async with db.reader() as conn:
+        cursor = await conn.execute("SELECT COUNT(*) FROM products")
+        assert (await cursor.fetchone())[0] == 51
+    stats = db.writer_stats()
+    assert stats["mutations"] == 51 and stats["failed"] == 1
+    assert stats["transactions"] < 50
+    print(f"Writer stats: {stats}")
+    await db.close()
+
+async def test_search_cache():
+    print("\n--- Testing Search Result Cache ---")
+    db = AmazonDatabase(os.path.join(tempfile.mkdtemp(), "swr.db"))
+    await db.init_db()
+    calls = []
+
+    async def fetch(query):
+        calls.append(query)
+        await asyncio.sleep(0.01)
+        await db.write_batch([cache.store_statement(query, ["A1", "A2"])])
+        return [{"id": "A1"}, {"id": "A2"}]
+
+    cache = SearchResultCache(db, fetch, ttl=60, max_stale=600)
+
+    assert cache.state(await cache.lookup("Phone  Case")) == "miss"
+    # Concurrent misses share one scrape
+    await asyncio.gather(cache.refresh("phone case"), cache.refresh("PHONE case"))
+    assert len(calls) == 1
+
+    entry = await cache.lookup("phone case")
+    assert cache.state(entry) == "fresh" and entry.asins == ["A1", "A2"]
+
+    async def age(seconds):
+        await db.write("UPDATE search_cache SET fetched_at = fetched_at - ?", (seconds,))
+
+    await age(120)
+    assert cache.state(await cache.lookup("phone case")) == "stale"
+    cache.revalidate("phone case")
+    cache.revalidate("phone case")
+    await asyncio.sleep(0.05)
+    assert len(calls) == 2
+    assert cache.state(await cache.lookup("phone case")) == "fresh"
+
+    await age(1200)
+    assert cache.state(await cache.lookup("phone case")) == "expired"
+    for state in ("fresh", "stale", "expired", "miss"):
+        cache.record(state)
+    stats = await cache.stats()
+    assert (stats["hits"], stats["stale"], stats["misses"], stats["revalidations"]) == (1, 1, 2, 1)
+    print(f"Search cache stats: {stats}")
+    await db.close()
+
+async def test_batch_search():
+    print("\n--- Testing Batch Search ---")
+    from src import server
+    db = AmazonDatabase(os.path.join(tempfile.mkdtemp(), "batch.db"))
+    await db.init_db()
+
+    class FakeScraper:
+        def __init__(self):
+            self.calls = []
+            self.in_flight = 0
+            self.peak = 0
+
+        async def search(self, query, page=1):
+            self.calls.append(query)
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+            try:
+                await asyncio.sleep(0.02)
+                if query == "broken":
+                    raise RuntimeError("parser exploded")
+                prefix = query.replace(" ", "").upper()[:6]
+                return [Product(id=f"{prefix}{i}", title=f"{query} {i}", url=f"https://www.amazon.in/dp/{prefix}{i}", price="₹100")
+                        for i in range(4)]
+            finally:
+                self.in_flight -= 1
+
+    writes = []
+    write_batch = db.write_batch
+
+    async def recording_write_batch(statements):
+        writes.append(statements)
+        await write_batch(statements)
+
+    db.write_batch = recording_write_batch
+    fake = FakeScraper()
+    saved = server.db, server.search_cache, server.background_scraper, server.hot_cache
+    server.db, server.background_scraper, server.hot_cache = db, fake, HotCache(db)
+    server.search_cache = SearchResultCache(db, server.scrape_search)
+    try:
+        queries = ["usb cable", "phone case", "USB  Cable", "broken", "", "laptop", "mouse"]
+        entries = await server.batch_search(queries, per_query=3, concurrency=2)
+        # One entry per input in input order; the duplicate shares its lookup, the failure stays in its own entry
+        assert [e["query"] for e in entries] == queries
+        assert [e["status"] for e in entries] == ["scraped", "scraped", "scraped", "error", "error", "scraped", "scraped"]
+        assert entries[3]["error"] == "parser exploded" and entries[4]["error"] == "empty query"
+        assert [p.id for p in entries[2]["results"]] == [p.id for p in entries[0]["results"]] == ["USBCAB0", "USBCAB1", "USBCAB2"]
+        assert sorted(fake.calls) == ["broken", "laptop", "mouse", "phone case", "usb cable"] and fake.peak == 2
+        # Everything scraped lands in a single transaction: products, prices and one cache entry per query
+        assert len(writes) == 1 and len(writes[0]) == 2 + 4
+        assert await db.fetch_one("SELECT COUNT(*) AS n FROM products", (), None) == {"n": 16}
+
+        entries = await server.batch_search(["Usb cable"], per_query=2)
+        assert entries[0]["status"] == "cached" and len(entries[0]["results"]) == 2 and len(fake.calls) == 5
+    finally:
+        await server.search_cache.close()
+        server.db, server.search_cache, server.background_scraper, server.hot_cache = saved
+        await db.close()
+
+    # The per-host limiter lets a burst through, then paces to the rate; another host has its own bucket
+    limiter = HostRateLimiter(20, burst=2)
+    started = time.monotonic()
+    for _ in range(6):
+        await limiter.acquire("https://www.amazon.in/s")
+    await limiter.acquire("https://example.com/")
+    assert 0.15 <= time.monotonic() - started < 0.5
+
+async def test_fts():
+    print("\n--- Testing Full-Text Product Search ---")
+    path = os.path.join(tempfile.mkdtemp(), "fts.db")
+    # A database created before the index existed gets backfilled
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE products (id TEXT PRIMARY KEY, title TEXT NOT NULL, url TEXT UNIQUE NOT NULL, price TEXT, rating TEXT, reviews_count TEXT, image_url TEXT, category TEXT, availability TEXT, description TEXT, specs TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP, access_count INTEGER DEFAULT 1)")
+    legacy.execute("INSERT INTO products (id, title, url, access_count) VALUES ('F1', 'Wireless Bluetooth Headphones', 'u1', 1)")
+    legacy.execute("INSERT INTO products (id, title, url, access_count) VALUES ('F2', 'Bluetooth Wireless Speaker', 'u2', 50)")
+    legacy.commit()
+    legacy.close()
+
+    db = AmazonDatabase(path)
+    await db.init_db()
+    assert db.has_fts
+    results = await db.search_products("headphones wireless")
+    assert [r.id for r in results] == ["F1"]
+    # Word order does not matter and popularity breaks the tie
+    results = await db.search_products("wireless bluetooth")
+    assert [r.id for r in results] == ["F2", "F1"]
+
+    # Triggers keep the index in sync
+    await db.write("UPDATE products SET category = 'audio' WHERE id = 'F1'")
+    await db.write("DELETE FROM products WHERE id = 'F2'")
+    assert [r.id for r in await db.search_products("audio")] == ["F1"]
+    assert await db.search_products("speaker") == []
+    assert await db.search_products('") OR *') == []
+    await db.close()
+
+async def test_numeric_columns():
+    print("\n--- Testing Numeric Normalization ---")
+    assert parse_price_paise("₹1,299.00") == 129900 and parse_price_paise("N/A") is None
+    assert parse_rating("4.3 out of 5 stars") == 4.3 and parse_rating("N/A") is None
+    assert parse_count("12,345") == 12345 and parse_count("1.2K") == 1200 and parse_count("(2 lakh)") == 200000
+
+    path = os.path.join(tempfile.mkdtemp(), "numeric.db")
+    # Rows stored before the numeric columns existed are backfilled from their display strings
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE products (id TEXT PRIMARY KEY, title TEXT NOT NULL, url TEXT UNIQUE NOT NULL, price TEXT, rating TEXT, reviews_count TEXT, image_url TEXT, category TEXT, availability TEXT, description TEXT, specs TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP, access_count INTEGER DEFAULT 1)")
+    legacy.execute("CREATE TABLE price_history (id INTEGER PRIMARY KEY AUTOINCREMENT, product_id TEXT, price TEXT, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    legacy.execute("INSERT INTO products (id, title, url, price, rating, reviews_count) VALUES ('N1', 'Cheap', 'u1', '₹499', '3.9', '87')")
+    legacy.execute("INSERT INTO products (id, title, url, price, rating, reviews_count) VALUES ('N2', 'Pricey', 'u2', '₹1,299.00', '4.6', '12,345')")
+    legacy.execute("INSERT INTO products (id, title, url, price, rating, reviews_count) VALUES ('N3', 'Unknown', 'u3', 'N/A', 'N/A', '0')")
+    legacy.execute("INSERT INTO price_history (product_id, price) VALUES ('N2', '₹1,299.00')")
+    legacy.commit()
+    legacy.close()
+
+    db = AmazonDatabase(path)
+    await db.init_db()
+    async with db.reader() as conn:
+        cursor = await conn.execute("SELECT id, price_paise, rating_value, reviews_total FROM products ORDER BY id")
+        assert await cursor.fetchall() == [("N1", 49900, 3.9, 87), ("N2", 129900, 4.6, 12345), ("N3", None, None, 0)]
+        cursor = await conn.execute("SELECT price_paise FROM price_history")
+        assert (await cursor.fetchone())[0] == 129900
+        # Range queries are served by the index
+        cursor = await conn.execute("EXPLAIN QUERY PLAN SELECT id FROM products WHERE price_paise BETWEEN 40000 AND 60000")
+        assert "idx_products_price_paise" in " ".join(row[-1] for row in await cursor.fetchall())
+
+    # A search listing refreshes only the listing fields it carries; what the product page wrote stays
+    await db.write("UPDATE products SET title = 'Pricey full title', description = 'Long description', "
+                   "last_updated = '2026-01-01 00:00:00' WHERE id = 'N2'")
+    await db.write_batch([(INSERT_PRODUCT_SQL, [product_row(Product(id="N2", title="Pricey", url="u2", price="₹999"), utc_timestamp())])])
+    row = await db.fetch_one("SELECT * FROM products WHERE id = 'N2'")
+    assert (row.title, row.description, row.price_paise, row.rating_value, row.reviews_total) == (
+        "Pricey full title", "Long description", 99900, 4.6, 12345)
+    assert str(row.last_updated).startswith("2026-01-01")
+    # A parsed listing without price, rating, reviews or image keeps the product-page values and their numeric columns
+    listing = ('<div class="s-result-item" data-component-type="s-search-result" data-asin="N2">'
+               '<h2><a href="/dp/N2"><span>Pricey</span></a></h2></div>')
+    parsed = parse_search("html.parser", listing, "https://www.amazon.in")
+    assert (parsed[0]["price"], parsed[0]["rating"], parsed[0]["reviews_count"], parsed[0]["image_url"]) == ("N/A", "N/A", "0", "")
+    await db.write("UPDATE products SET image_url = 'https://img/N2.jpg' WHERE id = 'N2'")
+    await db.write_batch([(INSERT_PRODUCT_SQL, [product_row(Product.from_dict(normalize_product(parsed[0])), utc_timestamp())])])
+    row = await db.fetch_one("SELECT * FROM products WHERE id = 'N2'")
+    assert (row.price, row.price_paise, row.rating, row.rating_value, row.reviews_count, row.reviews_total, row.image_url) == (
+        "₹999", 99900, "4.6", 4.6, "12,345", 12345, "https://img/N2.jpg")
+    await db.close()
+
+async def test_price_history():
+    print("\n--- Testing Price History ---")
+    path = os.path.join(tempfile.mkdtemp(), "history.db")
+    # History written before change-only inserts is compacted once
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE price_history (id INTEGER PRIMARY KEY AUTOINCREMENT, product_id TEXT, price TEXT, timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)")
+    legacy.executemany("INSERT INTO price_history (product_id, price, timestamp) VALUES ('H1', ?, ?)", [
+        ("₹100", "2026-01-01 08:00:00"), ("₹100", "2026-01-01 09:00:00"), ("₹90", "2026-01-01 10:00:00"),
+        ("₹90", "2026-01-02 08:00:00"), ("₹120", "2026-01-09 08:00:00"), ("₹120", "2026-01-09 09:00:00"),
+    ])
+    legacy.commit()
+    legacy.close()
+
+    db = AmazonDatabase(path)
+    await db.init_db()
+    history = await db.price_history("H1")
+    assert [(h.price, h.date) for h in history] == [("₹120", "2026-01-09 08:00:00"), ("₹90", "2026-01-01 10:00:00"), ("₹100", "2026-01-01 08:00:00")]
+
+    # Unchanged prices are not stored again
+    await db.write_many(INSERT_PRICE_SQL, [("H1", "₹120", 12000), ("H1", "₹120", 12000), ("H2", "₹5", 500)])
+    await db.write(INSERT_PRICE_SQL, ("H1", "₹120", 12000))
+    assert len(await db.price_history("H1")) == 3 and len(await db.price_history("H2")) == 1
+    # An unavailable price is not a change point, nor is the same amount written differently
+    await db.write_many(INSERT_PRICE_SQL, [("H2", "N/A", None), ("H2", "₹5", 500), ("H2", "N/A", None), ("H2", "₹5.00", 500)])
+    assert [(h.price, h.price_paise) for h in await db.price_history("H2")] == [("₹5", 500)]
+
+    daily = await db.price_history("H1", since="2026-01-01", until="2026-01-31", bucket="day")
+    assert [(d["period"], d["min"], d["max"], d["last"], d["changes"]) for d in daily] == [
+        ("2026-01-01", 90.0, 100.0, "₹90", 2), ("2026-01-09", 90.0, 120.0, "₹120", 1),
+    ]
+    assert await db.price_history("H1", since="2026-01-02", until="2026-01-08") == []
+    async with db.reader() as conn:
+        cursor = await conn.execute("PRAGMA user_version")
+        assert (await cursor.fetchone())[0] >= 1
+    await db.close()
+
+async def test_export():
+    print("\n--- Testing Streaming Export ---")
+    folder = tempfile.mkdtemp()
+    db = AmazonDatabase(os.path.join(folder, "export.db"))
+    await db.init_db()
+    await db.write_many(
+        "INSERT INTO products (id, title, url, price, last_updated) VALUES (?, ?, ?, ?, ?)",
+        [(f"E{i}", f"Item {i}", f"u{i}", f"₹{i},000", f"2026-01-{i + 1:02d} 10:00:00") for i in range(25)]
+    )
+    await db.write("INSERT INTO favorites (product_id) VALUES ('E3')")
+
+    path = os.path.join(folder, "products.ndjson.gz")
+    report = await export_table(db.db_path, "products", path, chunk_rows=10)
+    assert (report["format"], report["gzip"], report["rows"]) == ("ndjson", True, 25)
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert sorted(r["id"] for r in rows) == sorted(f"E{i}" for i in range(25)) and rows[0]["price"].startswith("₹")
+    assert report["next_since"] == "2026-01-25 10:00:00"
+
+    # Incremental export only picks up rows changed since the given timestamp
+    path = os.path.join(folder, "recent.csv")
+    report = await export_table(db.db_path, "products", path, since="2026-01-20")
+    with open(path, encoding="utf-8", newline="") as f:
+        assert sorted(r["id"] for r in csv.DictReader(f)) == [f"E{i}" for i in range(19, 25)]
+
+    path = os.path.join(folder, "favorites.json")
+    await export_table(db.db_path, "favorites", path)
+    with open(path, encoding="utf-8") as f:
+        assert [r["product_id"] for r in json.load(f)] == ["E3"]
+    await export_table(db.db_path, "price_history", os.path.join(folder, "empty.json"))
+    with open(os.path.join(folder, "empty.json"), encoding="utf-8") as f:
+        assert json.load(f) == []
+    await db.close()
+
+async def test_import():
+    print("\n--- Testing Bulk Import ---")
+    folder = tempfile.mkdtemp()
+    db = AmazonDatabase(os.path.join(folder, "import.db"))
+    await db.init_db()
+    await db.write("INSERT INTO products (id, title, url, category) VALUES ('I1', 'Old title', 'u1', 'audio')")
+
+    path = os.path.join(folder, "catalog.ndjson.gz")
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "I1", "title": "New title", "price": "₹1,499"}) + "\n")
+        for i in range(2, 30):
+            f.write(json.dumps({"id": f"I{i}", "title": f"Item {i}", "rating": "4.1", "reviews_count": "1.5K"}) + "\n")
+        f.write("not json\n\n")
+        f.write(json.dumps({"id": "I40"}) + "\n")
+        f.write(json.dumps({"id": "I41", "title": "Bad", "rating_value": 9}) + "\n")
+    report = await import_table(db, "products", path, chunk_rows=8)
+    assert (report["rows"], report["imported"], report["rejected"]) == (32, 29, 3)
+    assert [s["line"] for s in report["rejected_samples"]] == [30, 32, 33]
+    async with db.reader() as conn:
+        cursor = await conn.execute("SELECT title, category, price_paise FROM products WHERE id = 'I1'")
+        assert await cursor.fetchone() == ("New title", "audio", 149900)  # upsert keeps fields the file leaves out
+        cursor = await conn.execute("SELECT rating_value, reviews_total, url FROM products WHERE id = 'I9'")
+        assert (await cursor.fetchone())[:2] == (4.1, 1500)
+    assert [r.id for r in await db.search_products("item 12")] == ["I12"]
+
+    # A url already owned by another id (in the cache or earlier in the file) is skipped and reported, not counted
+    path = os.path.join(folder, "clash.ndjson")
+    with open(path, "w", encoding="utf-8") as f:
+        for record in ({"id": "I50", "title": "Clash", "url": "u1"}, {"id": "I51", "title": "Twin A", "url": "u51"},
+                       {"id": "I52", "title": "Twin B", "url": "u51"}, {"id": "I1", "title": "Same url", "url": "u1"}):
+            f.write(json.dumps(record) + "\n")
+    report = await import_table(db, "products", path)
+    assert (report["imported"], report["skipped_url_conflicts"]) == (2, 2)
+    assert [(s["id"], s["owner"]) for s in report["skipped_samples"]] == [("I50", "I1"), ("I52", "I51")]
+    rows = await db.fetch("SELECT id, title FROM products WHERE id IN ('I1', 'I50', 'I51', 'I52') ORDER BY id", (), None)
+    assert [(r["id"], r["title"]) for r in rows] == [("I1", "Same url"), ("I51", "Twin A")]
+
+    # Importing the same history twice adds nothing
+    path = os.path.join(folder, "history.csv")
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["product_id", "price", "timestamp"])
+        writer.writerows([("I1", "₹1,599", "2026-01-01 00:00:00"), ("I1", "₹1,499", "2026-01-05 00:00:00"), ("", "₹5", "")])
+    for _ in range(2):
+        report = await import_table(db, "price_history", path)
+        assert (report["imported"], report["rejected"]) == (2, 1)
+    assert [h.price for h in await db.price_history("I1")] == ["₹1,499", "₹1,599"]
+    await db.close()
+
+async def test_refresh_engine():
+    print("\n--- Testing Refresh Engine ---")
+    db = AmazonDatabase(os.path.join(tempfile.mkdtemp(), "refresh.db"))
+    await db.init_db()
+    await db.write_many(
+        "INSERT INTO products (id, title, url, price, last_updated) VALUES (?, ?, ?, '100', datetime('now', ?))",
+        [(f"R{i}", f"Item {i}", f"https://www.amazon.in/dp/R{i}", f"-{i} hours") for i in range(20)]
+    )
+    await db.write("INSERT INTO favorites (product_id) VALUES ('R3')")
+
+    class FakeScraper:
+        def __init__(self):
+            self.limiter = HostRateLimiter(0)
+            self.seen = []
+
+        async def get_details(self, url, etag=None, last_modified=None):
+            self.seen.append(url.rsplit("/", 1)[1])
+            await asyncio.sleep(0.02)
+            if url.endswith("R7"):
+                return NOT_MODIFIED
+            return None if url.endswith("R5") else Product(id=url.rsplit("/", 1)[1], price="90", description="", availability="In stock")
+
+    scraper = FakeScraper()
+    report = await RefreshEngine(db, scraper, workers=5, write_batch=4, ttl=5400).run(limit=20)
+    assert (report["queued"], report["refreshed"], report["not_modified"], report["failed"], report["written"]) == (18, 16, 1, 1, 17)
+    # Oldest first, but the favourite outranks older unfollowed products; rows within the TTL are left alone
+    assert scraper.seen[0] == "R19" and scraper.seen.index("R3") < scraper.seen.index("R5")
+    assert "R0" not in scraper.seen and "R1" not in scraper.seen
+    async with db.reader() as conn:
+        cursor = await conn.execute("SELECT COUNT(*) FROM products WHERE price = '90'")
+        assert (await cursor.fetchone())[0] == 16
+    print(f"Refresh report: {report}")
+    await db.close()
+
+    # Throttling halves the host rate and successes recover it
+    limiter = HostRateLimiter(4, burst=2, cooldown=0)
+    limiter.observe("https://www.amazon.in/s", 503)
+    assert limiter.stats()["www.amazon.in"]["rate"] == 2
+    limiter.observe("https://www.amazon.in/dp/X", 200)
+    assert limiter.stats()["www.amazon.in"]["rate"] == 2.1
+    assert "example.com" not in limiter.stats()
+
+async def test_coalescing():
+    print("\n--- Testing Scrape Coalescing ---")
+    scraper = AmazonScraper()
+    fetched = []
+
+    async def fake_get_details(url, etag=None, last_modified=None):
+        fetched.append(url)
+        await asyncio.sleep(0.02)
+        return Product(id="B0TEST", title="Shared")
+
+    scraper._get_details = fake_get_details
+    urls = [
+        "https://www.amazon.in/Some-Slug/dp/B0TEST/ref=sr_1_1",
+        "https://www.amazon.in/dp/B0TEST?th=1",
+        "https://www.amazon.in/Other/dp/B0TEST",
+    ]
+    results = await asyncio.gather(*(scraper.get_details(u) for u in urls))
+    assert len(fetched) == 1 and all(r.title == "Shared" for r in results)
+    stats = scraper.singleflight.stats()
+    assert (stats["executions"], stats["coalesced"], stats["in_flight"]) == (1, 2, 0)
+    await scraper.close()
+
+def test_responses():
+    print("\n--- Testing Response Shaping ---")
+    rows = [{"id": f"P{i}", "title": f"Item {i}", "price": "₹1,299", "description": "x" * 200} for i in range(6)]
+    assert len(encode(project(rows, ["id", "price"]), compact=True)) < len(encode(rows, compact=True)) < len(encode(rows, compact=False))
+    assert json.loads(encode(rows, compact=True)) == rows
+
+    # Records serialise exactly like the dicts they replace, and the row factory maps any column subset by name
+    products = [Product(id="P1", title="Item", price="₹10", price_paise=1000)]
+    assert encode(products, compact=True) == encode([p.to_dict() for p in products], compact=True)
+    assert json.loads(encode(products)) == [products[0].to_dict()]
+    assert project(products, ["id", "price_paise"]) == [{"id": "P1", "price_paise": 1000}]
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.execute("SELECT 'P2' AS id, 'x' AS title, 7 AS unknown_column")
+    cursor.row_factory = row_factory(Product, cursor.description)
+    assert cursor.fetchone() == Product(id="P2", title="x")
+    cursor = conn.execute("SELECT '₹5' AS price, '2026-01-01' AS date, 500 AS price_paise")
+    cursor.row_factory = row_factory(PricePoint, cursor.description)
+    assert cursor.fetchone() == PricePoint("₹5", "2026-01-01", 500)
+    conn.close()
+
+    page = paginate("get_favorites", rows, 0, 5, paged=True)
+    assert len(page["results"]) == 5 and decode_cursor("get_favorites", page["next_cursor"]) == 5
+    assert paginate("get_favorites", rows[:3], 5, 5, paged=True)["next_cursor"] is None
+    assert paginate("get_favorites", rows, 0, 5, paged=False) == rows[:5]
+    for bad in ("not-a-cursor", encode_cursor("get_trending_products", 5), encode_cursor("get_favorites", -1)):
+        try:
+            decode_cursor("get_favorites", bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+SEARCH_SAMPLE = """
+<html><body><div class="s-main-slot">
+  <div class="s-result-item" data-component-type="s-search-result" data-asin="B0PARSE01">
+    <h2><a href="/Echo-Dot/dp/B0PARSE01/ref=sr_1_1"><span> Echo Dot &amp; Clock </span></a></h2>
+    <span class="a-price"><span class="a-offscreen">₹4,499.00</span></span>
+    <i class="a-icon-star-small"><span class="a-icon-alt">4.5 out of 5 stars</span></i>
+    <span class="a-size-base s-underline-text">12,345</span>
+    <img class="s-image" src="https://m.media-amazon.com/images/I/echo.jpg">
+  </div>
+  <div class="s-result-item" data-component-type="s-search-result" data-asin="B0PARSE02">
+    <h2><a href="https://www.amazon.in/dp/B0PARSE02"><span>Budget <b>Earbuds</b></span></a></h2>
+  </div>
+  <div class="s-result-item" data-component-type="s-search-result" data-asin="B0PARSE03">
+    <h2><span>Sponsored, no link</span></h2>
+  </div>
+  <div class="s-result-item" data-component-type="s-search-result" data-asin="B0PARSE04">
+    <h2><a href="/dp/B0PARSE04"><span>Image without src</span></a></h2>
+    <img class="s-image">
+  </div>
+</div></body></html>
+"""
+
+DETAILS_SAMPLE = """
+<html><body>
+  <span id="productTitle">  Echo Dot (5th Gen)  </span>
+  <span id="priceblock_dealprice">₹3,999.00</span>
+  <div id="feature-bullets"><ul><li>Bigger sound</li><li>Clock display</li></ul></div>
+  <div id="availability"><span> In stock </span></div>
+</body></html>
+"""
+
+def test_parsers():
+    print("\n--- Testing Parser Backends ---")
+    expected_search = get_parser("html.parser").parse_search(SEARCH_SAMPLE, "https://www.amazon.in")
+    expected_details = get_parser("html.parser").parse_details(DETAILS_SAMPLE)
+    assert [p["id"] for p in expected_search] == ["B0PARSE01", "B0PARSE02"]
+    assert expected_search[0]["title"] == "Echo Dot & Clock" and expected_search[0]["rating"] == "4.5"
+    assert expected_search[1]["url"] == "https://www.amazon.in/dp/B0PARSE02" and expected_search[1]["price"] == "N/A"
+    assert expected_details["price"] == "₹3,999.00" and expected_details["availability"] == "In stock"
+
+    backends = available_parsers()
+    for name in backends:
+        parser = get_parser(name)
+        assert parser.parse_search(SEARCH_SAMPLE, "https://www.amazon.in") == expected_search, name
+        assert parser.parse_details(DETAILS_SAMPLE) == expected_details, name
+    print(f"Identical output from: {', '.join(backends)}")
+
+    # Recorded corpus: every backend agrees on every page
+    corpus = Corpus()
+    for key, html, expected_count in corpus.search_pages():
+        reference = get_parser("html.parser").parse_search(html, "https://www.amazon.in")
+        assert len(reference) == expected_count, key
+        for name in backends:
+            assert get_parser(name).parse_search(html, "https://www.amazon.in") == reference, (name, key)
+    for asin, html, title in corpus.product_pages():
+        reference = get_parser("html.parser").parse_details(html)
+        assert reference["title"] == title, asin
+        for name in backends:
+            assert get_parser(name).parse_details(html) == reference, (name, asin)
+
+async def test_offline_scrape():
+    print("\n--- Testing Scraper Against Fake Amazon ---")
+    with FakeAmazonServer() as fake:
+        scraper = AmazonScraper(base_url=fake.base_url)
+        results = await scraper.search("laptop")
+        assert len(results) == 48 and all(r.url.startswith(fake.base_url) for r in results)
+        asin = Corpus().asins[0]
+        details = await scraper.get_details(f"{fake.base_url}/Some-Slug/dp/{asin}/ref=sr_1_1")
+        assert details.id == asin and details.title != "Unknown" and details.price_paise
+        # Revalidating with the stored validators costs a 304 and no parse
+        url = f"{fake.base_url}/dp/{asin}"
+        assert details.etag and await scraper.get_details(url, etag=details.etag) is NOT_MODIFIED
+        assert await scraper.get_details(url, last_modified=details.last_modified) is NOT_MODIFIED
+        transport = scraper.transport_stats()
+        await scraper.close()
+        assert fake.requests == 4 and fake.not_modified == 2
+        assert transport["requests"] == 4 and transport["bytes_downloaded"] == fake.bytes_sent
+        print(f"Transport: {transport}")
+
+async def test_retry_and_breaker():
+    print("\n--- Testing Retries and Circuit Breaker ---")
+    assert parse_retry_after("7") == 7 and parse_retry_after("soon") is None
+    assert 50 < parse_retry_after(format_datetime(datetime.now(timezone.utc) + timedelta(minutes=1), usegmt=True)) <= 60
+    assert all(0 <= backoff_delay(n, base=0.1, cap=1) <= 1 for n in range(10))
+
+    with FakeAmazonServer(error_rate=1.0, retry_after="0") as fake:
+        scraper = AmazonScraper(base_url=fake.base_url)
+        scraper.limiter = HostRateLimiter(0)
+        scraper.breaker = CircuitBreaker(threshold=3, reset_timeout=0.2)
+        scraper.retries = 2
+        # Three 503s: two retries, then the circuit opens
+        assert await scraper.search("laptop") == [] and fake.requests == 3
+        assert scraper.breaker.state(fake.base_url) == "open"
+        # Open circuit: fail fast without touching the site
+        assert await scraper.get_details(f"{fake.base_url}/dp/B000000001") is None and fake.requests == 3
+        fake.error_rate = 0
+        await asyncio.sleep(0.25)
+        # One probe closes it again
+        assert len(await scraper.search("laptop")) == 48 and scraper.breaker.state(fake.base_url) == "closed"
+        transport = scraper.transport_stats()
+        assert (transport["retries"], transport["gave_up"]) == (2, 1)
+        breaker = next(iter(scraper.breaker.stats().values()))
+        assert (breaker["trips"], breaker["short_circuited"], breaker["consecutive_failures"]) == (1, 1, 0)
+        print(f"Breaker: {breaker}")
+        await scraper.close()
+
+    # A Retry-After longer than we are willing to wait opens the circuit for that long
+    breaker = CircuitBreaker(threshold=5, reset_timeout=1)
+    breaker.failure("https://www.amazon.in/s", hold=120)
+    assert breaker.state("https://www.amazon.in/dp/X") == "open"
+    assert breaker.stats()["www.amazon.in"]["retry_in_seconds"] > 100
+
+    # A half-open probe that ends in a non-transport error, or is cancelled, does not leave the host locked out
+    url = "http://probe.invalid/dp/B000000001"
+    scraper = AmazonScraper(base_url="http://probe.invalid")
+    scraper.limiter = HostRateLimiter(0)
+    scraper.breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    scraper.breaker.failure(url)
+
+    async def redirect_loop(url, headers=None):
+        raise httpx.TooManyRedirects("Exceeded maximum allowed redirects.")
+
+    scraper.client.get = redirect_loop
+    try:
+        await scraper._fetch(url)
+        assert False, "expected TooManyRedirects"
+    except httpx.TooManyRedirects:
+        pass
+    assert scraper.breaker.state(url) == "half_open" and scraper.breaker.stats()["probe.invalid"]["trips"] == 2
+
+    async def hang(url, headers=None):
+        await asyncio.sleep(60)
+
+    scraper.client.get = hang
+    probe = asyncio.create_task(scraper._fetch(url))
+    await asyncio.sleep(0.05)
+    probe.cancel()
+    await asyncio.gather(probe, return_exceptions=True)
+    scraper.breaker.before(url)  # would raise CircuitOpenError if the cancelled probe still held the slot
+    await scraper.close()
+
+async def test_html_store():
+    print("\n--- Testing Raw HTML Store ---")
+    folder = tempfile.mkdtemp()
+    db = AmazonDatabase(os.path.join(folder, "store.db"))
+    await db.init_db()
+    store = HtmlStore(db, root=os.path.join(folder, "pages"))
+    with FakeAmazonServer() as fake:
+        scraper = AmazonScraper(base_url=fake.base_url)
+        scraper.limiter = HostRateLimiter(0)
+        scraper.html_store = store
+        results = await scraper.search("laptop")
+        asin = results[0].id
+        details = await scraper.get_details(f"{fake.base_url}/Some-Slug/dp/{asin}/ref=sr_1_1")
+        # Within the TTL both pages come from the store
+        assert len(await scraper.search("laptop")) == 48 and (await scraper.get_details(f"{fake.base_url}/dp/{asin}")).title == details.title
+        assert fake.requests == 2
+
+        await db.write_batch([(INSERT_PRODUCT_SQL, [product_row(p, utc_timestamp()) for p in results])])
+        await db.write("UPDATE products SET title = 'broken', price = NULL, description = NULL")
+        report = await reparse_store(db, scraper, store)
+        assert (report["pages"], report["products"], report["missing"], report["failed"]) == (2, 49, 0, 0)
+        row = await db.fetch_one("SELECT * FROM products WHERE id = ?", (asin,))
+        assert row.title == details.title and row.description == details.description and row.price_paise == details.price_paise
+        assert await db.fetch_one("SELECT COUNT(*) AS n FROM products WHERE title = 'broken'", (), None) == {"n": 0}
+        assert fake.requests == 2
+        await scraper.close()
+
+    stats = await store.stats()
+    assert stats["pages"] == {"details": 1, "search": 1} and stats["stored"] == 2 and stats["hits"] == 2
+    # Over the cap: the least recently used page goes
+    store.max_bytes = stats["bytes"] - 1
+    await store.evict()
+    assert [page.kind for page in await store.pages()] == ["details"] and (await store.stats())["evicted"] == 1
+    print(f"HTML store: {await store.stats()}")
+    await db.close()
+
+async def test_hot_cache():
+    print("\n--- Testing Hot Cache ---")
+    db = AmazonDatabase(os.path.join(tempfile.mkdtemp(), "hot.db"))
+    await db.init_db()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)  # stored timestamps are UTC
+    products = [Product(id=f"H{i}", title=f"Hot {i}", url=f"u{i}") for i in range(3)]
+    await db.write_batch([(INSERT_PRODUCT_SQL, [product_row(p, now) for p in products])])
+    rows = {p.id: await db.fetch_one("SELECT * FROM products WHERE id = ?", (p.id,)) for p in products}
+
+    cache = HotCache(db, max_entries=2, flush_size=3)
+    cache.put("H0", rows["H0"])
+    cache.put("H1", rows["H1"])
+    assert cache.get("H0") is rows["H0"]
+    cache.put("H2", rows["H2"])  # H1 is the least recently used
+    assert cache.get("H1") is None and cache.get("H2") is rows["H2"]
+
+    # access_count: bumped in memory at once, written on the third touch
+    await cache.touch("H0")
+    await cache.touch("H0")
+    assert cache.get("H0").access_count == 3
+    assert (await db.fetch_one("SELECT access_count FROM products WHERE id = 'H0'", (), None))["access_count"] == 1
+    await cache.touch("H2")
+    assert (await db.fetch_one("SELECT access_count FROM products WHERE id = 'H0'", (), None))["access_count"] == 3
+    assert cache.stats()["pending_access_counts"] == 0 and cache.stats()["flushes"] == 1
+
+    # Records past the TTL are dropped, as are invalidated ones
+    rows["H2"].last_updated = now - timedelta(seconds=cache.ttl + 1)
+    assert cache.get("H2") is None
+    cache.invalidate(["H0", "missing"])
+    assert cache.get("H0") is None
+    stats = cache.stats()
+    assert (stats["entries"], stats["evictions"], stats["stale"], stats["invalidations"]) == (0, 1, 1, 1)
+
+    # Ages are measured in UTC whatever the local timezone, so column defaults and written stamps agree
+    if hasattr(time, "tzset"):
+        previous = os.environ.get("TZ")
+        os.environ["TZ"] = "Asia/Kolkata"
+        time.tzset()
+        try:
+            await db.write("INSERT INTO products (id, title, url) VALUES ('H9', 'Defaulted', 'u9')")
+            row = await db.fetch_one("SELECT * FROM products WHERE id = 'H9'")
+            assert is_fresh(row) and 0 <= age_seconds(row.last_updated) < 60
+            assert 0 <= age_seconds(utc_timestamp()) < 1
+
+            # Upgrading to version 3 moves the application's local-clock stamps to UTC; column defaults are already UTC
+            path = os.path.join(tempfile.mkdtemp(), "legacy-clock.db")
+            legacy = sqlite3.connect(path)
+            legacy.execute("CREATE TABLE products (id TEXT PRIMARY KEY, title TEXT NOT NULL, url TEXT UNIQUE NOT NULL, price TEXT, rating TEXT, reviews_count TEXT, image_url TEXT, category TEXT, availability TEXT, description TEXT, specs TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP, access_count INTEGER DEFAULT 1)")
+            legacy.executemany("INSERT INTO products (id, title, url, last_updated) VALUES (?, ?, ?, ?)", [
+                ("L1", "Local", "l1", "2026-01-01 12:00:00.250000"), ("L2", "Defaulted", "l2", "2026-01-01 12:00:00"),
+            ])
+            legacy.commit()
+            legacy.close()
+            upgraded = AmazonDatabase(path)
+            await upgraded.init_db()
+            await upgraded.close()
+            # A second run of the migration (an interrupted upgrade) does not shift the converted rows again
+            legacy = sqlite3.connect(path)
+            legacy.execute("PRAGMA user_version = 2")
+            legacy.commit()
+            legacy.close()
+            upgraded = AmazonDatabase(path)
+            await upgraded.init_db()
+            rows = await upgraded.fetch("SELECT id, last_updated FROM products ORDER BY id")
+            assert [(r.id, r.last_updated) for r in rows] == [("L1", "2026-01-01 06:30:00"), ("L2", "2026-01-01 12:00:00")]
+            assert await upgraded.schema_version() == 3
+            await upgraded.close()
+        finally:
+            if previous is None:
+                os.environ.pop("TZ", None)
+            else:
+                os.environ["TZ"] = previous
+            time.tzset()
+    print(f"Hot cache: {stats}")
+    await db.close()
+
+async def test_retention():
+    print("\n--- Testing Retention ---")
+    db = AmazonDatabase(os.path.join(tempfile.mkdtemp(), "retention.db"))
+    await db.init_db()
+    now = datetime.now(timezone.utc).replace(tzinfo=None)  # stored timestamps are UTC
+    # (id, access_count, days since last update): R3 is rarely used but a favorite
+    specs = [("R0", 50, 0), ("R1", 1, 30), ("R2", 40, 2), ("R3", 1, 60), ("R4", 5, 1), ("R5", 2, 20)]
+    products = [Product(id=pid, title=f"Retained {pid} " + "filler " * 2000, url=f"u{pid}", price="₹10") for pid, _, _ in specs]
+    await db.write_batch([
+        (INSERT_PRODUCT_SQL, [product_row(p, now) for p in products]),
+        (INSERT_PRICE_SQL, [(p.id, p.price, 1000) for p in products]),
+        ("UPDATE products SET access_count = ?, last_updated = ? WHERE id = ?", [(n, now - timedelta(days=days), pid) for pid, n, days in specs]),
+        ("INSERT INTO favorites (product_id) VALUES (?)", [("R3",)]),
+        ("INSERT INTO price_history (product_id, price, timestamp) VALUES (?, ?, ?)", [("R0", "₹9", "2020-01-01 00:00:00")]),
+        ("INSERT INTO search_history (query, results_count, created_at) VALUES (?, ?, ?)", [("old", 1, "2020-01-01 00:00:00"), ("new", 1, now)]),
+    ])
+    evicted = []
+    retention = RetentionManager(db, max_products=3, max_db_mb=0, history_days=30, search_history_days=30, batch_size=1)
+    retention.on_evict = evicted.extend
+    report = await retention.run()
+    assert sorted(evicted) == ["R1", "R5"] and report["products"] == 2
+    remaining = [row["id"] for row in await db.fetch("SELECT id FROM products ORDER BY id", (), None)]
+    assert remaining == ["R0", "R2", "R3", "R4"]
+    assert (report["price_history"], report["search_history"]) == (1, 1)
+    assert abs((datetime.fromisoformat(report["finished_at"]) - now).total_seconds()) < 60
+    assert await db.fetch_one("SELECT COUNT(*) AS n FROM price_history WHERE product_id IN ('R1', 'R5')", (), None) == {"n": 0}
+    # Freed pages go back to the filesystem and the full-text index follows the deletes
+    assert report["pages_vacuumed"] > 0 and (await retention.size())["free_pages"] == 0
+    assert sorted(p.id for p in await db.search_products("retained filler", limit=10)) == remaining
+    # Each chunk releases all of its pages, measured on the freelist
+    await db.write("UPDATE products SET title = 'short' WHERE id = 'R4'")
+    free = (await retention.size())["free_pages"]
+    retention.vacuum_pages = 2
+    assert free > 2 and await retention._vacuum() == free and (await retention.size())["free_pages"] == 0
+    retention.vacuum_pages = 256
+
+    # File size cap: the least used non-favorites go until the file fits
+    retention.max_products = 0
+    retention.max_bytes = (await retention.size())["bytes"] - 1
+    report = await retention.run()
+    assert report["products"] >= 1 and "R3" not in evicted and (await retention.size())["bytes"] <= retention.max_bytes
+    stats = await retention.stats()
+    assert stats["evicted"]["runs"] == 2 and stats["evicted"]["products"] == len(evicted)
+    async with db.reader() as conn:
+        cursor = await conn.execute("PRAGMA auto_vacuum")
+        assert (await cursor.fetchone())[0] == 2
+    print(f"Retention: {stats}")
+    await db.close()
+
+async def test_price_watch():
+    print("\n--- Testing Price Watch ---")
+    db = AmazonDatabase(os.path.join(tempfile.mkdtemp(), "watch.db"))
+    await db.init_db()
+    await db.write_many(
+        "INSERT INTO products (id, title, url, price, price_paise) VALUES (?, ?, ?, '₹100', 10000)",
+        [(f"W{i}", f"Watched {i}", f"https://www.amazon.in/dp/W{i}") for i in range(4)]
+    )
+    await db.write_many("INSERT INTO favorites (product_id) VALUES (?)", [("W0",), ("W1",), ("W2",)])
+
+    class FakeScraper:
+        def __init__(self):
+            self.prices = {"W0": "₹90", "W1": "₹100"}
+            self.seen = []
+
+        async def get_details(self, url, etag=None, last_modified=None):
+            pid = url.rsplit("/", 1)[1]
+            self.seen.append(pid)
+            if pid not in self.prices:
+                return NOT_MODIFIED
+            return Product(id=pid, price=self.prices[pid], description="", availability="In stock")
+
+    scraper = FakeScraper()
+    # 24 fetches an hour: two can be spent at once, the third favorite waits for the budget
+    watcher = PriceWatcher(db, scraper, budget=24, interval=3600, min_interval=900, max_interval=86400)
+    first = await watcher.run_once()
+    assert (first["checked"], first["deferred"]) == (2, 1)
+    assert (await watcher.run_once())["checked"] == 0
+    watcher._tokens = watcher.burst
+    second = await watcher.run_once()
+    assert (second["checked"], second["deferred"]) == (1, 0) and sorted(scraper.seen) == ["W0", "W1", "W2"]
+    assert first["changed"] + second["changed"] == 1 and first["not_modified"] + second["not_modified"] == 1
+
+    # The changed price is checked twice as often, the stable ones less often
+    intervals = {row["product_id"]: row["interval"] for row in await db.fetch("SELECT product_id, interval FROM price_watch", (), None)}
+    assert intervals == {"W0": 1800, "W1": 5400, "W2": 5400}
+    alerts = await watcher.alerts()
+    assert [(a["product_id"], a["old_price"], a["new_price"], a["change_pct"]) for a in alerts] == [("W0", "₹100", "₹90", -10.0)]
+    assert await watcher.alerts(after=alerts[-1]["id"]) == []
+    assert (await db.fetch_one("SELECT price_paise FROM products WHERE id = 'W0'", (), None))["price_paise"] == 9000
+
+    await db.write("DELETE FROM favorites WHERE product_id = 'W1'")
+    await watcher.run_once()
+    stats = await watcher.stats()
+    assert (stats["watched"], stats["due"], stats["checked"], stats["changed"]) == (2, 0, 3, 1)
+    print(f"Price watch: {stats}")
+    await db.close()
+
+async def test_scrape_jobs():
+    print("\n--- Testing Scrape Job Queue ---")
+    # Workers never create or migrate the schema; on a database the server has not initialised yet they wait
+    early = ScrapeWorker(os.path.join(tempfile.mkdtemp(), "fresh.db"))
+    waiting = asyncio.create_task(early.run())
+    await asyncio.sleep(0.1)
+    conn = sqlite3.connect(early.db_path)
+    assert not waiting.done() and conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0
+    conn.close()
+    early.stop()
+    await asyncio.wait_for(waiting, 5)
+
+    path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    db = AmazonDatabase(path)
+    await db.init_db()
+    queue = JobQueue(db, poll_interval=0.01)
+    with FakeAmazonServer() as fake:
+        scraper = AmazonScraper(base_url=fake.base_url)
+        scraper.limiter = HostRateLimiter(0)
+        worker = ScrapeWorker(path, concurrency=2, lease=5, scraper=scraper)
+        running = asyncio.create_task(worker.run())
+        queued = QueuedScraper(queue, scraper)
+
+        results = await queued.search("laptop")
+        assert len(results) == 48 and isinstance(results[0], Product)
+        url = f"{fake.base_url}/dp/{results[0].id}"
+        details = await queued.get_details(url)
+        assert details.id == results[0].id and details.description
+        assert await queued.get_details(url, etag=details.etag) is NOT_MODIFIED
+
+        # A job held by a worker that died is picked up again once its lease runs out
+        await db.write(
+            "INSERT INTO scrape_jobs (id, kind, target, params, status, attempts, lease_owner, lease_expires, enqueued_at) "
+            "VALUES ('orphan', 'search', 'phone', '{}', 'running', 1, 'dead-worker', ?, ?)", (time.time() - 1, time.time())
+        )
+        for _ in range(200):
+            row = await db.fetch_one("SELECT status, attempts FROM scrape_jobs WHERE id = 'orphan'", (), None)
+            if row["status"] == "done":
+                break
+            await asyncio.sleep(0.01)
+        assert row == {"status": "done", "attempts": 2}
+
+        # Jobs that keep failing give up after the last attempt
+        try:
+            await queue.run("bogus", "x")
+            assert False, "expected JobFailed"
+        except JobFailed as e:
+            assert "Unknown job kind" in str(e)
+
+        worker.stop()
+        await running
+        assert (worker.done, worker.failed) == (4, 3) and fake.requests == 4
+        await scraper.close()
+
+    stats = await queue.stats()
+    assert stats["jobs"] == {"done": 1} and (stats["enqueued"], stats["completed"], stats["failed"]) == (4, 3, 1)
+    print(f"Scrape jobs: {stats}")
+    await db.close()
+
+async def test_metrics():
+    print("\n--- Testing Metrics ---")
+    registry = Metrics()
+    histogram = Histogram()
+    for ms in range(1, 101):
+        histogram.observe(ms / 1000)
+    assert 40 <= histogram.summary()["p50_ms"] <= 60 and 90 <= histogram.summary()["p99_ms"] <= 100
+
+    token = current_tool.set("search_product")
+    with registry.timed("db"):
+        await asyncio.sleep(0.01)
+    registry.count("cache_lookups", cache="search", result="fresh")
+    registry.count("cache_lookups", cache="search", result="fresh")
+    current_tool.reset(token)
+    registry.observe("fetch", 0.2)  # outside a tool call
+
+    snapshot = registry.snapshot()
+    assert snapshot["latency"]["search_product"]["db"]["count"] == 1 and snapshot["latency"]["search_product"]["db"]["p50_ms"] >= 10
+    assert snapshot["latency"]["background"]["fetch"]["max_ms"] == 200
+    assert snapshot["counters"]["cache_lookups"] == {"cache=search,result=fresh": 2}
+    text = registry.prometheus()
+    assert 'amazon_mcp_latency_seconds_bucket{tool="search_product",phase="db",le="+Inf"} 1' in text
+    assert 'amazon_mcp_cache_lookups_total{cache="search",result="fresh"} 2' in text
+    path = os.path.join(tempfile.mkdtemp(), "amazon_mcp.prom")
+    registry.write_prometheus(path)
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == text
+    registry.reset()
+    assert registry.snapshot()["latency"] == {}
+
+    # Label values are escaped as the text format requires
+    registry.count("tool_calls", tool='odd"name\\with\nbreak')
+    assert 'amazon_mcp_tool_calls_total{tool="odd\\"name\\\\with\\nbreak"} 1' in registry.prometheus()
+    # Calls to tools that do not exist share one series
+    from src import server
+    server.metrics.reset()
+    for name in ("no_such_tool", "nor_this_one"):
+        try:
+            await server.handle_call_tool(name, {})
+        except ValueError:
+            pass
+    snapshot = server.metrics.snapshot()
+    assert snapshot["counters"]["tool_calls"] == {"tool=unknown": 2} and list(snapshot["latency"]) == ["unknown"]
+
+async def test_stdio_entry():
+    print("\n--- Testing stdio Entry Point ---")
+    folder = tempfile.mkdtemp()
+    env = dict(os.environ, AMAZON_MCP_DB=os.path.join(folder, "stdio.db"), AMAZON_MCP_HTML_STORE_DIR=os.path.join(folder, "pages"))
+    messages = [
+        {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {"protocolVersion": "2025-03-26", "capabilities": {}}},
+        {"jsonrpc": "2.0", "method": "notifications/initialized"},
+        {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+        {"jsonrpc": "2.0", "id": 3, "method": "tools/call", "params": {"name": "get_cache_stats", "arguments": {"compact": True}}},
+        {"jsonrpc": "2.0", "id": 4, "method": "tools/call", "params": {"name": "no_such_tool"}},
+        {"jsonrpc": "2.0", "id": 5, "method": "resources/list"},
+    ]
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, "main.py", cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+    )
+    stdout, _ = await asyncio.wait_for(proc.communicate("".join(json.dumps(m) + "\n" for m in messages).encode()), 60)
+    replies = {r["id"]: r for r in map(json.loads, stdout.decode().splitlines())}
+    assert proc.returncode == 0 and sorted(replies) == [1, 2, 3, 4, 5]
+    assert replies[1]["result"]["protocolVersion"] == "2025-03-26"
+    assert [t["name"] for t in replies[2]["result"]["tools"]] == [t["name"] for t in TOOLS]
+    assert json.loads(replies[3]["result"]["content"][0]["text"])["total_products"] == 0
+    assert replies[4]["error"]["code"] == -32602 and replies[5]["error"]["code"] == -32601
+
+    # A failed import of src.server is not cached; the next call tries again
+    import main as stdio
+    backend = stdio.Backend()
+    attempts = []
+
+    async def flaky_load():
+        attempts.append(len(attempts))
+        if len(attempts) == 1:
+            raise ImportError("No module named 'mcp'")
+        return "server"
+
+    backend._load = flaky_load
+    try:
+        await backend.load()
+        assert False, "expected ImportError"
+    except ImportError:
+        pass
+    assert await backend.load() == "server" and await backend.load() == "server" and len(attempts) == 2
+
+async def test_loadtest():
+    print("\n--- Testing Load Test Harness ---")
+    folder = tempfile.mkdtemp()
+    corpus = Corpus()
+    with FakeAmazonServer(corpus=corpus) as fake:
+        env = dict(os.environ, AMAZON_MCP_BASE_URL=fake.base_url, AMAZON_MCP_DB=os.path.join(folder, "load.db"),
+                   AMAZON_MCP_HTML_STORE_DIR=os.path.join(folder, "pages"), AMAZON_MCP_SCRAPE_RATE="0")
+        calls = synthetic_calls(30, {"search_product": 2, "get_product_details": 2, "get_cache_stats": 1}, 10, corpus, fake.base_url)
+        # A saved workload replays as the same calls with their offsets
+        trace = os.path.join(folder, "trace.jsonl")
+        save_trace(trace, calls, rate=100)
+        replay = load_trace(trace)
+        assert [(tool, arguments) for _, tool, arguments in replay] == [(tool, arguments) for _, tool, arguments in calls]
+        assert replay[-1][0] == 0.29
+
+        command, cwd, source = server_command(os.path.join(folder, "missing.json"))
+        assert source.startswith("main")
+        results = await asyncio.wait_for(run_load(command, cwd, env, replay, rate=100, concurrency=4), 60)
+    summary = results["summary"]
+    assert summary["requests"] == 30 and summary["errors"] == 0 and summary["peak_in_flight"] <= 4
+    assert sum(stats["count"] for stats in results["tools"].values()) == 30
+    assert results["server_metrics"]["latency"]
+    assert all(change["p95_ms_change_pct"] == 0 for change in compare(results, results)["tools"].values())
+    print(f"Load test: {summary['throughput_rps']} req/s, p95 {summary['p95_ms']} ms")
 
 async def main():
     await test_db()
+    await test_pool()
+    await test_group_commit()
+    await test_search_cache()
+    await test_batch_search()
+    await test_fts()
+    await test_numeric_columns()
+    await test_price_history()
+    await test_export()
+    await test_import()
+    await test_refresh_engine()
+    await test_coalescing()
+    test_responses()
+    test_parsers()
+    await test_offline_scrape()
+    await test_retry_and_breaker()
+    await test_html_store()
+    await test_hot_cache()
+    await test_retention()
+    await test_price_watch()
+    await test_scrape_jobs()
+    await test_metrics()
+    await test_stdio_entry()
+    await test_loadtest()
     # Uncomment to test actual scraping (might fail if IP blocked or network issues)
     # await test_search()
 